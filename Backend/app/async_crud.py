@@ -0,0 +1,824 @@
+from sqlalchemy import select, update, delete, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, Dict, List, Optional
+from datetime import datetime, timedelta
+from functools import wraps
+from . import crud, models, schemas, ticket_stats, events, partitions, audit, jobs
+from .crud import (
+    triage_tickets_query, escalation_statement, escalation_event, dispatch_staff_query, build_ticket_list_query, build_ticket_page, ticket_load_options, advanced_includes, legacy_tickets_query,
+    emergency_ticket_criteria, bulk_location_ids, location_organizations_query, prepare_bulk_tickets, ticket_insert_statement, bulk_side_statements, bulk_item_results,
+    bulk_error, ticket_model_event, ticket_audit_entry, attachment_audit_entry, escalation_audit_entry,
+    TICKET_EVENT_TYPES, apply_location_parent, location_match_query, LOCATION_MATCH_THRESHOLD,
+    token_revocation_statements, refresh_family_revocation, live_access_tokens
+)
+import logging
+from .validators import TicketValidator
+from fastapi import HTTPException
+from .models import TicketStatus
+from .principal_cache import principal_cache
+from .profiling import current_operation
+
+logger = logging.getLogger(__name__)
+
+# crud.py function -> its async counterpart, filled in by async_db_operation_handler
+ASYNC_OPERATIONS: Dict[Callable, Callable] = {}
+
+# Async counterpart of crud.db_operation_handler; also registers func for run_crud
+# against the crud.py function of the same name, which must exist
+def async_db_operation_handler(func):
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        # Lets the SQL profiler attribute statements to the crud function issuing them
+        token = current_operation.set(func.__name__)
+        try:
+            return await func(*args, **kwargs)
+        except IntegrityError as e:
+            logger.error(f"Database integrity error in {func.__name__}: {str(e)}")
+            raise HTTPException(status_code=400, detail="Database constraint violation")
+        except SQLAlchemyError as e:
+            logger.error(f"Database error in {func.__name__}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Database operation failed")
+        finally:
+            current_operation.reset(token)
+    ASYNC_OPERATIONS[getattr(crud, func.__name__)] = wrapper
+    return wrapper
+
+async def run_crud(db, crud_func, *args, **kwargs):
+    """Run a crud operation on whichever session type the configured dependency provided.
+
+    Async sessions use the coroutine registered for crud_func in this module; sync
+    sessions run the crud.py function in the threadpool so the event loop is never blocked.
+    """
+    if isinstance(db, AsyncSession):
+        operation = ASYNC_OPERATIONS.get(crud_func)
+        if operation is None:
+            raise NotImplementedError(f"{crud_func.__name__} has no async counterpart")
+        return await operation(db, *args, **kwargs)
+    return await run_in_threadpool(crud_func, db, *args, **kwargs)
+
+async def location_organization_id(db: AsyncSession, location_id: int) -> Optional[int]:
+    location = await db.get(models.Location, location_id)
+    return location.organization_id if location else None
+
+# Staff Operations
+@async_db_operation_handler
+async def create_staff(db: AsyncSession, staff: schemas.StaffCreate) -> models.Staff:
+    db_staff = models.Staff(**staff.dict())
+    db.add(db_staff)
+    await db.flush()
+    await db.execute(events.ticket_events_statement([
+        events.staff_event("staff_updated", db_staff.staff_id, db_staff.organization_id)
+    ]))
+    await db.commit()
+    await db.refresh(db_staff)
+    return db_staff
+
+@async_db_operation_handler
+async def get_staff(db: AsyncSession, staff_id: int) -> Optional[models.Staff]:
+    result = await db.execute(
+        select(models.Staff).where(
+            models.Staff.staff_id == staff_id,
+            models.Staff.is_deleted == False
+        )
+    )
+    return result.scalars().first()
+
+@async_db_operation_handler
+async def get_available_staff(db: AsyncSession, skill_category: Optional[str] = None) -> List[models.Staff]:
+    query = select(models.Staff).where(models.Staff.is_on_job == False)
+    if skill_category:
+        query = query.join(models.StaffSkill).where(
+            models.StaffSkill.category == skill_category
+        )
+    result = await db.execute(query)
+    return result.scalars().all()
+
+@async_db_operation_handler
+async def release_staff(db: AsyncSession, staff_id: int) -> Optional[models.Staff]:
+    staff = await db.get(models.Staff, staff_id)
+    if staff:
+        staff.is_on_job = False
+        await db.execute(events.ticket_events_statement([
+            events.staff_event("staff_released", staff_id, staff.organization_id)
+        ]))
+        await db.commit()
+        await db.refresh(staff)
+    return staff
+
+@async_db_operation_handler
+async def update_staff_position(
+    db: AsyncSession,
+    staff_id: int,
+    latitude: float,
+    longitude: float
+) -> Optional[models.Staff]:
+    staff = await get_staff(db, staff_id)
+    if staff:
+        staff.latitude = latitude
+        staff.longitude = longitude
+        staff.position_updated_at = datetime.utcnow()
+        await db.execute(events.ticket_events_statement([events.staff_event(
+            "staff_moved", staff_id, staff.organization_id, latitude=latitude, longitude=longitude
+        )]))
+        await db.commit()
+        await db.refresh(staff)
+    return staff
+
+@async_db_operation_handler
+async def get_emergency_ticket(
+    db: AsyncSession,
+    ticket_id: int,
+    organization_id: Optional[int] = None
+) -> Optional[models.EmergencyTicket]:
+    result = await db.execute(
+        select(models.EmergencyTicket).where(
+            *emergency_ticket_criteria(ticket_id, organization_id),
+            models.EmergencyTicket.is_deleted == False
+        )
+    )
+    return result.scalars().first()
+
+@async_db_operation_handler
+async def load_dispatch_staff(db: AsyncSession, staff_id: Optional[int] = None) -> List[tuple]:
+    result = await db.execute(dispatch_staff_query(staff_id))
+    return result.all()
+
+# Triage Operations
+@async_db_operation_handler
+async def load_triage_tickets(db: AsyncSession, ticket_ids: Optional[List[int]] = None) -> List[tuple]:
+    result = await db.execute(triage_tickets_query(ticket_ids))
+    return result.all()
+
+@async_db_operation_handler
+async def escalate_emergency_ticket(db: AsyncSession, ticket_id: int, organization_id: Optional[int] = None) -> bool:
+    row = (await db.execute(escalation_statement(ticket_id, organization_id))).first()
+    if row is None:
+        await db.rollback()
+        return False
+    severity = await db.get(models.IncidentSeverity, row.severity_id) if row.severity_id else None
+    await db.execute(events.ticket_events_statement([escalation_event(ticket_id, row, severity)]))
+    await db.execute(audit.audit_outbox_statement([escalation_audit_entry(ticket_id, row)]))
+    await db.commit()
+    return True
+
+# Location Operations
+@async_db_operation_handler
+async def create_location(db: AsyncSession, location: schemas.LocationCreate) -> models.Location:
+    db_location = models.Location(**location.dict())
+    parent = await db.get(models.Location, db_location.parent_id) if db_location.parent_id else None
+    if db_location.parent_id and parent is None:
+        raise HTTPException(status_code=404, detail="Parent location not found")
+    apply_location_parent(db_location, parent)
+    db.add(db_location)
+    await db.flush()
+    await db.execute(events.ticket_events_statement([events.organization_event(
+        "location_created", db_location.organization_id, location_id=db_location.location_id
+    )]))
+    await db.commit()
+    await db.refresh(db_location)
+    return db_location
+
+@async_db_operation_handler
+async def get_organization_locations(
+    db: AsyncSession,
+    organization_id: int,
+    skip: int = 0,
+    limit: int = 100
+) -> List[models.Location]:
+    result = await db.execute(
+        select(models.Location).where(
+            models.Location.organization_id == organization_id,
+            models.Location.is_deleted == False
+        ).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
+
+@async_db_operation_handler
+async def match_locations(db: AsyncSession, organization_id: int, query: str, limit: int = 5) -> List[tuple]:
+    result = await db.execute(location_match_query(organization_id, query, limit))
+    return result.all()
+
+async def resolve_ticket_location(db: AsyncSession, ticket: models.EmergencyTicket):
+    if ticket.location_id is not None or not ticket.user_input_location or ticket.organization_id is None:
+        return
+    result = await db.execute(location_match_query(ticket.organization_id, ticket.user_input_location, 1))
+    match = result.first()
+    if match is not None and match.score >= LOCATION_MATCH_THRESHOLD:
+        ticket.location_id = match.Location.location_id
+        ticket.matched_location = match.Location.full_name
+
+@async_db_operation_handler
+async def get_location_coordinates(db: AsyncSession, location_id: int) -> Optional[tuple]:
+    location = await db.get(models.Location, location_id)
+    if location is None or location.latitude is None or location.longitude is None:
+        return None
+    return location.latitude, location.longitude
+
+# Emergency Ticket Operations
+@async_db_operation_handler
+async def create_emergency_ticket(
+    db: AsyncSession,
+    ticket: schemas.EmergencyTicketCreate
+) -> models.EmergencyTicket:
+    db_ticket = models.EmergencyTicket(**ticket.dict())
+    db_ticket.created_at = datetime.utcnow()
+    await resolve_ticket_location(db, db_ticket)
+    if db_ticket.organization_id is None:
+        db_ticket.organization_id = await location_organization_id(db, db_ticket.location_id)
+
+    db.add(db_ticket)
+    await db.flush()
+    await db.execute(audit.audit_outbox_statement([ticket_audit_entry(db_ticket, "created")]))
+    for statement in ticket_stats.ticket_created_statements(
+        [(db_ticket.organization_id, db_ticket.emergency_type, db_ticket.status)]
+    ):
+        await db.execute(statement)
+    await db.execute(events.ticket_events_statement([ticket_model_event("created", db_ticket)]))
+    await db.commit()
+    await db.refresh(db_ticket)
+    return db_ticket
+
+@async_db_operation_handler
+async def assign_emergency_ticket(
+    db: AsyncSession,
+    ticket_id: int,
+    staff_id: int,
+    estimated_response_time: int,
+    includes: Optional[List[str]] = None,
+    organization_id: Optional[int] = None
+) -> models.EmergencyTicket:
+    result = await db.execute(
+        select(models.EmergencyTicket).options(
+            *ticket_load_options(models.EmergencyTicket, includes)
+        ).where(
+            *emergency_ticket_criteria(ticket_id, organization_id)
+        ).with_for_update(of=models.EmergencyTicket)
+    )
+    ticket = result.scalars().first()
+
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+
+    # Lock the responder so two dispatchers can never take the same person
+    result = await db.execute(
+        select(models.Staff).where(
+            models.Staff.staff_id == staff_id,
+            models.Staff.is_deleted == False,
+            # Only the ticket's own organization's responders can be dispatched to it
+            models.Staff.organization_id == ticket.organization_id
+        ).with_for_update(skip_locked=True)
+    )
+    staff = result.scalars().first()
+    if staff is None or staff.is_on_job:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Staff member is not available")
+    staff.is_on_job = True
+
+    before = audit.snapshot(ticket, audit.ASSIGNMENT_FIELDS)
+    old_status = ticket.status
+    response_seconds = None
+    if ticket.assigned_at is None:
+        ticket.assigned_at = datetime.utcnow()
+        response_seconds = int((ticket.assigned_at - ticket.created_at).total_seconds())
+    ticket.assigned_staff_id = staff_id
+    ticket.estimated_response_time = estimated_response_time
+    ticket.status = "assigned"
+    for statement in ticket_stats.status_change_statements(
+        ticket.organization_id, old_status, ticket.status, response_seconds
+    ):
+        await db.execute(statement)
+    await db.execute(events.ticket_events_statement([
+        ticket_model_event("assigned", ticket, staff_id=staff_id)
+    ]))
+    await db.execute(audit.audit_outbox_statement([
+        ticket_audit_entry(ticket, "assigned", before, performed_by=staff_id)
+    ]))
+    await db.commit()
+    await db.refresh(ticket)
+    return ticket
+
+# Enhanced Organization Operations
+@async_db_operation_handler
+async def update_organization(
+    db: AsyncSession,
+    organization_id: int,
+    updates: schemas.OrganizationUpdate
+) -> Optional[models.Organization]:
+    db_organization = await get_organization(db, organization_id)
+    if db_organization:
+        update_data = updates.dict(exclude_unset=True)
+        for key, value in update_data.items():
+            setattr(db_organization, key, value)
+        await db.execute(events.ticket_events_statement([events.organization_event("organization_updated", organization_id)]))
+        await db.commit()
+        await db.refresh(db_organization)
+    return db_organization
+
+@async_db_operation_handler
+async def soft_delete_organization(
+    db: AsyncSession,
+    organization_id: int
+) -> bool:
+    db_organization = await get_organization(db, organization_id)
+    if db_organization:
+        await db.execute(
+            update(models.User)
+            .where(models.User.organization_id == organization_id)
+            .values(is_deleted=True)
+        )
+        await db.execute(
+            update(models.Location)
+            .where(models.Location.organization_id == organization_id)
+            .values(is_deleted=True)
+        )
+        db_organization.is_deleted = True
+        await db.execute(events.ticket_events_statement([events.organization_event("organization_deleted", organization_id)]))
+        await db.commit()
+        principal_cache.invalidate_organization(organization_id)
+        return True
+    return False
+
+# Ticket Statistics
+@async_db_operation_handler
+async def get_organization_ticket_stats(
+    db: AsyncSession,
+    organization_id: int
+) -> dict:
+    stats = (await db.execute(ticket_stats.stats_query(organization_id))).scalars().first()
+    type_counts = (await db.execute(ticket_stats.type_counts_query(organization_id))).all()
+    return ticket_stats.build_ticket_stats(stats, type_counts)
+
+@async_db_operation_handler
+async def rebuild_ticket_stats(db: AsyncSession, organization_id: Optional[int] = None) -> None:
+    for statement in ticket_stats.rebuild_statements(organization_id):
+        await db.execute(statement)
+    await db.commit()
+
+# Partition Maintenance
+@async_db_operation_handler
+async def ensure_log_partitions(db: AsyncSession, months_ahead: int = partitions.LOG_PARTITION_MONTHS_AHEAD) -> None:
+    for statement in partitions.monthly_partition_statements(models.EnhancedTicketLog.__tablename__, months_ahead):
+        await db.execute(text(statement))
+    await db.commit()
+
+@async_db_operation_handler
+async def prune_log_partitions(db: AsyncSession, retention_months: int = audit.AUDIT_RETENTION_MONTHS) -> List[str]:
+    if retention_months <= 0:
+        return []
+    table = models.EnhancedTicketLog.__tablename__
+    names = (await db.execute(text(partitions.PARTITION_NAMES_SQL), {"table": table})).scalars().all()
+    expired = partitions.expired_monthly_partitions(table, names, retention_months)
+    for name in expired:
+        await db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    await db.commit()
+    return expired
+
+# Audit Operations
+@async_db_operation_handler
+async def flush_audit_outbox(db: AsyncSession, batch_size: int = audit.AUDIT_FLUSH_BATCH_SIZE) -> int:
+    moved = (await db.execute(audit.audit_flush_statement(batch_size))).rowcount
+    await db.commit()
+    return moved
+
+# Scheduled Jobs
+@async_db_operation_handler
+async def run_job_batch(db: AsyncSession, job_name: str, batch_size: int = jobs.JOB_BATCH_SIZE) -> jobs.JobResult:
+    job = jobs.JOBS[job_name]
+    now = datetime.utcnow()
+    rows = (await db.execute(job.claim(batch_size, now))).all()
+    result = jobs.JobResult(claimed=len(rows))
+    if not rows:
+        return result
+    try:
+        async with db.begin_nested():
+            for statement in job.statements(rows, now):
+                await db.execute(statement)
+        result.succeeded = len(rows)
+    except (SQLAlchemyError, ValueError) as e:
+        logger.warning(f"Job {job_name} batch failed, running rows one by one: {str(e)}")
+        for row in rows:
+            try:
+                async with db.begin_nested():
+                    for statement in job.statements([row], now):
+                        await db.execute(statement)
+                result.succeeded += 1
+            except (SQLAlchemyError, ValueError) as e:
+                values = jobs.retry_values(job, row.attempts, str(e), now)
+                await db.execute(update(job.model).where(getattr(job.model, job.key) == row.key).values(**values))
+                if values[job.run_at] is None:
+                    result.exhausted += 1
+                else:
+                    result.retried += 1
+    await db.commit()
+    return result
+
+@async_db_operation_handler
+async def create_ticket(db: AsyncSession, ticket_data: dict) -> models.TicketBase:
+    ticket_type = ticket_data.get("ticket_type", "emergency")
+
+    validator = TicketValidator()
+    required_fields = validator.get_required_fields(ticket_type)
+    completion_status = validator.validate_completion(ticket_data, required_fields)
+
+    initial_status = (TicketStatus.PENDING
+                     if all(completion_status.values())
+                     else TicketStatus.INCOMPLETE)
+
+    if ticket_type == "emergency":
+        db_ticket = models.EmergencyTicket(
+            **ticket_data,
+            status=initial_status,
+            required_fields_status=completion_status
+        )
+        await resolve_ticket_location(db, db_ticket)
+        if db_ticket.organization_id is None:
+            db_ticket.organization_id = await location_organization_id(db, db_ticket.location_id)
+    else:
+        db_ticket = models.MaintenanceTicket(
+            **ticket_data,
+            status=initial_status,
+            required_fields_status=completion_status
+        )
+
+    db.add(db_ticket)
+    await db.flush()
+    if ticket_type == "emergency":
+        for statement in ticket_stats.ticket_created_statements(
+            [(db_ticket.organization_id, db_ticket.emergency_type, db_ticket.status)]
+        ):
+            await db.execute(statement)
+    organization_id = (None if ticket_type == "emergency"
+                       else await location_organization_id(db, db_ticket.location_id))
+    await db.execute(events.ticket_events_statement([
+        ticket_model_event("created", db_ticket, organization_id)
+    ]))
+    await db.execute(audit.audit_outbox_statement([ticket_audit_entry(db_ticket, "created")]))
+    await db.commit()
+    await db.refresh(db_ticket)
+
+    # Create follow-up task if incomplete
+    if initial_status == TicketStatus.INCOMPLETE:
+        missing_fields = [f for f, v in completion_status.items() if not v]
+        await create_followup_task(db, {
+            "ticket_id": db_ticket.ticket_id,
+            "missing_fields": missing_fields,
+            "due_date": datetime.utcnow() + timedelta(days=1),
+            "priority": "high" if "emergency_level" in missing_fields else "medium"
+        })
+
+    return db_ticket
+
+# FollowUpTask Operations
+@async_db_operation_handler
+async def create_followup_task(db: AsyncSession, task_data: dict) -> models.FollowUpTask:
+    db_task = models.FollowUpTask(**task_data)
+    db.add(db_task)
+    await db.commit()
+    await db.refresh(db_task)
+    return db_task
+
+@async_db_operation_handler
+async def get_followup_tasks(db: AsyncSession, ticket_id: int) -> List[models.FollowUpTask]:
+    result = await db.execute(
+        select(models.FollowUpTask).where(models.FollowUpTask.ticket_id == ticket_id)
+    )
+    return result.scalars().all()
+
+# StaffSkill Operations
+@async_db_operation_handler
+async def create_staff_skill(db: AsyncSession, skill_data: dict) -> models.StaffSkill:
+    db_skill = models.StaffSkill(**skill_data)
+    db.add(db_skill)
+    await db.flush()
+    await db.execute(events.ticket_events_statement([
+        events.staff_event("staff_updated", db_skill.staff_id, None)
+    ]))
+    await db.commit()
+    await db.refresh(db_skill)
+    return db_skill
+
+@async_db_operation_handler
+async def get_staff_skills(db: AsyncSession, staff_id: int) -> List[models.StaffSkill]:
+    result = await db.execute(
+        select(models.StaffSkill).where(models.StaffSkill.staff_id == staff_id)
+    )
+    return result.scalars().all()
+
+# IncidentSeverity Operations
+@async_db_operation_handler
+async def create_incident_severity(db: AsyncSession, severity_data: dict) -> models.IncidentSeverity:
+    db_severity = models.IncidentSeverity(**severity_data)
+    db.add(db_severity)
+    await db.commit()
+    await db.refresh(db_severity)
+    return db_severity
+
+@async_db_operation_handler
+async def get_incident_severities(db: AsyncSession) -> List[models.IncidentSeverity]:
+    result = await db.execute(select(models.IncidentSeverity))
+    return result.scalars().all()
+
+@async_db_operation_handler
+async def get_organization(db: AsyncSession, organization_id: int):
+    return await db.get(models.Organization, organization_id)
+
+@async_db_operation_handler
+async def create_organization(db: AsyncSession, organization: schemas.OrganizationCreate) -> models.Organization:
+    db_organization = models.Organization(**organization.dict())
+    db.add(db_organization)
+    await db.commit()
+    await db.refresh(db_organization)
+    return db_organization
+
+# User Operations
+@async_db_operation_handler
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[models.User]:
+    result = await db.execute(
+        select(models.User).where(
+            models.User.email == email,
+            models.User.is_deleted == False
+        )
+    )
+    return result.scalars().first()
+
+@async_db_operation_handler
+async def create_user(
+    db: AsyncSession,
+    name: str,
+    email: str,
+    password_hash: str,
+    role: str,
+    organization_id: int,
+    identifier: Optional[str] = None
+) -> models.User:
+    db_user = models.User(
+        name=name,
+        email=email,
+        password_hash=password_hash,
+        role=role,
+        organization_id=organization_id,
+        identifier=identifier
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+@async_db_operation_handler
+async def update_password_hash(db: AsyncSession, user_id: int, password_hash: str) -> None:
+    await db.execute(update(models.User).where(models.User.user_id == user_id).values(password_hash=password_hash))
+    await db.commit()
+
+@async_db_operation_handler
+async def update_user(db: AsyncSession, user_id: int, updates: schemas.UserUpdate) -> Optional[models.User]:
+    db_user = await db.get(models.User, user_id)
+    if db_user:
+        previous_email = db_user.email
+        update_data = updates.dict(exclude_unset=True)
+        for key, value in update_data.items():
+            column = models.User.__table__.columns.get(key)
+            # Only real columns, and an explicit null never overwrites a NOT NULL one
+            if column is None or (value is None and not column.nullable):
+                continue
+            setattr(db_user, key, value)
+        await db.execute(events.ticket_events_statement([events.principal_invalidated_event(previous_email)]))
+        await db.commit()
+        await db.refresh(db_user)
+        principal_cache.invalidate_user(previous_email)
+    return db_user
+
+@async_db_operation_handler
+async def soft_delete_user(db: AsyncSession, user_id: int) -> bool:
+    db_user = await db.get(models.User, user_id)
+    if db_user:
+        db_user.is_deleted = True
+        await db.execute(events.ticket_events_statement([events.principal_invalidated_event(db_user.email)]))
+        await db.commit()
+        principal_cache.invalidate_user(db_user.email)
+        return True
+    return False
+
+# Token Operations
+@async_db_operation_handler
+async def create_refresh_token(db: AsyncSession, user_id: int, family_id: str, **token) -> None:
+    db.add(models.RefreshToken(user_id=user_id, family_id=family_id, **token))
+    await db.commit()
+
+@async_db_operation_handler
+async def rotate_refresh_token(db: AsyncSession, jti: str, replacement: dict) -> Optional[models.User]:
+    now = datetime.utcnow()
+    token = (await db.execute(
+        select(models.RefreshToken).where(models.RefreshToken.jti == jti).with_for_update()
+    )).scalars().first()
+    if token is None or token.expires_at <= now or token.revoked_at is not None:
+        return None
+    if token.used_at is not None:
+        logger.warning(f"Refresh token reuse for user {token.user_id}, revoking family {token.family_id}")
+        access_tokens = live_access_tokens((await db.execute(refresh_family_revocation(token.family_id, now))).all(), now)
+        if access_tokens:
+            for statement in token_revocation_statements(access_tokens):
+                await db.execute(statement)
+        await db.commit()
+        return None
+    user = await db.get(models.User, token.user_id)
+    if user is None or user.is_deleted:
+        return None
+    token.used_at = now
+    db.add(models.RefreshToken(user_id=token.user_id, family_id=token.family_id, **replacement))
+    await db.commit()
+    return user
+
+@async_db_operation_handler
+async def revoke_tokens(db: AsyncSession, access_tokens: List[tuple], family_id: Optional[str] = None) -> None:
+    now = datetime.utcnow()
+    access_tokens = live_access_tokens(access_tokens, now)
+    if family_id is not None:
+        access_tokens += live_access_tokens((await db.execute(refresh_family_revocation(family_id, now))).all(), now)
+    if access_tokens:
+        for statement in token_revocation_statements(access_tokens):
+            await db.execute(statement)
+    await db.commit()
+
+@async_db_operation_handler
+async def get_revoked_tokens(db: AsyncSession, now: datetime) -> List[tuple]:
+    result = await db.execute(
+        select(models.RevokedToken.jti, models.RevokedToken.expires_at).where(models.RevokedToken.expires_at > now)
+    )
+    return [tuple(row) for row in result.all()]
+
+@async_db_operation_handler
+async def prune_revoked_tokens(db: AsyncSession, now: datetime) -> None:
+    await db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at <= now))
+    await db.execute(delete(models.RefreshToken).where(models.RefreshToken.expires_at <= now))
+    await db.commit()
+
+# Ticket Activity Operations
+@async_db_operation_handler
+async def create_comment(db: AsyncSession, ticket_id: int, user_id: int, content: str) -> models.Comment:
+    ticket = await get_ticket(db, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    db_comment = models.Comment(ticket_id=ticket_id, user_id=user_id, content=content)
+    db.add(db_comment)
+    await db.flush()
+    await db.execute(events.ticket_events_statement([ticket_model_event(
+        "commented", ticket, await location_organization_id(db, ticket.location_id),
+        comment_id=db_comment.comment_id, user_id=user_id
+    )]))
+    await db.execute(audit.audit_outbox_statement([audit.audit_entry(
+        TICKET_EVENT_TYPES[ticket.__tablename__], ticket_id, "commented",
+        {"comment_id": {"old": None, "new": db_comment.comment_id}}
+    )]))
+    await db.commit()
+    await db.refresh(db_comment)
+    return db_comment
+
+@async_db_operation_handler
+async def create_attachment(
+    db: AsyncSession,
+    ticket: models.Ticket,
+    file_name: str,
+    file_type: str,
+    file_size: int,
+    file_path: str,
+    content_hash: str,
+    uploaded_by: int
+) -> models.Attachment:
+    db_attachment = models.Attachment(
+        ticket_id=ticket.ticket_id,
+        file_name=file_name,
+        file_type=file_type,
+        file_size=file_size,
+        file_path=file_path,
+        content_hash=content_hash,
+        uploaded_by=uploaded_by
+    )
+    db.add(db_attachment)
+    await db.flush()
+    await db.execute(events.ticket_events_statement([ticket_model_event(
+        "attached", ticket,
+        attachment_id=db_attachment.attachment_id, user_id=uploaded_by
+    )]))
+    await db.execute(audit.audit_outbox_statement([
+        attachment_audit_entry(ticket, db_attachment.attachment_id, uploaded_by)
+    ]))
+    await db.commit()
+    await db.refresh(db_attachment)
+    return db_attachment
+
+@async_db_operation_handler
+async def get_attachment(db: AsyncSession, attachment_id: int) -> Optional[tuple]:
+    """(attachment, organization_id of its ticket)"""
+    result = await db.execute(
+        select(models.Attachment, models.Ticket.organization_id)
+        .join(models.Ticket, models.Ticket.ticket_id == models.Attachment.ticket_id)
+        .where(models.Attachment.attachment_id == attachment_id, models.Ticket.is_deleted == False)
+    )
+    return result.first()
+
+@async_db_operation_handler
+async def update_ticket_status(db: AsyncSession, ticket_id: int, new_status: str) -> models.Ticket:
+    ticket = await get_ticket(db, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    if not TicketValidator.validate_ticket_update(ticket.status, new_status):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid status transition from {ticket.status} to {new_status}"
+        )
+    before = audit.snapshot(ticket, audit.STATUS_FIELDS)
+    old_status = ticket.status
+    ticket.status = new_status
+    await db.execute(events.ticket_events_statement([ticket_model_event(
+        "status_changed", ticket, await location_organization_id(db, ticket.location_id),
+        previous_status=old_status
+    )]))
+    await db.execute(audit.audit_outbox_statement([ticket_audit_entry(ticket, "status_changed", before)]))
+    await db.commit()
+    await db.refresh(ticket)
+    return ticket
+
+# Ticket Listing Operations
+@async_db_operation_handler
+async def get_tickets_basic(
+    db: AsyncSession,
+    includes: Optional[List[str]] = None,
+    organization_id: Optional[int] = None
+) -> List[models.Ticket]:
+    result = await db.execute(legacy_tickets_query(includes, organization_id))
+    return result.scalars().all()
+
+@async_db_operation_handler
+async def get_tickets_advanced(
+    db: AsyncSession,
+    include_followups: bool = False,
+    include_severity: bool = False,
+    includes: Optional[List[str]] = None,
+    organization_id: Optional[int] = None
+) -> List[models.Ticket]:
+    includes = advanced_includes(include_followups, include_severity, includes)
+    result = await db.execute(legacy_tickets_query(includes, organization_id))
+    return result.scalars().all()
+
+@async_db_operation_handler
+async def get_ticket(db: AsyncSession, ticket_id: int, includes: Optional[List[str]] = None) -> Optional[models.Ticket]:
+    result = await db.execute(
+        select(models.Ticket).options(
+            *ticket_load_options(models.Ticket, includes)
+        ).where(
+            models.Ticket.ticket_id == ticket_id,
+            models.Ticket.is_deleted == False
+        )
+    )
+    return result.scalars().first()
+
+@async_db_operation_handler
+async def list_tickets(db: AsyncSession, limit: int = 25, **filters) -> dict:
+    result = await db.execute(build_ticket_list_query(limit=limit, **filters))
+    return build_ticket_page(result.scalars().all(), limit)
+
+# Bulk Ticket Ingestion
+async def _insert_ticket_group(db: AsyncSession, model, entries: List[tuple], errors: List[dict]) -> List[tuple]:
+    statement = ticket_insert_statement(model)
+    try:
+        async with db.begin_nested():
+            result = await db.execute(statement, [row for _, row, _ in entries])
+            inserted = [(index, ticket_id, completion_status)
+                        for (index, _, completion_status), ticket_id in zip(entries, result.scalars().all())]
+            for side_statement in bulk_side_statements(model, entries, inserted):
+                await db.execute(side_statement)
+        return inserted
+    except SQLAlchemyError:
+        inserted = []
+        for entry in entries:
+            index, row, completion_status = entry
+            try:
+                async with db.begin_nested():
+                    result = await db.execute(statement, [row])
+                    item = [(index, result.scalar_one(), completion_status)]
+                    for side_statement in bulk_side_statements(model, [entry], item):
+                        await db.execute(side_statement)
+                inserted.extend(item)
+            except SQLAlchemyError as e:
+                errors.append(bulk_error(index, e))
+        return inserted
+
+@async_db_operation_handler
+async def bulk_create_tickets(
+    db: AsyncSession,
+    items: List[tuple],
+    created_by: Optional[int] = None,
+    organization_id: Optional[int] = None
+) -> List[dict]:
+    location_ids = bulk_location_ids(items)
+    location_organizations = {}
+    if location_ids:
+        location_organizations = dict((await db.execute(location_organizations_query(location_ids))).all())
+    errors, groups = prepare_bulk_tickets(items, created_by, location_organizations, organization_id)
+    results = []
+    for (model, _), entries in groups.items():
+        results.extend(bulk_item_results(await _insert_ticket_group(db, model, entries, errors)))
+    await db.commit()
+    return sorted(results + errors, key=lambda result: result["index"])
@@ -0,0 +1,77 @@
+from sqlalchemy import select, insert, delete, case, null
+from datetime import date, datetime
+from enum import Enum
+from typing import Dict, Iterable, List, Optional
+import os
+from . import models
+
+# Configuration
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))  # seconds
+AUDIT_FLUSH_BATCH_SIZE = int(os.getenv("AUDIT_FLUSH_BATCH_SIZE", "5000"))
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "24"))  # 0 keeps everything
+
+AUDIT_COLUMNS = ("ticket_type", "ticket_id", "action", "changes", "performed_by", "log_timestamp")
+# Fields diffed into changes for each kind of ticket mutation
+CREATED_FIELDS = ("status", "priority")
+STATUS_FIELDS = ("status",)
+ASSIGNMENT_FIELDS = ("status", "assigned_staff_id", "estimated_response_time", "assigned_at")
+
+def _jsonable(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+def snapshot(obj, fields: Iterable[str]) -> dict:
+    return {field: _jsonable(getattr(obj, field)) for field in fields}
+
+def diff(before: dict, after: dict) -> Dict[str, dict]:
+    """The changes JSONB payload: {field: {"old": ..., "new": ...}} for fields that changed"""
+    return {
+        field: {"old": before.get(field), "new": after[field]}
+        for field in after
+        if before.get(field) != after[field]
+    }
+
+def audit_entry(
+    ticket_type: str,
+    ticket_id: int,
+    action: str,
+    changes: Optional[dict] = None,
+    performed_by: Optional[int] = None
+) -> dict:
+    return {
+        "ticket_type": ticket_type,
+        "ticket_id": ticket_id,
+        "action": action,
+        "changes": changes,
+        "performed_by": performed_by,
+        "log_timestamp": datetime.utcnow()
+    }
+
+def audit_outbox_statement(entries: List[dict]):
+    """Append entries to the outbox in the caller's transaction, so they commit with the mutation"""
+    return insert(models.AuditOutbox).values(entries)
+
+def audit_flush_statement(batch_size: int = AUDIT_FLUSH_BATCH_SIZE):
+    """Move the oldest outbox batch into enhanced_ticket_logs in one statement.
+
+    The DELETE ... RETURNING runs as a CTE feeding a single multi-row INSERT, so
+    an entry is either still in the outbox or in the log, never both or neither.
+    SKIP LOCKED lets every worker flush concurrently without double-writing.
+    performed_by ids with no staff row are logged as NULL: one bad entry would
+    otherwise fail the foreign key for the whole batch on every retry.
+    """
+    outbox = models.AuditOutbox
+    claimed = delete(outbox).where(
+        outbox.outbox_id.in_(
+            select(outbox.outbox_id).order_by(outbox.outbox_id).limit(batch_size).with_for_update(skip_locked=True)
+        )
+    ).returning(*(getattr(outbox, column) for column in AUDIT_COLUMNS)).cte("claimed")
+    known_staff = select(models.Staff.staff_id).where(models.Staff.staff_id == claimed.c.performed_by).exists()
+    columns = [
+        case((known_staff, claimed.c.performed_by), else_=null()) if column == "performed_by" else claimed.c[column]
+        for column in AUDIT_COLUMNS
+    ]
+    return insert(models.EnhancedTicketLog).from_select(list(AUDIT_COLUMNS), select(*columns)).add_cte(claimed)
@@ -0,0 +1,70 @@
+from fastapi import HTTPException
+from typing import Optional
+import asyncio
+import logging
+import time
+from . import crud
+from .async_crud import run_crud
+from .audit import AUDIT_FLUSH_INTERVAL, AUDIT_FLUSH_BATCH_SIZE
+from .database import session_scope
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+AUDIT_MAINTENANCE_INTERVAL = 6 * 60 * 60  # seconds between partition creation/retention runs
+
+class AuditWriter:
+    """Drains the audit outbox into enhanced_ticket_logs and maintains its partitions.
+
+    Mutations only append to the outbox in their own transaction, so a crash
+    loses nothing: whatever was committed is moved by the next flush, by any worker.
+    """
+
+    def __init__(self, interval: float = AUDIT_FLUSH_INTERVAL, batch_size: int = AUDIT_FLUSH_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._last_maintenance = 0.0
+
+    async def flush(self) -> int:
+        """Move full batches until the outbox is drained"""
+        total = 0
+        while True:
+            async with session_scope() as db:
+                moved = await run_crud(db, crud.flush_audit_outbox, self.batch_size)
+            total += moved
+            if moved < self.batch_size:
+                return total
+
+    async def maintain(self):
+        self._last_maintenance = time.monotonic()
+        async with session_scope() as db:
+            await run_crud(db, crud.ensure_log_partitions)
+            dropped = await run_crud(db, crud.prune_log_partitions)
+        if dropped:
+            logger.info(f"Dropped expired audit log partitions: {', '.join(dropped)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if time.monotonic() - self._last_maintenance >= AUDIT_MAINTENANCE_INTERVAL:
+                    await self.maintain()
+                await self.flush()
+            except HTTPException as e:
+                logger.error(f"Audit log flush failed: {e.detail}")
+
+    async def start(self):
+        await self.maintain()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await self.flush()
+        except HTTPException as e:
+            logger.error(f"Final audit log flush failed: {e.detail}")
+
+audit_writer = AuditWriter()
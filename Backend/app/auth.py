@@ -1,19 +1,28 @@
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
-from jose import JWTError, jwt
+from jose import JWTError
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Optional
-from . import models
-from .database import get_db, SessionLocal
+import os
+import uuid
+from . import crud
+from .database import get_session
+from .async_crud import run_crud
+from .principal_cache import Principal, principal_cache
+from .replicas import require_consistency, user_key
+from .tokens import key_ring, revocation_set
 
 # Configuration
-SECRET_KEY = "your-secret-key-here"  # Change this in production!
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+def new_jti() -> str:
+    return uuid.uuid4().hex
 
 # JWT token functions
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -22,24 +31,128 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    to_encode.setdefault("exp", expire)
+    to_encode.setdefault("jti", new_jti())
+    to_encode["iat"] = datetime.utcnow()
+    return key_ring.encode(to_encode)
+
+def create_user_access_token(user, expires_delta: Optional[timedelta] = None, **claims):
+    """Issue a token carrying the claims get_current_user needs to skip the user lookup"""
+    return create_access_token(
+        {
+            "sub": user.email,
+            "uid": user.user_id,
+            "role": user.role,
+            "org": user.organization_id,
+            **claims
+        },
+        expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+def new_refresh_record() -> dict:
+    """Identifiers and expiries for the next access/refresh pair, stored before the tokens are signed"""
+    now = datetime.utcnow()
+    return {
+        "jti": new_jti(),
+        "access_jti": new_jti(),
+        "access_expires_at": now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    }
+
+def sign_token_pair(user, family_id: str, record: dict) -> dict:
+    access_token = create_user_access_token(user, jti=record["access_jti"], exp=record["access_expires_at"])
+    refresh_token = key_ring.encode({
+        "sub": user.email,
+        "uid": user.user_id,
+        "typ": "refresh",
+        "jti": record["jti"],
+        "fam": family_id,
+        "exp": record["expires_at"],
+        "iat": datetime.utcnow()
+    })
+    return {
+        "token": access_token,
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
+def decode_refresh_token(token: str) -> dict:
+    try:
+        payload = key_ring.decode(token)
+    except JWTError:
+        payload = {}
+    if payload.get("typ") != "refresh" or not payload.get("jti") or not payload.get("fam"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    return payload
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def principal_from_claims(payload: dict) -> Optional[Principal]:
+    """Build a principal from token claims, or None if the token predates them"""
+    if not all(claim in payload for claim in ("uid", "role", "org")):
+        return None
+    if principal_cache.is_stale(payload["sub"], payload["org"], payload.get("iat")):
+        return None
+    return Principal(
+        user_id=payload["uid"],
+        email=payload["sub"],
+        role=payload["role"],
+        organization_id=payload["org"]
+    )
+
+async def resolve_principal(token: str, db: Session) -> Principal:
+    """Authenticate a bearer token, raising 401 if it is invalid"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = key_ring.decode(token)
         username: str = payload.get("sub")
-        if username is None:
+        # Refresh tokens are only good at /api/auth/refresh
+        if username is None or payload.get("typ") == "refresh":
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == username).first()
-    if user is None:
+    if payload.get("jti") in revocation_set:
         raise credentials_exception
-    return user 
\ No newline at end of file
+
+    exp = payload.get("exp")
+    principal = principal_cache.get(username, exp)
+    if principal is not None:
+        return principal
+
+    principal = principal_from_claims(payload)
+    if principal is None:
+        user = await run_crud(db, crud.get_user_by_email, email=username)
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+    principal_cache.put(username, exp, principal)
+    return principal
+
+async def get_optional_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: Session = Depends(get_session)
+) -> Optional[Principal]:
+    """The caller if a valid bearer token was sent, otherwise None"""
+    if token is None:
+        return None
+    try:
+        principal = await resolve_principal(token, db)
+    except HTTPException as e:
+        if e.status_code == status.HTTP_401_UNAUTHORIZED:
+            return None
+        raise
+    # Replica reads in this request must include the user's own recent writes
+    require_consistency(user_key(principal.user_id))
+    return principal
+
+async def get_current_user(principal: Optional[Principal] = Depends(get_optional_user)):
+    # Resolved once per request, whether the rate limiter or the route asked first
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
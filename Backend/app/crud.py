@@ -1,18 +1,29 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, delete, tuple_, func, literal, literal_column, text
+from sqlalchemy.orm import Session, selectinload, joinedload, raiseload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from typing import List, Optional, Dict
 from datetime import datetime, timedelta
-from . import models, schemas
+from . import models, schemas, ticket_stats, events, partitions, audit, jobs
+import base64
+import json
 import logging
+import os
+from functools import wraps
 from .validators import TicketValidator
 from fastapi import HTTPException, status, Depends
 from .models import TicketStatus
+from .principal_cache import principal_cache
+from .profiling import current_operation
 
 logger = logging.getLogger(__name__)
 
 # Generic error handling decorator
 def db_operation_handler(func):
+    @wraps(func)
     def wrapper(*args, **kwargs):
+        # Lets the SQL profiler attribute statements to the crud function issuing them
+        token = current_operation.set(func.__name__)
         try:
             return func(*args, **kwargs)
         except IntegrityError as e:
@@ -21,13 +32,109 @@ def db_operation_handler(func):
         except SQLAlchemyError as e:
             logger.error(f"Database error in {func.__name__}: {str(e)}")
             raise HTTPException(status_code=500, detail="Database operation failed")
+        finally:
+            current_operation.reset(token)
     return wrapper
 
+# Ticket Includes
+# Maps a requested include to the relationship it loads and the loader strategy:
+# many-to-one relations join into the main query, collections load in one IN query each.
+TICKET_INCLUDES = {
+    "location": ("location", joinedload),
+    "creator": ("creator", joinedload),
+    "assignee": ("assignee", joinedload),
+    "severity": ("severity", joinedload),
+    "comments": ("comments", selectinload),
+    "attachments": ("attachments", selectinload),
+    "followups": ("followup_tasks", selectinload),
+}
+
+def parse_includes(include: Optional[str]) -> List[str]:
+    """Split a comma-separated include parameter, rejecting unknown names"""
+    if not include:
+        return []
+    includes = [name.strip() for name in include.split(",") if name.strip()]
+    unknown = [name for name in includes if name not in TICKET_INCLUDES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(unknown)}")
+    return includes
+
+def ticket_load_options(model, includes: Optional[List[str]] = None) -> list:
+    """Loader options for a ticket query; anything not included raises instead of lazy loading.
+
+    Unloaded relationships serialize as null through serialization.row_serializer.
+    """
+    options = []
+    for name in includes or []:
+        attr_name, loader = TICKET_INCLUDES[name]
+        attr = getattr(model, attr_name, None)
+        # Includes that don't apply to this ticket type are skipped
+        if attr is not None:
+            options.append(loader(attr))
+    options.append(raiseload("*"))
+    return options
+
+# Ticket Events
+# Event ticket_type per ticket table
+TICKET_EVENT_TYPES = {
+    "tickets": "regular",
+    "emergency_tickets": "emergency",
+    "maintenance_tickets": "maintenance",
+}
+
+def ticket_model_event(event: str, ticket, organization_id: Optional[int] = None, **data) -> dict:
+    """Event for a ticket row; tickets without their own organization_id pass it in"""
+    return events.ticket_event(
+        event,
+        ticket.ticket_id,
+        getattr(ticket, "organization_id", None) or organization_id,
+        ticket.location_id,
+        status=getattr(ticket.status, "value", ticket.status),
+        ticket_type=TICKET_EVENT_TYPES[ticket.__tablename__],
+        **data
+    )
+
+def ticket_audit_entry(
+    ticket,
+    action: str,
+    before: Optional[dict] = None,
+    performed_by: Optional[int] = None
+) -> dict:
+    """Audit entry for a ticket row, diffing the fields of the before snapshot (or the creation fields)"""
+    fields = before.keys() if before is not None else audit.CREATED_FIELDS
+    return audit.audit_entry(
+        TICKET_EVENT_TYPES[ticket.__tablename__],
+        ticket.ticket_id,
+        action,
+        audit.diff(before or {}, audit.snapshot(ticket, fields)),
+        performed_by
+    )
+
+def attachment_audit_entry(ticket, attachment_id: int, uploaded_by: int) -> dict:
+    """performed_by references staff, so the uploading user is recorded in the changes instead"""
+    return audit.audit_entry(
+        TICKET_EVENT_TYPES[ticket.__tablename__],
+        ticket.ticket_id,
+        "attached",
+        {
+            "attachment_id": {"old": None, "new": attachment_id},
+            "uploaded_by": {"old": None, "new": uploaded_by}
+        }
+    )
+
+def location_organization_id(db: Session, location_id: int) -> Optional[int]:
+    location = db.get(models.Location, location_id)
+    return location.organization_id if location else None
+
 # Staff Operations
 @db_operation_handler
 def create_staff(db: Session, staff: schemas.StaffCreate) -> models.Staff:
     db_staff = models.Staff(**staff.dict())
     db.add(db_staff)
+    db.flush()
+    db.execute(events.ticket_events_statement([
+        events.staff_event("staff_updated", db_staff.staff_id, db_staff.organization_id)
+    ]))
     db.commit()
     db.refresh(db_staff)
     return db_staff
@@ -48,15 +155,205 @@ def get_available_staff(db: Session, skill_category: Optional[str] = None) -> Li
         )
     return query.all()
 
+@db_operation_handler
+def release_staff(db: Session, staff_id: int) -> Optional[models.Staff]:
+    staff = db.query(models.Staff).filter(models.Staff.staff_id == staff_id).first()
+    if staff:
+        staff.is_on_job = False
+        db.execute(events.ticket_events_statement([
+            events.staff_event("staff_released", staff_id, staff.organization_id)
+        ]))
+        db.commit()
+        db.refresh(staff)
+    return staff
+
+@db_operation_handler
+def update_staff_position(db: Session, staff_id: int, latitude: float, longitude: float) -> Optional[models.Staff]:
+    staff = db.query(models.Staff).filter(
+        models.Staff.staff_id == staff_id,
+        models.Staff.is_deleted == False
+    ).first()
+    if staff:
+        staff.latitude = latitude
+        staff.longitude = longitude
+        staff.position_updated_at = datetime.utcnow()
+        db.execute(events.ticket_events_statement([events.staff_event(
+            "staff_moved", staff_id, staff.organization_id, latitude=latitude, longitude=longitude
+        )]))
+        db.commit()
+        db.refresh(staff)
+    return staff
+
+def emergency_ticket_criteria(ticket_id: int, organization_id: Optional[int] = None) -> list:
+    """Criteria for one emergency ticket; the organization lets PostgreSQL prune to one partition"""
+    criteria = [models.EmergencyTicket.ticket_id == ticket_id]
+    if organization_id is not None:
+        criteria.append(models.EmergencyTicket.organization_id == organization_id)
+    return criteria
+
+@db_operation_handler
+def get_emergency_ticket(
+    db: Session,
+    ticket_id: int,
+    organization_id: Optional[int] = None
+) -> Optional[models.EmergencyTicket]:
+    return db.query(models.EmergencyTicket).filter(
+        *emergency_ticket_criteria(ticket_id, organization_id),
+        models.EmergencyTicket.is_deleted == False
+    ).first()
+
+@db_operation_handler
+def load_dispatch_staff(db: Session, staff_id: Optional[int] = None) -> List[tuple]:
+    """Rows for the dispatch index: (staff_id, organization_id, availability, is_on_job, latitude, longitude, category, level)"""
+    return db.execute(dispatch_staff_query(staff_id)).all()
+
+def dispatch_staff_query(staff_id: Optional[int] = None):
+    query = select(
+        models.Staff.staff_id,
+        models.Staff.organization_id,
+        models.Staff.availability,
+        models.Staff.is_on_job,
+        models.Staff.latitude,
+        models.Staff.longitude,
+        models.StaffSkill.category,
+        models.StaffSkill.level
+    ).outerjoin(
+        models.StaffSkill, models.StaffSkill.staff_id == models.Staff.staff_id
+    ).where(
+        models.Staff.is_deleted == False,
+        models.Staff.is_active == True
+    )
+    if staff_id is not None:
+        query = query.where(models.Staff.staff_id == staff_id)
+    return query
+
+# Triage Operations
+DEFAULT_RESPONSE_TIME_THRESHOLD = int(os.getenv("DEFAULT_RESPONSE_TIME_THRESHOLD", "60"))  # minutes
+
+def triage_tickets_query(ticket_ids: Optional[List[int]] = None):
+    """Pending emergency tickets with their SLA deadline from IncidentSeverity"""
+    threshold = func.coalesce(
+        models.IncidentSeverity.response_time_threshold, DEFAULT_RESPONSE_TIME_THRESHOLD
+    )
+    query = select(
+        models.EmergencyTicket.ticket_id,
+        models.EmergencyTicket.organization_id,
+        (models.EmergencyTicket.created_at + func.make_interval(0, 0, 0, 0, 0, threshold)).label("deadline"),
+        func.coalesce(models.IncidentSeverity.escalation_required, False).label("escalation_required"),
+        models.EmergencyTicket.escalated_at
+    ).outerjoin(
+        models.IncidentSeverity,
+        models.IncidentSeverity.severity_id == models.EmergencyTicket.severity_id
+    ).where(
+        models.EmergencyTicket.status == TicketStatus.PENDING.value,
+        models.EmergencyTicket.is_deleted == False
+    )
+    if ticket_ids is not None:
+        query = query.where(models.EmergencyTicket.ticket_id.in_(ticket_ids))
+    return query
+
+def escalation_statement(ticket_id: int, organization_id: Optional[int] = None):
+    # Conditional so exactly one worker wins when several fire the same deadline
+    return update(models.EmergencyTicket).where(
+        *emergency_ticket_criteria(ticket_id, organization_id),
+        models.EmergencyTicket.status == TicketStatus.PENDING.value,
+        models.EmergencyTicket.escalated_at.is_(None)
+    ).values(escalated_at=datetime.utcnow()).returning(
+        models.EmergencyTicket.organization_id,
+        models.EmergencyTicket.location_id,
+        models.EmergencyTicket.severity_id,
+        models.EmergencyTicket.escalated_at
+    )
+
+def escalation_event(ticket_id: int, row, severity: Optional[models.IncidentSeverity]) -> dict:
+    return events.ticket_event(
+        "escalated", ticket_id, row.organization_id, row.location_id,
+        ticket_type="emergency",
+        notification_groups=severity.notification_groups if severity else []
+    )
+
+def escalation_audit_entry(ticket_id: int, row) -> dict:
+    return audit.audit_entry(
+        "emergency", ticket_id, "escalated",
+        {"escalated_at": {"old": None, "new": row.escalated_at.isoformat()}}
+    )
+
+@db_operation_handler
+def load_triage_tickets(db: Session, ticket_ids: Optional[List[int]] = None) -> List[tuple]:
+    return db.execute(triage_tickets_query(ticket_ids)).all()
+
+@db_operation_handler
+def escalate_emergency_ticket(db: Session, ticket_id: int, organization_id: Optional[int] = None) -> bool:
+    """Mark a ticket escalated and notify, unless it was already escalated or dispatched"""
+    row = db.execute(escalation_statement(ticket_id, organization_id)).first()
+    if row is None:
+        db.rollback()
+        return False
+    severity = db.get(models.IncidentSeverity, row.severity_id) if row.severity_id else None
+    db.execute(events.ticket_events_statement([escalation_event(ticket_id, row, severity)]))
+    db.execute(audit.audit_outbox_statement([escalation_audit_entry(ticket_id, row)]))
+    db.commit()
+    return True
+
 # Location Operations
+LOCATION_MATCH_THRESHOLD = float(os.getenv("LOCATION_MATCH_THRESHOLD", "0.4"))
+
+def apply_location_parent(location: models.Location, parent: Optional[models.Location]):
+    """Derive the hierarchy path and any missing coordinates from the parent location"""
+    if parent is None:
+        location.full_name = location.name
+        return
+    if parent.organization_id != location.organization_id:
+        raise HTTPException(status_code=400, detail="Parent location belongs to another organization")
+    location.full_name = f"{parent.full_name or parent.name} / {location.name}"
+    if location.latitude is None or location.longitude is None:
+        location.latitude, location.longitude = parent.latitude, parent.longitude
+
 @db_operation_handler
 def create_location(db: Session, location: schemas.LocationCreate) -> models.Location:
     db_location = models.Location(**location.dict())
+    parent = db.get(models.Location, db_location.parent_id) if db_location.parent_id else None
+    if db_location.parent_id and parent is None:
+        raise HTTPException(status_code=404, detail="Parent location not found")
+    apply_location_parent(db_location, parent)
     db.add(db_location)
+    db.flush()
+    db.execute(events.ticket_events_statement([events.organization_event(
+        "location_created", db_location.organization_id, location_id=db_location.location_id
+    )]))
     db.commit()
     db.refresh(db_location)
     return db_location
 
+def location_match_query(organization_id: int, query: str, limit: int = 5):
+    """Locations whose path contains words similar to the query, best first; served by the trigram index"""
+    score = func.word_similarity(query, models.Location.full_name)
+    return select(models.Location, score.label("score")).where(
+        models.Location.organization_id == organization_id,
+        models.Location.is_deleted == False,
+        literal(query).op("<%")(models.Location.full_name)
+    ).order_by(score.desc(), models.Location.location_id).limit(limit)
+
+@db_operation_handler
+def match_locations(db: Session, organization_id: int, query: str, limit: int = 5) -> List[tuple]:
+    return db.execute(location_match_query(organization_id, query, limit)).all()
+
+def resolve_ticket_location(db: Session, ticket: models.EmergencyTicket):
+    """Point a ticket reported with only a typed location at the best matching Location"""
+    if ticket.location_id is not None or not ticket.user_input_location or ticket.organization_id is None:
+        return
+    match = db.execute(location_match_query(ticket.organization_id, ticket.user_input_location, 1)).first()
+    if match is not None and match.score >= LOCATION_MATCH_THRESHOLD:
+        ticket.location_id = match.Location.location_id
+        ticket.matched_location = match.Location.full_name
+
+@db_operation_handler
+def get_location_coordinates(db: Session, location_id: int) -> Optional[tuple]:
+    location = db.get(models.Location, location_id)
+    if location is None or location.latitude is None or location.longitude is None:
+        return None
+    return location.latitude, location.longitude
+
 @db_operation_handler
 def get_organization_locations(
     db: Session, 
@@ -77,16 +374,18 @@ def create_emergency_ticket(
 ) -> models.EmergencyTicket:
     db_ticket = models.EmergencyTicket(**ticket.dict())
     db_ticket.created_at = datetime.utcnow()
-    
-    # Create associated ticket log
-    ticket_log = models.TicketLog(
-        ticket_id=db_ticket.ticket_id,
-        action="created",
-        log_timestamp=datetime.utcnow()
-    )
+    resolve_ticket_location(db, db_ticket)
+    if db_ticket.organization_id is None:
+        db_ticket.organization_id = location_organization_id(db, db_ticket.location_id)
     
     db.add(db_ticket)
-    db.add(ticket_log)
+    db.flush()
+    db.execute(audit.audit_outbox_statement([ticket_audit_entry(db_ticket, "created")]))
+    for statement in ticket_stats.ticket_created_statements(
+        [(db_ticket.organization_id, db_ticket.emergency_type, db_ticket.status)]
+    ):
+        db.execute(statement)
+    db.execute(events.ticket_events_statement([ticket_model_event("created", db_ticket)]))
     db.commit()
     db.refresh(db_ticket)
     return db_ticket
@@ -96,33 +395,50 @@ def assign_emergency_ticket(
     db: Session,
     ticket_id: int,
     staff_id: int,
-    estimated_response_time: int
+    estimated_response_time: int,
+    includes: Optional[List[str]] = None,
+    organization_id: Optional[int] = None
 ) -> models.EmergencyTicket:
-    ticket = db.query(models.EmergencyTicket).filter(
-        models.EmergencyTicket.ticket_id == ticket_id
-    ).first()
+    ticket = db.query(models.EmergencyTicket).options(
+        *ticket_load_options(models.EmergencyTicket, includes)
+    ).filter(
+        *emergency_ticket_criteria(ticket_id, organization_id)
+    ).with_for_update(of=models.EmergencyTicket).first()
     
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
+
+    # Lock the responder so two dispatchers can never take the same person
+    staff = db.query(models.Staff).filter(
+        models.Staff.staff_id == staff_id,
+        models.Staff.is_deleted == False,
+        # Only the ticket's own organization's responders can be dispatched to it
+        models.Staff.organization_id == ticket.organization_id
+    ).with_for_update(skip_locked=True).first()
+    if staff is None or staff.is_on_job:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Staff member is not available")
+    staff.is_on_job = True
         
+    before = audit.snapshot(ticket, audit.ASSIGNMENT_FIELDS)
+    old_status = ticket.status
+    response_seconds = None
+    if ticket.assigned_at is None:
+        ticket.assigned_at = datetime.utcnow()
+        response_seconds = int((ticket.assigned_at - ticket.created_at).total_seconds())
     ticket.assigned_staff_id = staff_id
     ticket.estimated_response_time = estimated_response_time
     ticket.status = "assigned"
-    
-    # Update staff status
-    staff = db.query(models.Staff).filter(models.Staff.staff_id == staff_id).first()
-    if staff:
-        staff.is_on_job = True
-    
-    # Log the assignment
-    ticket_log = models.TicketLog(
-        ticket_id=ticket_id,
-        action="assigned",
-        performed_by=staff_id,
-        log_timestamp=datetime.utcnow()
-    )
-    
-    db.add(ticket_log)
+    for statement in ticket_stats.status_change_statements(
+        ticket.organization_id, old_status, ticket.status, response_seconds
+    ):
+        db.execute(statement)
+    db.execute(events.ticket_events_statement([
+        ticket_model_event("assigned", ticket, staff_id=staff_id)
+    ]))
+    db.execute(audit.audit_outbox_statement([
+        ticket_audit_entry(ticket, "assigned", before, performed_by=staff_id)
+    ]))
     db.commit()
     db.refresh(ticket)
     return ticket
@@ -139,6 +455,7 @@ def update_organization(
         update_data = updates.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_organization, key, value)
+        db.execute(events.ticket_events_statement([events.organization_event("organization_updated", organization_id)]))
         db.commit()
         db.refresh(db_organization)
     return db_organization
@@ -161,7 +478,9 @@ def soft_delete_organization(
         
         # Mark organization as deleted
         db_organization.is_deleted = True
+        db.execute(events.ticket_events_statement([events.organization_event("organization_deleted", organization_id)]))
         db.commit()
+        principal_cache.invalidate_organization(organization_id)
         return True
     return False
 
@@ -171,20 +490,80 @@ def get_organization_ticket_stats(
     db: Session,
     organization_id: int
 ) -> dict:
-    total_tickets = db.query(models.EmergencyTicket).filter(
-        models.EmergencyTicket.organization_id == organization_id
-    ).count()
-    
-    open_tickets = db.query(models.EmergencyTicket).filter(
-        models.EmergencyTicket.organization_id == organization_id,
-        models.EmergencyTicket.status.in_(["pending", "assigned"])
-    ).count()
-    
-    return {
-        "total_tickets": total_tickets,
-        "open_tickets": open_tickets,
-        "resolution_rate": (total_tickets - open_tickets) / total_tickets if total_tickets > 0 else 0
-    }
+    # Served from the incrementally maintained counters, never from the ticket tables
+    stats = db.execute(ticket_stats.stats_query(organization_id)).scalars().first()
+    type_counts = db.execute(ticket_stats.type_counts_query(organization_id)).all()
+    return ticket_stats.build_ticket_stats(stats, type_counts)
+
+@db_operation_handler
+def rebuild_ticket_stats(db: Session, organization_id: Optional[int] = None) -> None:
+    """Reconcile the statistics counters with emergency_tickets"""
+    for statement in ticket_stats.rebuild_statements(organization_id):
+        db.execute(statement)
+    db.commit()
+
+# Partition Maintenance
+@db_operation_handler
+def ensure_log_partitions(db: Session, months_ahead: int = partitions.LOG_PARTITION_MONTHS_AHEAD) -> None:
+    """Create the monthly enhanced_ticket_logs partitions before rows arrive for them"""
+    for statement in partitions.monthly_partition_statements(models.EnhancedTicketLog.__tablename__, months_ahead):
+        db.execute(text(statement))
+    db.commit()
+
+@db_operation_handler
+def prune_log_partitions(db: Session, retention_months: int = audit.AUDIT_RETENTION_MONTHS) -> List[str]:
+    """Drop monthly enhanced_ticket_logs partitions that fell out of the retention window"""
+    if retention_months <= 0:
+        return []
+    table = models.EnhancedTicketLog.__tablename__
+    names = db.execute(text(partitions.PARTITION_NAMES_SQL), {"table": table}).scalars().all()
+    expired = partitions.expired_monthly_partitions(table, names, retention_months)
+    for name in expired:
+        db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    db.commit()
+    return expired
+
+# Audit Operations
+@db_operation_handler
+def flush_audit_outbox(db: Session, batch_size: int = audit.AUDIT_FLUSH_BATCH_SIZE) -> int:
+    """Move one batch from the outbox into enhanced_ticket_logs; returns the number moved"""
+    moved = db.execute(audit.audit_flush_statement(batch_size)).rowcount
+    db.commit()
+    return moved
+
+# Scheduled Jobs
+@db_operation_handler
+def run_job_batch(db: Session, job_name: str, batch_size: int = jobs.JOB_BATCH_SIZE) -> jobs.JobResult:
+    """Claim one batch of due rows and run it; rows that fail are retried later with backoff"""
+    job = jobs.JOBS[job_name]
+    now = datetime.utcnow()
+    rows = db.execute(job.claim(batch_size, now)).all()
+    result = jobs.JobResult(claimed=len(rows))
+    if not rows:
+        return result
+    try:
+        # The whole batch set-based first; only a failure pays for a savepoint per row
+        with db.begin_nested():
+            for statement in job.statements(rows, now):
+                db.execute(statement)
+        result.succeeded = len(rows)
+    except (SQLAlchemyError, ValueError) as e:
+        logger.warning(f"Job {job_name} batch failed, running rows one by one: {str(e)}")
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    for statement in job.statements([row], now):
+                        db.execute(statement)
+                result.succeeded += 1
+            except (SQLAlchemyError, ValueError) as e:
+                values = jobs.retry_values(job, row.attempts, str(e), now)
+                db.execute(update(job.model).where(getattr(job.model, job.key) == row.key).values(**values))
+                if values[job.run_at] is None:
+                    result.exhausted += 1
+                else:
+                    result.retried += 1
+    db.commit()
+    return result
 
 @db_operation_handler
 def create_ticket(db: Session, ticket_data: dict) -> models.TicketBase:
@@ -207,6 +586,9 @@ def create_ticket(db: Session, ticket_data: dict) -> models.TicketBase:
             status=initial_status,
             required_fields_status=completion_status
         )
+        resolve_ticket_location(db, db_ticket)
+        if db_ticket.organization_id is None:
+            db_ticket.organization_id = location_organization_id(db, db_ticket.location_id)
     else:
         db_ticket = models.MaintenanceTicket(
             **ticket_data,
@@ -215,28 +597,33 @@ def create_ticket(db: Session, ticket_data: dict) -> models.TicketBase:
         )
     
     db.add(db_ticket)
+    db.flush()
+    if ticket_type == "emergency":
+        for statement in ticket_stats.ticket_created_statements(
+            [(db_ticket.organization_id, db_ticket.emergency_type, db_ticket.status)]
+        ):
+            db.execute(statement)
+    organization_id = (None if ticket_type == "emergency"
+                       else location_organization_id(db, db_ticket.location_id))
+    db.execute(events.ticket_events_statement([
+        ticket_model_event("created", db_ticket, organization_id)
+    ]))
+    db.execute(audit.audit_outbox_statement([ticket_audit_entry(db_ticket, "created")]))
     db.commit()
     db.refresh(db_ticket)
     
     # Create follow-up task if incomplete
     if initial_status == TicketStatus.INCOMPLETE:
         missing_fields = [f for f, v in completion_status.items() if not v]
-        create_followup_task(db, db_ticket.ticket_id, missing_fields)
+        create_followup_task(db, {
+            "ticket_id": db_ticket.ticket_id,
+            "missing_fields": missing_fields,
+            "due_date": datetime.utcnow() + timedelta(days=1),
+            "priority": "high" if "emergency_level" in missing_fields else "medium"
+        })
     
     return db_ticket
 
-def create_followup_task(db: Session, ticket_id: int, missing_fields: Dict[str, bool]):
-    """Create a follow-up task for incomplete tickets"""
-    missing = [field for field, complete in missing_fields.items() if not complete]
-    task = models.FollowUpTask(
-        ticket_id=ticket_id,
-        missing_fields=missing,
-        due_date=datetime.utcnow() + timedelta(days=1),
-        priority="high" if "emergency_level" in missing else "medium"
-    )
-    db.add(task)
-    db.commit()
-
 # FollowUpTask Operations
 @db_operation_handler
 def create_followup_task(db: Session, task_data: dict) -> models.FollowUpTask:
@@ -257,6 +644,10 @@ def get_followup_tasks(db: Session, ticket_id: int) -> List[models.FollowUpTask]
 def create_staff_skill(db: Session, skill_data: dict) -> models.StaffSkill:
     db_skill = models.StaffSkill(**skill_data)
     db.add(db_skill)
+    db.flush()
+    db.execute(events.ticket_events_statement([
+        events.staff_event("staff_updated", db_skill.staff_id, None)
+    ]))
     db.commit()
     db.refresh(db_skill)
     return db_skill
@@ -282,3 +673,589 @@ def get_incident_severities(db: Session) -> List[models.IncidentSeverity]:
 
 def get_organization(db: Session, organization_id: int):
     return db.query(models.Organization).filter(models.Organization.organization_id == organization_id).first()
+
+@db_operation_handler
+def create_organization(db: Session, organization: schemas.OrganizationCreate) -> models.Organization:
+    db_organization = models.Organization(**organization.dict())
+    db.add(db_organization)
+    db.commit()
+    db.refresh(db_organization)
+    return db_organization
+
+# User Operations
+@db_operation_handler
+def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
+    return db.query(models.User).filter(
+        models.User.email == email,
+        models.User.is_deleted == False
+    ).first()
+
+@db_operation_handler
+def create_user(
+    db: Session,
+    name: str,
+    email: str,
+    password_hash: str,
+    role: str,
+    organization_id: int,
+    identifier: Optional[str] = None
+) -> models.User:
+    db_user = models.User(
+        name=name,
+        email=email,
+        password_hash=password_hash,
+        role=role,
+        organization_id=organization_id,
+        identifier=identifier
+    )
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+@db_operation_handler
+def update_password_hash(db: Session, user_id: int, password_hash: str) -> None:
+    db.execute(update(models.User).where(models.User.user_id == user_id).values(password_hash=password_hash))
+    db.commit()
+
+@db_operation_handler
+def update_user(db: Session, user_id: int, updates: schemas.UserUpdate) -> Optional[models.User]:
+    db_user = db.query(models.User).filter(models.User.user_id == user_id).first()
+    if db_user:
+        previous_email = db_user.email
+        update_data = updates.dict(exclude_unset=True)
+        for key, value in update_data.items():
+            column = models.User.__table__.columns.get(key)
+            # Only real columns, and an explicit null never overwrites a NOT NULL one
+            if column is None or (value is None and not column.nullable):
+                continue
+            setattr(db_user, key, value)
+        db.execute(events.ticket_events_statement([events.principal_invalidated_event(previous_email)]))
+        db.commit()
+        db.refresh(db_user)
+        # Other workers invalidate on the event; this one shouldn't wait for it
+        principal_cache.invalidate_user(previous_email)
+    return db_user
+
+@db_operation_handler
+def soft_delete_user(db: Session, user_id: int) -> bool:
+    db_user = db.query(models.User).filter(models.User.user_id == user_id).first()
+    if db_user:
+        db_user.is_deleted = True
+        db.execute(events.ticket_events_statement([events.principal_invalidated_event(db_user.email)]))
+        db.commit()
+        principal_cache.invalidate_user(db_user.email)
+        return True
+    return False
+
+# Token Operations
+def token_revocation_statements(access_tokens: List[tuple]) -> list:
+    """Record revoked access tokens and tell every worker, in the caller's transaction"""
+    return [
+        pg_insert(models.RevokedToken).values([
+            {"jti": jti, "expires_at": expires_at} for jti, expires_at in access_tokens
+        ]).on_conflict_do_nothing(),
+        events.ticket_events_statement([
+            events.token_revoked_event(jti, expires_at) for jti, expires_at in access_tokens
+        ])
+    ]
+
+def refresh_family_revocation(family_id: str, now: datetime):
+    """Revoke a refresh family's live tokens, returning the access tokens issued with them"""
+    token = models.RefreshToken
+    return update(token).where(
+        token.family_id == family_id,
+        token.revoked_at.is_(None)
+    ).values(revoked_at=now).returning(token.access_jti, token.access_expires_at)
+
+def live_access_tokens(rows, now: datetime) -> List[tuple]:
+    return [(jti, expires_at) for jti, expires_at in rows if expires_at > now]
+
+@db_operation_handler
+def create_refresh_token(db: Session, user_id: int, family_id: str, **token) -> None:
+    db.add(models.RefreshToken(user_id=user_id, family_id=family_id, **token))
+    db.commit()
+
+@db_operation_handler
+def rotate_refresh_token(db: Session, jti: str, replacement: dict) -> Optional[models.User]:
+    """Swap a refresh token for its replacement and return the user.
+
+    None when the token is unknown, expired or revoked. Presenting a token that
+    was already rotated means it leaked, so its whole family is revoked.
+    """
+    now = datetime.utcnow()
+    token = db.execute(
+        select(models.RefreshToken).where(models.RefreshToken.jti == jti).with_for_update()
+    ).scalars().first()
+    if token is None or token.expires_at <= now or token.revoked_at is not None:
+        return None
+    if token.used_at is not None:
+        logger.warning(f"Refresh token reuse for user {token.user_id}, revoking family {token.family_id}")
+        access_tokens = live_access_tokens(db.execute(refresh_family_revocation(token.family_id, now)).all(), now)
+        if access_tokens:
+            for statement in token_revocation_statements(access_tokens):
+                db.execute(statement)
+        db.commit()
+        return None
+    user = db.get(models.User, token.user_id)
+    if user is None or user.is_deleted:
+        return None
+    token.used_at = now
+    db.add(models.RefreshToken(user_id=token.user_id, family_id=token.family_id, **replacement))
+    db.commit()
+    return user
+
+@db_operation_handler
+def revoke_tokens(db: Session, access_tokens: List[tuple], family_id: Optional[str] = None) -> None:
+    """Revoke access tokens, and with family_id every token in that refresh family"""
+    now = datetime.utcnow()
+    access_tokens = live_access_tokens(access_tokens, now)
+    if family_id is not None:
+        access_tokens += live_access_tokens(db.execute(refresh_family_revocation(family_id, now)).all(), now)
+    if access_tokens:
+        for statement in token_revocation_statements(access_tokens):
+            db.execute(statement)
+    db.commit()
+
+@db_operation_handler
+def get_revoked_tokens(db: Session, now: datetime) -> List[tuple]:
+    return [
+        tuple(row) for row in db.execute(
+            select(models.RevokedToken.jti, models.RevokedToken.expires_at).where(models.RevokedToken.expires_at > now)
+        ).all()
+    ]
+
+@db_operation_handler
+def prune_revoked_tokens(db: Session, now: datetime) -> None:
+    db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at <= now))
+    db.execute(delete(models.RefreshToken).where(models.RefreshToken.expires_at <= now))
+    db.commit()
+
+# Ticket Activity Operations
+@db_operation_handler
+def create_comment(db: Session, ticket_id: int, user_id: int, content: str) -> models.Comment:
+    ticket = get_ticket(db, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    db_comment = models.Comment(ticket_id=ticket_id, user_id=user_id, content=content)
+    db.add(db_comment)
+    db.flush()
+    db.execute(events.ticket_events_statement([ticket_model_event(
+        "commented", ticket, location_organization_id(db, ticket.location_id),
+        comment_id=db_comment.comment_id, user_id=user_id
+    )]))
+    db.execute(audit.audit_outbox_statement([audit.audit_entry(
+        TICKET_EVENT_TYPES[ticket.__tablename__], ticket_id, "commented",
+        {"comment_id": {"old": None, "new": db_comment.comment_id}}
+    )]))
+    db.commit()
+    db.refresh(db_comment)
+    return db_comment
+
+@db_operation_handler
+def create_attachment(
+    db: Session,
+    ticket: models.Ticket,
+    file_name: str,
+    file_type: str,
+    file_size: int,
+    file_path: str,
+    content_hash: str,
+    uploaded_by: int
+) -> models.Attachment:
+    db_attachment = models.Attachment(
+        ticket_id=ticket.ticket_id,
+        file_name=file_name,
+        file_type=file_type,
+        file_size=file_size,
+        file_path=file_path,
+        content_hash=content_hash,
+        uploaded_by=uploaded_by
+    )
+    db.add(db_attachment)
+    db.flush()
+    db.execute(events.ticket_events_statement([ticket_model_event(
+        "attached", ticket,
+        attachment_id=db_attachment.attachment_id, user_id=uploaded_by
+    )]))
+    db.execute(audit.audit_outbox_statement([
+        attachment_audit_entry(ticket, db_attachment.attachment_id, uploaded_by)
+    ]))
+    db.commit()
+    db.refresh(db_attachment)
+    return db_attachment
+
+@db_operation_handler
+def get_attachment(db: Session, attachment_id: int) -> Optional[tuple]:
+    """(attachment, organization_id of its ticket)"""
+    return db.execute(
+        select(models.Attachment, models.Ticket.organization_id)
+        .join(models.Ticket, models.Ticket.ticket_id == models.Attachment.ticket_id)
+        .where(models.Attachment.attachment_id == attachment_id, models.Ticket.is_deleted == False)
+    ).first()
+
+@db_operation_handler
+def update_ticket_status(db: Session, ticket_id: int, new_status: str) -> models.Ticket:
+    ticket = get_ticket(db, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    if not TicketValidator.validate_ticket_update(ticket.status, new_status):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid status transition from {ticket.status} to {new_status}"
+        )
+    before = audit.snapshot(ticket, audit.STATUS_FIELDS)
+    old_status = ticket.status
+    ticket.status = new_status
+    db.execute(events.ticket_events_statement([ticket_model_event(
+        "status_changed", ticket, location_organization_id(db, ticket.location_id),
+        previous_status=old_status
+    )]))
+    db.execute(audit.audit_outbox_statement([ticket_audit_entry(ticket, "status_changed", before)]))
+    db.commit()
+    db.refresh(ticket)
+    return ticket
+
+# Ticket Listing Operations
+def legacy_tickets_query(includes: Optional[List[str]] = None, organization_id: Optional[int] = None):
+    """Unpaginated listing behind the v1/v2 routes; organization_id scopes it to one tenant"""
+    query = select(models.Ticket).options(
+        *ticket_load_options(models.Ticket, includes)
+    ).where(models.Ticket.is_deleted == False)
+    if organization_id is not None:
+        query = query.where(models.Ticket.organization_id == organization_id)
+    return query
+
+@db_operation_handler
+def get_tickets_basic(
+    db: Session,
+    includes: Optional[List[str]] = None,
+    organization_id: Optional[int] = None
+) -> List[models.Ticket]:
+    return db.execute(legacy_tickets_query(includes, organization_id)).scalars().all()
+
+def advanced_includes(
+    include_followups: bool = False,
+    include_severity: bool = False,
+    includes: Optional[List[str]] = None
+) -> List[str]:
+    """Merge the legacy v2 include flags into an include list"""
+    includes = list(includes or [])
+    if include_followups:
+        includes.append("followups")
+    if include_severity:
+        includes.append("severity")
+    return includes
+
+@db_operation_handler
+def get_tickets_advanced(
+    db: Session,
+    include_followups: bool = False,
+    include_severity: bool = False,
+    includes: Optional[List[str]] = None,
+    organization_id: Optional[int] = None
+) -> List[models.Ticket]:
+    includes = advanced_includes(include_followups, include_severity, includes)
+    return db.execute(legacy_tickets_query(includes, organization_id)).scalars().all()
+
+@db_operation_handler
+def get_ticket(db: Session, ticket_id: int, includes: Optional[List[str]] = None) -> Optional[models.Ticket]:
+    return db.query(models.Ticket).options(
+        *ticket_load_options(models.Ticket, includes)
+    ).filter(
+        models.Ticket.ticket_id == ticket_id,
+        models.Ticket.is_deleted == False
+    ).first()
+
+
+# Keyset Ticket Listing
+def encode_ticket_cursor(ticket: models.Ticket) -> str:
+    """Encode the (created_at, ticket_id) position of a ticket as an opaque cursor"""
+    raw = json.dumps([ticket.created_at.isoformat(), ticket.ticket_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_ticket_cursor(cursor: str):
+    try:
+        created_at, ticket_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(ticket_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def build_ticket_list_query(
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    location_id: Optional[int] = None,
+    organization_id: Optional[int] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 25,
+    includes: Optional[List[str]] = None
+):
+    """Build a keyset-paginated ticket query ordered newest first by (created_at, ticket_id).
+
+    One extra row is fetched so callers can tell whether another page exists.
+    """
+    query = select(models.Ticket).options(
+        *ticket_load_options(models.Ticket, includes)
+    ).where(models.Ticket.is_deleted == False)
+    if status:
+        query = query.where(models.Ticket.status == status)
+    if priority:
+        query = query.where(models.Ticket.priority == priority)
+    if location_id is not None:
+        query = query.where(models.Ticket.location_id == location_id)
+    if organization_id is not None:
+        query = query.where(models.Ticket.organization_id == organization_id)
+    if search:
+        query = query.where(models.TICKET_SEARCH_VECTOR.op("@@")(
+            func.plainto_tsquery(literal_column("'english'::regconfig"), search)
+        ))
+    if cursor:
+        created_at, ticket_id = decode_ticket_cursor(cursor)
+        query = query.where(
+            tuple_(models.Ticket.created_at, models.Ticket.ticket_id) < tuple_(created_at, ticket_id)
+        )
+    return query.order_by(
+        models.Ticket.created_at.desc(),
+        models.Ticket.ticket_id.desc()
+    ).limit(limit + 1)
+
+def build_ticket_page(tickets: List[models.Ticket], limit: int) -> dict:
+    has_more = len(tickets) > limit
+    tickets = tickets[:limit]
+    return {
+        "tickets": tickets,
+        "next_cursor": encode_ticket_cursor(tickets[-1]) if has_more else None,
+        "has_more": has_more
+    }
+
+@db_operation_handler
+def list_tickets(db: Session, limit: int = 25, **filters) -> dict:
+    tickets = db.execute(build_ticket_list_query(limit=limit, **filters)).scalars().all()
+    return build_ticket_page(tickets, limit)
+
+# Bulk Ticket Ingestion
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+# Set by the server, never taken from the payload: identity, tenancy, workflow state and dispatch
+BULK_SERVER_FIELDS = (
+    "ticket_id", "created_by", "organization_id", "status", "required_fields_status",
+    "created_at", "updated_at", "is_deleted", "assigned_staff_id", "assigned_at", "escalated_at"
+)
+
+def bulk_ticket_model(ticket_type: str):
+    """Emergency and maintenance tickets have their own tables; every other type is a regular ticket"""
+    if ticket_type == "emergency":
+        return models.EmergencyTicket
+    if ticket_type == "maintenance":
+        return models.MaintenanceTicket
+    return models.Ticket
+
+def bulk_location_ids(items: List[tuple]) -> set:
+    """Locations the items are filed against; each one's organization is checked before insert"""
+    return {
+        ticket_data.get("location_id") for _, ticket_data in items
+        if isinstance(ticket_data, dict) and isinstance(ticket_data.get("location_id"), int)
+    }
+
+def location_organizations_query(location_ids: set):
+    return select(models.Location.location_id, models.Location.organization_id).where(
+        models.Location.location_id.in_(location_ids)
+    )
+
+def prepare_bulk_tickets(
+    items: List[tuple],
+    created_by: Optional[int] = None,
+    location_organizations: Optional[Dict[int, int]] = None,
+    organization_id: Optional[int] = None
+):
+    """Validate (index, ticket_data) pairs and group the insertable rows.
+
+    location_organizations maps each known location to its organization; with
+    organization_id set, items filed against another organization's location
+    are rejected. Returns the per-item error results and a dict mapping
+    (model, columns) to a list of (index, row, completion_status) entries that
+    can share one INSERT.
+    """
+    location_organizations = location_organizations or {}
+    validator = TicketValidator()
+    errors = []
+    groups = {}
+    now = datetime.utcnow()
+    for index, ticket_data in items:
+        if not isinstance(ticket_data, dict):
+            errors.append({"index": index, "error": "Ticket must be a JSON object"})
+            continue
+        ticket_data = {key: value for key, value in ticket_data.items() if key not in BULK_SERVER_FIELDS}
+        ticket_type = ticket_data.pop("ticket_type", "emergency")
+        model = bulk_ticket_model(ticket_type)
+        if model is models.Ticket:
+            ticket_data["ticket_type"] = ticket_type
+        if created_by is not None:
+            ticket_data["created_by"] = created_by
+        location_id = ticket_data.get("location_id")
+        if location_id is not None:
+            if location_id not in location_organizations:
+                errors.append({"index": index, "error": f"Unknown location: {location_id}"})
+                continue
+            location_organization = location_organizations[location_id]
+            if organization_id is not None and location_organization != organization_id:
+                errors.append({"index": index, "error": "Not authorized for this location"})
+                continue
+            if model is not models.MaintenanceTicket and location_organization is not None:
+                # The emergency partition key and the regular tickets' denormalized tenant come from the location
+                ticket_data["organization_id"] = location_organization
+
+        completion_status = validator.validate_completion(
+            ticket_data, validator.get_required_fields(ticket_type)
+        )
+        initial_status = (TicketStatus.PENDING
+                         if all(completion_status.values())
+                         else TicketStatus.INCOMPLETE)
+
+        # Validator-only fields count toward completeness but are not stored
+        columns = model.__table__.columns
+        validator_fields = set(completion_status)
+        unknown = [key for key in ticket_data if key not in columns and key not in validator_fields]
+        ticket_data = {key: value for key, value in ticket_data.items() if key in columns}
+        missing = [
+            column.name for column in columns
+            if not column.nullable and column.default is None
+            and column.name not in ticket_data and column.name not in ("ticket_id", "status")
+        ]
+        if unknown or missing:
+            detail = []
+            if unknown:
+                detail.append(f"unknown fields: {', '.join(unknown)}")
+            if missing:
+                detail.append(f"missing fields: {', '.join(missing)}")
+            errors.append({"index": index, "error": "; ".join(detail)})
+            continue
+
+        row = {
+            **ticket_data,
+            "status": initial_status.value,
+            "required_fields_status": completion_status,
+            "created_at": now,
+            "updated_at": now
+        }
+        groups.setdefault((model, frozenset(row)), []).append((index, row, completion_status))
+    return errors, groups
+
+def ticket_insert_statement(model):
+    return insert(model).returning(model.ticket_id, sort_by_parameter_order=True)
+
+def bulk_side_rows(model, entries: List[tuple], inserted: List[tuple]):
+    """Build the audit outbox and FollowUpTask rows for freshly inserted tickets.
+
+    followup_tasks.ticket_id references tickets, so only rows of that table get follow-ups.
+    """
+    now = datetime.utcnow()
+    rows = {index: row for index, row, _ in entries}
+    log_rows = []
+    followup_rows = []
+    for index, ticket_id, completion_status in inserted:
+        log_rows.append(audit.audit_entry(
+            TICKET_EVENT_TYPES[model.__tablename__], ticket_id, "created",
+            audit.diff({}, {field: rows[index].get(field) for field in audit.CREATED_FIELDS})
+        ))
+        missing_fields = [f for f, v in completion_status.items() if not v]
+        if missing_fields and model is models.Ticket:
+            followup_rows.append({
+                "ticket_id": ticket_id,
+                "missing_fields": missing_fields,
+                "due_date": now + timedelta(days=1),
+                "priority": "high" if "emergency_level" in missing_fields else "medium",
+                "status": "pending",
+                "created_at": now
+            })
+    return log_rows, followup_rows
+
+def bulk_stats_statements(model, entries: List[tuple], inserted: List[tuple]) -> list:
+    if model is not models.EmergencyTicket:
+        return []
+    inserted_indexes = {index for index, _, _ in inserted}
+    return ticket_stats.ticket_created_statements([
+        (row.get("organization_id"), row["emergency_type"], row["status"])
+        for index, row, _ in entries if index in inserted_indexes
+    ])
+
+def bulk_events(model, entries: List[tuple], inserted: List[tuple]) -> List[dict]:
+    rows = {index: row for index, row, _ in entries}
+    return [
+        events.ticket_event(
+            "created", ticket_id, rows[index].get("organization_id"), rows[index].get("location_id"),
+            status=rows[index]["status"], ticket_type=TICKET_EVENT_TYPES[model.__tablename__]
+        )
+        for index, ticket_id, _ in inserted
+    ]
+
+def bulk_item_results(inserted: List[tuple]) -> List[dict]:
+    return [
+        {
+            "index": index,
+            "ticket_id": ticket_id,
+            "status": (TicketStatus.PENDING if all(completion_status.values())
+                       else TicketStatus.INCOMPLETE).value
+        }
+        for index, ticket_id, completion_status in inserted
+    ]
+
+def bulk_side_statements(model, entries: List[tuple], inserted: List[tuple]) -> list:
+    """Stats, event, audit and follow-up statements that go with freshly inserted tickets"""
+    if not inserted:
+        return []
+    log_rows, followup_rows = bulk_side_rows(model, entries, inserted)
+    statements = list(bulk_stats_statements(model, entries, inserted))
+    statements.append(events.ticket_events_statement(bulk_events(model, entries, inserted)))
+    statements.append(audit.audit_outbox_statement(log_rows))
+    if followup_rows:
+        statements.append(insert(models.FollowUpTask).values(followup_rows))
+    return statements
+
+def bulk_error(index: int, error: SQLAlchemyError) -> dict:
+    return {"index": index, "error": str(getattr(error, "orig", error)).splitlines()[0]}
+
+def _insert_ticket_group(db: Session, model, entries: List[tuple], errors: List[dict]) -> List[tuple]:
+    """Insert a group and its side rows in one savepoint; on failure retry item by item to isolate bad ones"""
+    statement = ticket_insert_statement(model)
+    try:
+        with db.begin_nested():
+            ticket_ids = db.execute(statement, [row for _, row, _ in entries]).scalars().all()
+            inserted = [(index, ticket_id, completion_status)
+                        for (index, _, completion_status), ticket_id in zip(entries, ticket_ids)]
+            for side_statement in bulk_side_statements(model, entries, inserted):
+                db.execute(side_statement)
+        return inserted
+    except SQLAlchemyError:
+        inserted = []
+        for entry in entries:
+            index, row, completion_status = entry
+            try:
+                with db.begin_nested():
+                    item = [(index, db.execute(statement, [row]).scalar_one(), completion_status)]
+                    for side_statement in bulk_side_statements(model, [entry], item):
+                        db.execute(side_statement)
+                inserted.extend(item)
+            except SQLAlchemyError as e:
+                errors.append(bulk_error(index, e))
+        return inserted
+
+@db_operation_handler
+def bulk_create_tickets(
+    db: Session,
+    items: List[tuple],
+    created_by: Optional[int] = None,
+    organization_id: Optional[int] = None
+) -> List[dict]:
+    """Insert a batch of tickets with their logs and follow-up tasks in a few round trips"""
+    location_ids = bulk_location_ids(items)
+    location_organizations = {}
+    if location_ids:
+        location_organizations = dict(db.execute(location_organizations_query(location_ids)).all())
+    errors, groups = prepare_bulk_tickets(items, created_by, location_organizations, organization_id)
+    results = []
+    for (model, _), entries in groups.items():
+        results.extend(bulk_item_results(_insert_ticket_group(db, model, entries, errors)))
+    db.commit()
+    return sorted(results + errors, key=lambda result: result["index"])
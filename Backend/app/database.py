@@ -1,19 +1,28 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.exc import SQLAlchemyError, DisconnectionError
+from sqlalchemy.pool import NullPool
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import os
 import logging
+from contextlib import contextmanager, asynccontextmanager
 from tenacity import retry, stop_after_attempt, wait_exponential
 from fastapi import HTTPException
+from .metrics import TimedQueuePool, AsyncTimedQueuePool, instrument_engine
+from .profiling import sql_profiler, SQL_PROFILING
+from .replicas import Replica, RoutingSession, replica_router, REPLICA_DATABASE_URLS
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Load environment variables from .env for local runs; deployments and tests pass them in directly
+if os.getenv("LOAD_DOTENV", "true").lower() in ("1", "true", "yes"):
+    load_dotenv()
 
 # Get database URL with fallback
 DATABASE_URL = os.getenv(
@@ -27,6 +36,164 @@ DATABASE_URL = os.getenv(
 if not DATABASE_URL.startswith("postgresql"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+# Serve request handlers from the asyncpg engine instead of the psycopg2 one
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "false").lower() in ("1", "true", "yes")
+
+# Async URL uses the asyncpg driver against the same database
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+)
+
+# Pool configuration
+# Total connections every worker process together may hold; split evenly across WEB_CONCURRENCY
+# workers unless DB_POOL_SIZE/DB_MAX_OVERFLOW are given explicitly
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", str(30 * WEB_CONCURRENCY)))
+_per_worker = max(DB_CONNECTION_BUDGET // WEB_CONCURRENCY, 2)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(max(_per_worker // 3, 1))))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", str(_per_worker - DB_POOL_SIZE)))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recycle before server/PgBouncer/load balancer idle timeouts close the socket under us
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# SELECT 1 on every checkout; off by default, the checkout check and keepalives below are cheaper
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+# "queue" keeps connections in-process; "null" opens one per checkout and leaves pooling to PgBouncer
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue").lower()
+# Behind PgBouncer in transaction pooling: no server-side prepared statements or startup options
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() in ("1", "true", "yes")
+# Connections opened at startup so the first requests don't pay for connecting; defaults to the pool size
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE if DB_POOL_MODE == "queue" else 0)))
+# LISTEN needs a session-pooled connection, so point this past PgBouncer at Postgres itself
+LISTEN_DATABASE_URL = os.getenv("LISTEN_DATABASE_URL", DATABASE_URL)
+
+if DB_POOL_MODE not in ("queue", "null"):
+    raise ValueError(f"DB_POOL_MODE must be 'queue' or 'null', got '{DB_POOL_MODE}'")
+
+# TCP keepalives let the kernel notice a dead peer instead of a query hanging on it
+KEEPALIVE_ARGS = {"keepalives": 1, "keepalives_idle": 30, "keepalives_interval": 10, "keepalives_count": 3}
+
+def pool_options(poolclass) -> dict:
+    if DB_POOL_MODE == "null":
+        return {"poolclass": NullPool, "pool_pre_ping": DB_POOL_PRE_PING}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_use_lifo": True  # reuse hot connections so idle ones age out instead of all going stale
+    }
+
+def sync_connect_args() -> dict:
+    if DB_PGBOUNCER:
+        # PgBouncer rejects the "options" startup parameter; timezone is set on connect instead
+        return dict(KEEPALIVE_ARGS)
+    return {"options": "-c timezone=utc", **KEEPALIVE_ARGS}
+
+def async_connect_args() -> dict:
+    if DB_PGBOUNCER:
+        # asyncpg prepares every statement; a transaction pooler may hand the next one to another backend
+        return {
+            "server_settings": {"timezone": "utc"},
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0
+        }
+    return {"server_settings": {"timezone": "utc"}}
+
+def _set_utc_timezone(dbapi_connection, connection_record):
+    # A plain SET is safe in transaction pooling: PgBouncer tracks TimeZone per client
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SET TIME ZONE 'UTC'")
+    finally:
+        cursor.close()
+    dbapi_connection.commit()
+
+def _reject_closed_connection(dbapi_connection, connection_record, connection_proxy):
+    """Checkout liveness from the driver's own state, without pre-ping's round trip.
+
+    Raising DisconnectionError makes the pool discard the connection and retry
+    the checkout with a fresh one.
+    """
+    driver_connection = getattr(dbapi_connection, "driver_connection", dbapi_connection)
+    is_closed = getattr(driver_connection, "is_closed", None)  # asyncpg
+    if is_closed() if callable(is_closed) else getattr(driver_connection, "closed", 0):  # psycopg2
+        raise DisconnectionError("Connection was closed while idle in the pool")
+
+def async_url(url: str) -> str:
+    return url.replace("postgresql://", "postgresql+asyncpg://", 1).replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+def replica_engine_options(url: str, label: str, poolclass) -> dict:
+    """Same pool and driver settings as the primary; SQLite stand-ins keep SQLAlchemy's defaults"""
+    if not url.startswith("postgresql"):
+        return {}
+    if DB_POOL_MODE == "queue":
+        poolclass = type(f"{poolclass.__name__}_{label}", (poolclass,), {"engine_label": label})
+    return pool_options(poolclass)
+
+def create_replica(index: int, url: str) -> Replica:
+    label = f"replica{index}"
+    postgres = url.startswith("postgresql")
+    if USE_ASYNC_DB:
+        replica_async_engine = create_async_engine(
+            async_url(url),
+            connect_args=async_connect_args() if postgres else {},
+            **replica_engine_options(url, label, AsyncTimedQueuePool)
+        )
+        bind = replica_async_engine.sync_engine
+    else:
+        replica_async_engine = None
+        bind = create_engine(
+            url,
+            connect_args=sync_connect_args() if postgres else {},
+            **replica_engine_options(url, label, TimedQueuePool)
+        )
+        if DB_PGBOUNCER and postgres:
+            event.listen(bind, "connect", _set_utc_timezone)
+    event.listen(bind, "checkout", _reject_closed_connection)
+    if postgres:
+        instrument_engine(bind, label)
+    if SQL_PROFILING:
+        sql_profiler.instrument(bind)
+    return Replica(bind.url.render_as_string(hide_password=True), bind, replica_async_engine)
+
+def pool_status() -> dict:
+    """Current pool occupancy for the admin endpoint"""
+    engines = {"sync": engine}
+    if async_engine is not None:
+        engines["async"] = async_engine.sync_engine
+    for index, replica in enumerate(replica_router.replicas):
+        engines[f"replica{index}"] = replica.engine
+    status = {
+        "mode": DB_POOL_MODE,
+        "pgbouncer": DB_PGBOUNCER,
+        "pre_ping": DB_POOL_PRE_PING,
+        "workers": WEB_CONCURRENCY,
+        "connection_budget": DB_CONNECTION_BUDGET,
+        "engines": {}
+    }
+    for label, bind in engines.items():
+        pool = bind.pool
+        if isinstance(pool, NullPool):
+            status["engines"][label] = {"pool": "null"}
+            continue
+        if not hasattr(pool, "overflow"):
+            status["engines"][label] = {"pool": type(pool).__name__}
+            continue
+        status["engines"][label] = {
+            "pool": "queue",
+            "size": pool.size(),
+            "max_overflow": DB_MAX_OVERFLOW,
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "timeout": pool.timeout(),
+            "recycle": DB_POOL_RECYCLE
+        }
+    return status
+
 # Retry configuration for database operations
 @retry(
     stop=stop_after_attempt(3),
@@ -37,8 +204,12 @@ async def get_db_connection():
     """Attempt to establish database connection with retry logic"""
     try:
         # Test connection
-        connection = engine.connect()
-        connection.close()
+        if async_engine is not None:
+            async with async_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        else:
+            connection = engine.connect()
+            connection.close()
         logger.info("Database connection successful")
         return engine
     except SQLAlchemyError as e:
@@ -49,19 +220,50 @@ try:
     # Create engine with PostgreSQL-specific configuration
     engine = create_engine(
         DATABASE_URL,
-        connect_args={"options": "-c timezone=utc"},  # ✓ Good: Timezone handling
-        pool_size=10,                                 # ✓ Good: Larger pool
-        max_overflow=20,                             # ✓ Good: More overflow
-        pool_timeout=30,                             # = Same as current
-        pool_pre_ping=True                           # ✓ Good: Connection verification
+        connect_args=sync_connect_args(),            # ✓ Good: Timezone handling
+        **pool_options(TimedQueuePool)
     )
+    if DB_PGBOUNCER:
+        event.listen(engine, "connect", _set_utc_timezone)
+    event.listen(engine, "checkout", _reject_closed_connection)
+    instrument_engine(engine, "sync")
+    if SQL_PROFILING:
+        sql_profiler.instrument(engine)
     
-    # Create session factory
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # Read-only crud operations go to replicas when REPLICA_DATABASE_URLS lists any
+    for index, url in enumerate(REPLICA_DATABASE_URLS):
+        replica_router.add_replica(create_replica(index, url))
+
+    # Create session factory; replicas are routed for whichever session type serves requests
+    SessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, bind=engine,
+        class_=Session if USE_ASYNC_DB else RoutingSession
+    )
     
     # Define base class for models
     Base = declarative_base()
-    
+
+    # Async engine is only built when enabled so asyncpg stays optional
+    async_engine = None
+    AsyncSessionLocal = None
+    if USE_ASYNC_DB:
+        async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            connect_args=async_connect_args(),
+            **pool_options(AsyncTimedQueuePool)
+        )
+        event.listen(async_engine.sync_engine, "checkout", _reject_closed_connection)
+        instrument_engine(async_engine.sync_engine, "async")
+        if SQL_PROFILING:
+            sql_profiler.instrument(async_engine.sync_engine)
+        AsyncSessionLocal = async_sessionmaker(
+            bind=async_engine,
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            autoflush=False,
+            expire_on_commit=False
+        )
+
 except SQLAlchemyError as e:
     logger.error(f"Database connection error: {str(e)}")
     raise
@@ -75,6 +277,65 @@ def get_db():
     finally:
         db.close()
 
+# Async database session dependency
+async def get_async_db():
+    """Dependency for getting async database sessions"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Session dependency selected by configuration
+if USE_ASYNC_DB:
+    get_session = get_async_db
+else:
+    get_session = get_db
+
+@asynccontextmanager
+async def session_scope():
+    """Short-lived session for code outside request dependencies, like long-lived streams"""
+    if USE_ASYNC_DB:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+# Query budget enforcement
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block issues more SQL statements than its budget allows"""
+
+@contextmanager
+def query_budget(max_statements: int, bind=None):
+    """Count SQL statements executed inside the block and fail if over budget.
+
+    Usage: with query_budget(3): client.get("/api/tickets/?include=location")
+    Without bind, statements on the primary and on every replica count.
+    """
+    if bind is not None:
+        binds = [bind]
+    else:
+        binds = [async_engine.sync_engine if async_engine is not None else engine]
+        binds.extend(replica.engine for replica in replica_router.replicas)
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for target in binds:
+        event.listen(target, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        for target in binds:
+            event.remove(target, "before_cursor_execute", _record)
+    if len(statements) > max_statements:
+        raise QueryBudgetExceeded(
+            f"{len(statements)} statements executed, budget was {max_statements}:\n"
+            + "\n".join(statements)
+        )
+
 # Health check function
 @retry(
     stop=stop_after_attempt(3),
@@ -83,8 +344,12 @@ def get_db():
 async def check_db_health():
     """Check database health with retry logic"""
     try:
-        async with engine.connect() as conn:
-            await conn.execute("SELECT 1")
+        if async_engine is not None:
+            async with async_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        else:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
         return True
     except SQLAlchemyError as e:
         logger.error(f"Database health check failed: {str(e)}")
@@ -104,11 +369,47 @@ async def init_db():
         logger.error(f"Database initialization failed: {str(e)}")
         raise
 
+# Startup
+def create_tables():
+    """Create missing tables from the models; real databases get their schema from database/schema.sql"""
+    Base.metadata.create_all(bind=engine)
+
+async def warm_pool(count: int = DB_POOL_WARMUP) -> int:
+    """Open count connections at once and return them to the pool, which keeps them"""
+    count = min(count, DB_POOL_SIZE) if DB_POOL_MODE == "queue" else 0
+    if count <= 0:
+        return 0
+    if async_engine is not None:
+        opened = await asyncio.gather(
+            *(async_engine.connect().start() for _ in range(count)), return_exceptions=True
+        )
+    else:
+        opened = await asyncio.gather(
+            *(run_in_threadpool(engine.connect) for _ in range(count)), return_exceptions=True
+        )
+    errors = [result for result in opened if isinstance(result, BaseException)]
+    for connection in opened:
+        if not isinstance(connection, BaseException):
+            if async_engine is not None:
+                await connection.close()
+            else:
+                connection.close()
+    if errors:
+        raise errors[0]
+    return count
+
 # Cleanup function
 async def close_db_connections():
     """Gracefully close all database connections"""
     try:
         engine.dispose()
+        if async_engine is not None:
+            await async_engine.dispose()
+        for replica in replica_router.replicas:
+            if replica.async_engine is not None:
+                await replica.async_engine.dispose()
+            else:
+                replica.engine.dispose()
         logger.info("Database connections closed successfully")
     except SQLAlchemyError as e:
         logger.error(f"Error closing database connections: {str(e)}")
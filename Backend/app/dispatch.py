@@ -0,0 +1,245 @@
+from datetime import datetime
+from fastapi import HTTPException
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+import threading
+from . import crud
+from .async_crud import run_crud
+from .database import session_scope
+from .events import broker
+from .geo import GeoGrid
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+AUTO_ASSIGN_ATTEMPTS = 5
+
+def parse_availability(availability) -> Dict[int, List[Tuple[int, int]]]:
+    """Turn {"mon": [["08:00", "16:00"]], ...} into weekday -> [(start_minute, end_minute)]"""
+    windows = {}
+    if not isinstance(availability, dict):
+        return windows
+    for day, day_windows in availability.items():
+        if day not in WEEKDAYS or not isinstance(day_windows, list):
+            continue
+        for window in day_windows:
+            try:
+                start, end = (int(part[:2]) * 60 + int(part[3:5]) for part in window)
+            except (TypeError, ValueError):
+                logger.error(f"Ignoring malformed availability window: {window}")
+                continue
+            windows.setdefault(WEEKDAYS.index(day), []).append((start, end))
+    return windows
+
+class StaffEntry:
+    __slots__ = ("staff_id", "organization_id", "skills", "windows", "is_on_job", "position")
+
+    def __init__(self, staff_id, organization_id, availability, is_on_job, latitude=None, longitude=None):
+        self.staff_id = staff_id
+        self.organization_id = organization_id
+        self.skills: Dict[str, int] = {}
+        self.windows = parse_availability(availability)
+        self.is_on_job = bool(is_on_job)
+        self.position = (latitude, longitude) if latitude is not None and longitude is not None else None
+
+    def is_available_at(self, at: datetime) -> bool:
+        # Staff without a schedule are treated as always available
+        if not self.windows:
+            return True
+        minute = at.hour * 60 + at.minute
+        return any(start <= minute < end for start, end in self.windows.get(at.weekday(), ()))
+
+class StaffDispatchIndex:
+    """In-memory index of free staff by (organization, skill category) and skill level.
+
+    Only staff who are not on a job sit in the buckets, so a recommendation
+    walks the levels from highest down and returns the first candidates whose
+    availability window covers the requested time. Free staff with a known
+    position are also kept in a per-organization geohash grid, so a
+    recommendation near a point returns the closest qualified responders.
+    """
+
+    def __init__(self):
+        self._staff: Dict[int, StaffEntry] = {}
+        self._buckets: Dict[Tuple[int, str], Dict[int, Set[int]]] = {}
+        self._grids: Dict[int, GeoGrid] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._staff)
+
+    def _add_to_buckets(self, entry: StaffEntry):
+        for category, level in entry.skills.items():
+            levels = self._buckets.setdefault((entry.organization_id, category), {})
+            levels.setdefault(level, set()).add(entry.staff_id)
+        if entry.position is not None:
+            self._grids.setdefault(entry.organization_id, GeoGrid()).insert(entry.staff_id, *entry.position)
+
+    def _remove_from_buckets(self, entry: StaffEntry):
+        for category, level in entry.skills.items():
+            levels = self._buckets.get((entry.organization_id, category))
+            if levels and level in levels:
+                levels[level].discard(entry.staff_id)
+                if not levels[level]:
+                    del levels[level]
+        grid = self._grids.get(entry.organization_id)
+        if grid is not None:
+            grid.remove(entry.staff_id)
+
+    @staticmethod
+    def _entries_from_rows(rows) -> Dict[int, StaffEntry]:
+        entries = {}
+        for staff_id, organization_id, availability, is_on_job, latitude, longitude, category, level in rows:
+            entry = entries.get(staff_id)
+            if entry is None:
+                entry = entries[staff_id] = StaffEntry(
+                    staff_id, organization_id, availability, is_on_job, latitude, longitude
+                )
+            if category is not None:
+                entry.skills[category] = max(level, entry.skills.get(category, 0))
+        return entries
+
+    def rebuild(self, rows):
+        """Replace the index from crud.load_dispatch_staff rows"""
+        entries = self._entries_from_rows(rows)
+        with self._lock:
+            self._staff = entries
+            self._buckets = {}
+            self._grids = {}
+            for entry in entries.values():
+                if not entry.is_on_job:
+                    self._add_to_buckets(entry)
+
+    def upsert(self, staff_id: int, rows):
+        """Refresh one staff member from their rows; no rows removes them"""
+        entry = self._entries_from_rows(rows).get(staff_id)
+        with self._lock:
+            previous = self._staff.pop(staff_id, None)
+            if previous is not None and not previous.is_on_job:
+                self._remove_from_buckets(previous)
+            if entry is not None:
+                self._staff[staff_id] = entry
+                if not entry.is_on_job:
+                    self._add_to_buckets(entry)
+
+    def set_on_job(self, staff_id: int, is_on_job: bool):
+        with self._lock:
+            entry = self._staff.get(staff_id)
+            if entry is None or entry.is_on_job == is_on_job:
+                return
+            if is_on_job:
+                self._remove_from_buckets(entry)
+            else:
+                self._add_to_buckets(entry)
+            entry.is_on_job = is_on_job
+
+    def set_position(self, staff_id: int, latitude: float, longitude: float):
+        with self._lock:
+            entry = self._staff.get(staff_id)
+            if entry is None:
+                return
+            entry.position = (latitude, longitude)
+            if not entry.is_on_job:
+                self._grids.setdefault(entry.organization_id, GeoGrid()).insert(staff_id, latitude, longitude)
+
+    def recommend(
+        self,
+        organization_id: int,
+        category: str,
+        min_level: int = 0,
+        at: Optional[datetime] = None,
+        limit: int = 1,
+        near: Optional[Tuple[float, float]] = None
+    ) -> List[dict]:
+        at = at or datetime.now()
+        if near is not None:
+            candidates = self._recommend_near(organization_id, category, min_level, at, limit, near)
+            if candidates:
+                return candidates
+        candidates = []
+        with self._lock:
+            levels = self._buckets.get((organization_id, category), {})
+            for level in sorted(levels, reverse=True):
+                if level < min_level:
+                    break
+                for staff_id in levels[level]:
+                    if self._staff[staff_id].is_available_at(at):
+                        candidates.append({"staff_id": staff_id, "level": level})
+                        if len(candidates) >= limit:
+                            return candidates
+        return candidates
+
+    def _recommend_near(self, organization_id, category, min_level, at, limit, near) -> List[dict]:
+        def qualifies(staff_id):
+            entry = self._staff[staff_id]
+            return entry.skills.get(category, -1) >= min_level and entry.is_available_at(at)
+
+        with self._lock:
+            grid = self._grids.get(organization_id)
+            if grid is None:
+                return []
+            return [
+                {"staff_id": staff_id, "level": self._staff[staff_id].skills[category], "distance_m": round(distance, 1)}
+                for distance, staff_id in grid.nearest(near[0], near[1], limit, accept=qualifies)
+            ]
+
+    def apply_event(self, event: dict):
+        """Keep the index current from ticket and staff events on the LISTEN channel"""
+        kind = event.get("event")
+        if kind == "assigned" and event.get("staff_id") is not None:
+            self.set_on_job(event["staff_id"], True)
+        elif kind == "staff_released":
+            self.set_on_job(event["staff_id"], False)
+        elif kind == "staff_moved":
+            self.set_position(event["staff_id"], event["latitude"], event["longitude"])
+        elif kind == "staff_updated":
+            asyncio.get_running_loop().create_task(reload_staff(event["staff_id"]))
+
+dispatch_index = StaffDispatchIndex()
+
+async def reload_staff(staff_id: int):
+    async with session_scope() as db:
+        rows = await run_crud(db, crud.load_dispatch_staff, staff_id=staff_id)
+    dispatch_index.upsert(staff_id, rows)
+
+async def start_dispatch_index():
+    """Load the index and subscribe it to the event broker; a failed load raises so readiness retries it"""
+    async with session_scope() as db:
+        rows = await run_crud(db, crud.load_dispatch_staff)
+    dispatch_index.rebuild(rows)
+    logger.info(f"Dispatch index loaded with {len(dispatch_index)} staff")
+    broker.add_listener(dispatch_index.apply_event)
+
+async def auto_assign(
+    db,
+    ticket_id: int,
+    category: str,
+    min_level: int,
+    estimated_response_time: int,
+    organization_id: Optional[int] = None
+):
+    """Assign the nearest (without coordinates, the most skilled) free responder, moving on if one was just taken"""
+    ticket = await run_crud(db, crud.get_emergency_ticket, ticket_id, organization_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    near = await run_crud(db, crud.get_location_coordinates, ticket.location_id) if ticket.location_id else None
+    for candidate in dispatch_index.recommend(
+        ticket.organization_id, category, min_level, limit=AUTO_ASSIGN_ATTEMPTS, near=near
+    ):
+        staff_id = candidate["staff_id"]
+        try:
+            assigned = await run_crud(
+                db, crud.assign_emergency_ticket, ticket_id, staff_id, estimated_response_time,
+                organization_id=ticket.organization_id
+            )
+        except HTTPException as e:
+            if e.status_code != 409:
+                raise
+            # Another dispatcher got there first; the index was stale for this person
+            dispatch_index.set_on_job(staff_id, True)
+            continue
+        dispatch_index.set_on_job(staff_id, True)
+        return assigned
+    raise HTTPException(status_code=409, detail="No available staff for this skill")
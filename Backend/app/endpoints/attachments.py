@@ -0,0 +1,150 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import List, Tuple
+from .. import crud, schemas
+from ..async_crud import run_crud
+from ..auth import get_current_user
+from ..database import get_session, session_scope
+from ..principal_cache import Principal
+from ..storage import storage, BlobWriter, blob_key, thumbnail_key, publish_blob
+from ..thumbnails import thumbnail_service
+from .emergencies import require_organization
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:
+    from multipart.multipart import MultipartParser, parse_options_header
+
+router = APIRouter(tags=["attachments"])
+
+# Configuration
+UPLOAD_FIELD = "file"
+DEFAULT_FILE_TYPE = "application/octet-stream"
+
+async def receive_upload(request: Request, writer: BlobWriter) -> Tuple[str, str]:
+    """Stream the multipart "file" part into writer without buffering it; returns (file_name, file_type)"""
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    part = {"headers": {}, "field": b"", "value": b""}
+    upload = {"file_name": None, "file_type": DEFAULT_FILE_TYPE, "active": False, "done": False}
+    pending: List[bytes] = []
+
+    def on_part_begin():
+        part["headers"] = {}
+
+    def on_header_field(data: bytes, start: int, end: int):
+        part["field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part["field"], part["value"] = b"", b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        upload["active"] = disposition.get(b"name") == UPLOAD_FIELD.encode() and not upload["done"]
+        if upload["active"]:
+            upload["file_name"] = disposition.get(b"filename", b"upload").decode("utf-8", "replace")
+            upload["file_type"] = part["headers"].get(b"content-type", DEFAULT_FILE_TYPE.encode()).decode("latin-1")
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if upload["active"]:
+            pending.append(data[start:end])
+
+    def on_part_end():
+        if upload["active"]:
+            upload["active"], upload["done"] = False, True
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    async for chunk in request.stream():
+        parser.write(chunk)
+        if pending:
+            # At most one received chunk is held in memory at a time
+            await run_in_threadpool(writer.write, pending[:])
+            pending.clear()
+    parser.finalize()
+    if not upload["done"]:
+        raise HTTPException(status_code=400, detail=f"Missing '{UPLOAD_FIELD}' file part")
+    return upload["file_name"], upload["file_type"]
+
+@router.post("/api/tickets/{ticket_id}/attachments", response_model=schemas.AttachmentItem)
+async def upload_attachment(
+    ticket_id: int,
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
+):
+    # Short sessions around the upload so no pooled connection is held while bytes stream in
+    async with session_scope() as db:
+        ticket = await run_crud(db, crud.get_ticket, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    require_organization(current_user, ticket.organization_id)
+
+    writer = BlobWriter(storage.tmp_dir)
+    try:
+        file_name, file_type = await receive_upload(request, writer)
+        is_new = await publish_blob(writer, file_type)
+    except BaseException:
+        writer.discard()
+        raise
+
+    async with session_scope() as db:
+        attachment = await run_crud(
+            db,
+            crud.create_attachment,
+            ticket,
+            file_name=file_name,
+            file_type=file_type,
+            file_size=writer.size,
+            file_path=blob_key(writer.digest),
+            content_hash=writer.digest,
+            uploaded_by=current_user.user_id
+        )
+    if is_new:
+        thumbnail_service.schedule(writer.digest, file_type)
+    return attachment
+
+async def authorized_attachment(attachment_id: int, current_user: Principal, db):
+    row = await run_crud(db, crud.get_attachment, attachment_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    attachment, organization_id = row
+    require_organization(current_user, organization_id)
+    return attachment
+
+@router.get("/api/attachments/{attachment_id}")
+async def download_attachment(
+    attachment_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+) -> Response:
+    # Range requests are answered by FileResponse, nginx or the object store
+    attachment = await authorized_attachment(attachment_id, current_user, db)
+    return storage.response(attachment.file_path, attachment.file_type, attachment.file_name)
+
+@router.get("/api/attachments/{attachment_id}/thumbnail")
+async def download_thumbnail(
+    attachment_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+) -> Response:
+    attachment = await authorized_attachment(attachment_id, current_user, db)
+    key = thumbnail_key(attachment.content_hash) if attachment.content_hash else None
+    if key is None or not await storage.exists(key):
+        raise HTTPException(status_code=404, detail="Thumbnail not available")
+    return storage.response(key, "image/jpeg")
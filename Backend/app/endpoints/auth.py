@@ -0,0 +1,103 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
+import logging
+import os
+from .. import crud, schemas
+from ..async_crud import run_crud
+from ..auth import (
+    get_current_user, oauth2_scheme, new_jti, new_refresh_record, sign_token_pair, decode_refresh_token
+)
+from ..database import get_session
+from ..passwords import password_hasher, MAX_PASSWORD_BYTES
+from ..principal_cache import Principal
+from ..tokens import key_ring, revocation_set
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+# Organization self-registered users join; registration is closed when unset
+REGISTRATION_ORGANIZATION_ID = os.getenv("REGISTRATION_ORGANIZATION_ID") or None
+REGISTRATION_ROLE = "tenant"
+
+router = APIRouter(prefix="/api/auth", tags=["auth"])
+
+@router.post("/login", response_model=schemas.LoginResponse)
+async def login(credentials: schemas.LoginRequest, db: Session = Depends(get_session)):
+    user = await run_crud(db, crud.get_user_by_email, email=credentials.email)
+    # Unknown emails cost a hash too, so response time doesn't reveal which accounts exist
+    if not await password_hasher.verify(credentials.password, user.password_hash if user else None):
+        raise HTTPException(status_code=401, detail="Incorrect email or password")
+
+    if password_hasher.needs_rehash(user.password_hash):
+        # The plaintext is only available now: move the hash to the current cost factor
+        new_hash = await password_hasher.hash(credentials.password)
+        await run_crud(db, crud.update_password_hash, user.user_id, new_hash)
+        password_hasher.upgraded += 1
+        logger.info(f"Upgraded password hash for user {user.user_id}")
+
+    # Each login starts a refresh family: the chain of tokens later rotations hand out
+    family_id = new_jti()
+    record = new_refresh_record()
+    await run_crud(db, crud.create_refresh_token, user.user_id, family_id, **record)
+    return {**sign_token_pair(user, family_id, record), "user": user}
+
+@router.post("/refresh", response_model=schemas.LoginResponse)
+async def refresh(body: schemas.RefreshRequest, db: Session = Depends(get_session)):
+    claims = decode_refresh_token(body.refresh_token)
+    record = new_refresh_record()
+    user = await run_crud(db, crud.rotate_refresh_token, claims["jti"], record)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Refresh token is invalid or has been revoked")
+    return {**sign_token_pair(user, claims["fam"], record), "user": user}
+
+@router.post("/logout", status_code=204)
+async def logout(
+    body: Optional[schemas.LogoutRequest] = None,
+    token: str = Depends(oauth2_scheme),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    # get_current_user has verified the token, so its claims can be trusted here
+    claims = key_ring.decode(token)
+    access_tokens = [(claims["jti"], datetime.utcfromtimestamp(claims["exp"]))] if claims.get("jti") else []
+    family_id = None
+    if body is not None and body.refresh_token:
+        refresh_claims = decode_refresh_token(body.refresh_token)
+        if refresh_claims.get("uid") != current_user.user_id:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        family_id = refresh_claims["fam"]
+    await run_crud(db, crud.revoke_tokens, access_tokens, family_id)
+    # Other workers learn of it from the token_revoked event; this one shouldn't wait for it
+    for jti, expires_at in access_tokens:
+        revocation_set.add(jti, expires_at)
+    return Response(status_code=204)
+
+@router.post("/register", response_model=schemas.AuthUser, status_code=201)
+async def register(registration: schemas.RegisterRequest, db: Session = Depends(get_session)):
+    if REGISTRATION_ORGANIZATION_ID is None:
+        raise HTTPException(status_code=403, detail="Self-registration is disabled")
+    if len(registration.password.encode()) > MAX_PASSWORD_BYTES:
+        raise HTTPException(status_code=400, detail=f"Password must be at most {MAX_PASSWORD_BYTES} bytes")
+    if await run_crud(db, crud.get_user_by_email, email=registration.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    password_hash = await password_hasher.hash(registration.password)
+    return await run_crud(
+        db,
+        crud.create_user,
+        name=f"{registration.first_name} {registration.last_name}",
+        email=registration.email,
+        password_hash=password_hash,
+        role=REGISTRATION_ROLE,
+        organization_id=int(REGISTRATION_ORGANIZATION_ID),
+        identifier=registration.apartment_number
+    )
+
+@router.get("/validate", response_model=schemas.AuthUser)
+async def validate(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_session)):
+    user = await run_crud(db, crud.get_user_by_email, email=current_user.email)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    return user
@@ -0,0 +1,128 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from .. import crud, schemas
+from ..async_crud import run_crud
+from ..auth import get_current_user
+from ..database import get_session
+from ..dispatch import dispatch_index, auto_assign
+from ..principal_cache import Principal
+from ..triage import triage_service
+
+router = APIRouter(prefix="/api/emergencies", tags=["emergencies"])
+
+def require_organization(principal: Principal, organization_id: Optional[int]):
+    if principal.role != "admin" and organization_id != principal.organization_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+def scoped_organization(principal: Principal) -> Optional[int]:
+    # Tenant users only see their own partition; admins look across all of them
+    if principal.role == "admin":
+        return None
+    if principal.organization_id is None:
+        # None means "every organization" to the queries, so never hand it to a tenant
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return principal.organization_id
+
+@router.get("/dispatch/recommendations", response_model=List[schemas.StaffRecommendation])
+async def recommend_staff(
+    organization_id: int,
+    category: str,
+    min_level: int = 0,
+    limit: int = Query(5, ge=1, le=50),
+    location_id: Optional[int] = Query(None, description="Rank by distance from this location"),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    # Served from the in-memory dispatch index; only the location's coordinates come from the database
+    require_organization(current_user, organization_id)
+    near = await run_crud(db, crud.get_location_coordinates, location_id) if location_id else None
+    return dispatch_index.recommend(organization_id, category, min_level, limit=limit, near=near)
+
+@router.get("/triage/next", response_model=Optional[schemas.TriageEntry])
+async def next_triage_ticket(
+    organization_id: int,
+    current_user: Principal = Depends(get_current_user)
+):
+    # Pending ticket with the earliest SLA deadline, from the in-memory triage queue
+    require_organization(current_user, organization_id)
+    return triage_service.next_ticket(organization_id)
+
+@router.get("/triage/breaching", response_model=List[schemas.TriageEntry])
+async def breaching_triage_tickets(
+    organization_id: int,
+    within: int = Query(0, ge=0, le=86400, description="Seconds from now"),
+    current_user: Principal = Depends(get_current_user)
+):
+    require_organization(current_user, organization_id)
+    return triage_service.breaching(organization_id, within)
+
+@router.post("/{ticket_id}/assign", response_model=schemas.EmergencyTicketItem)
+async def assign_emergency_ticket(
+    ticket_id: int,
+    assignment: schemas.EmergencyAssign,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    ticket = await run_crud(db, crud.get_emergency_ticket, ticket_id, scoped_organization(current_user))
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    require_organization(current_user, ticket.organization_id)
+    assigned = await run_crud(
+        db,
+        crud.assign_emergency_ticket,
+        ticket_id,
+        assignment.staff_id,
+        assignment.estimated_response_time,
+        organization_id=ticket.organization_id
+    )
+    dispatch_index.set_on_job(assignment.staff_id, True)
+    triage_service.remove(ticket_id)
+    return assigned
+
+@router.post("/{ticket_id}/auto-assign", response_model=schemas.EmergencyTicketItem)
+async def auto_assign_emergency_ticket(
+    ticket_id: int,
+    request: schemas.EmergencyAutoAssign,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    ticket = await run_crud(db, crud.get_emergency_ticket, ticket_id, scoped_organization(current_user))
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    require_organization(current_user, ticket.organization_id)
+    assigned = await auto_assign(
+        db, ticket_id, request.category, request.min_level, request.estimated_response_time,
+        organization_id=ticket.organization_id
+    )
+    triage_service.remove(ticket_id)
+    return assigned
+
+@router.post("/staff/{staff_id}/release")
+async def release_staff(
+    staff_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    staff = await run_crud(db, crud.get_staff, staff_id)
+    if not staff:
+        raise HTTPException(status_code=404, detail="Staff not found")
+    require_organization(current_user, staff.organization_id)
+    await run_crud(db, crud.release_staff, staff_id)
+    dispatch_index.set_on_job(staff_id, False)
+    return {"staff_id": staff_id, "is_on_job": False}
+
+@router.put("/staff/{staff_id}/position")
+async def update_staff_position(
+    staff_id: int,
+    position: schemas.StaffPosition,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    staff = await run_crud(db, crud.get_staff, staff_id)
+    if not staff:
+        raise HTTPException(status_code=404, detail="Staff not found")
+    require_organization(current_user, staff.organization_id)
+    await run_crud(db, crud.update_staff_position, staff_id, position.latitude, position.longitude)
+    dispatch_index.set_position(staff_id, position.latitude, position.longitude)
+    return {"staff_id": staff_id, "latitude": position.latitude, "longitude": position.longitude}
@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+from typing import Optional
+import asyncio
+import json
+from ..auth import resolve_principal
+from ..database import session_scope
+from ..events import broker
+from ..principal_cache import Principal
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+# EventSource cannot set headers, so streams also accept ?token=
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+KEEPALIVE_INTERVAL = 15  # seconds
+
+async def authenticate_stream(token: Optional[str]) -> Principal:
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    # The session is released before streaming so subscribers never hold a connection
+    async with session_scope() as db:
+        return await resolve_principal(token, db)
+
+def subscription_organization(principal: Principal, organization_id: Optional[int]) -> int:
+    if organization_id is None:
+        return principal.organization_id
+    if organization_id != principal.organization_id and principal.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return organization_id
+
+@router.get("/tickets")
+async def stream_ticket_events(
+    request: Request,
+    organization_id: Optional[int] = None,
+    location_id: Optional[int] = None,
+    token: Optional[str] = None,
+    bearer_token: Optional[str] = Depends(optional_oauth2_scheme)
+):
+    """Server-Sent Events stream of ticket activity for an organization or location"""
+    principal = await authenticate_stream(token or bearer_token)
+    subscriber = broker.subscribe(subscription_organization(principal, organization_id), location_id)
+
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.next_event(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def wait_for_disconnect(websocket: WebSocket):
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+@router.websocket("/tickets/ws")
+async def ticket_events_socket(
+    websocket: WebSocket,
+    token: str,
+    organization_id: Optional[int] = None,
+    location_id: Optional[int] = None
+):
+    """WebSocket stream of ticket activity for an organization or location"""
+    try:
+        principal = await authenticate_stream(token)
+        scope_organization_id = subscription_organization(principal, organization_id)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    subscriber = broker.subscribe(scope_organization_id, location_id)
+    disconnected = asyncio.create_task(wait_for_disconnect(websocket))
+    try:
+        while not disconnected.done():
+            next_event = asyncio.create_task(subscriber.next_event())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_event in done:
+                await websocket.send_json(next_event.result())
+            else:
+                next_event.cancel()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+        broker.unsubscribe(subscriber)
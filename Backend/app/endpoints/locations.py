@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.orm import Session
+from typing import List
+from .. import crud, schemas
+from ..async_crud import run_crud
+from ..auth import get_current_user
+from ..database import get_session
+from ..principal_cache import Principal
+from ..response_cache import response_cache, encode_body
+from .emergencies import require_organization
+
+router = APIRouter(prefix="/api/locations", tags=["locations"])
+
+@router.post("/", response_model=schemas.LocationItem)
+async def create_location(
+    location: schemas.LocationCreate,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    require_organization(current_user, location.organization_id)
+    db_location = await run_crud(db, crud.create_location, location)
+    # Other workers invalidate on the location_created event; don't wait for it here
+    await response_cache.invalidate_organization(location.organization_id)
+    return db_location
+
+@router.get("/", response_model=List[schemas.LocationItem])
+async def list_locations(
+    organization_id: int,
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    require_organization(current_user, organization_id)
+
+    async def load():
+        locations = await run_crud(db, crud.get_organization_locations, organization_id, skip, limit)
+        return encode_body(schemas.LocationItem, locations)
+
+    cached = await response_cache.get_or_load(organization_id, f"locations:{skip}:{limit}", load)
+    return response_cache.respond(request, *cached)
+
+@router.get("/match", response_model=List[schemas.LocationMatch])
+async def match_locations(
+    organization_id: int,
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(5, ge=1, le=20),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    # Fuzzy match of a typed location against the building / floor / room paths
+    require_organization(current_user, organization_id)
+    matches = await run_crud(db, crud.match_locations, organization_id, q, limit)
+    return [{"location": location, "score": score} for location, score in matches]
@@ -0,0 +1,186 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from typing import Optional
+import json
+import os
+from .. import crud, schemas
+from ..serialization import orm_response
+from ..database import get_session
+from ..async_crud import run_crud
+from ..auth import get_current_user
+from ..principal_cache import Principal
+from .emergencies import require_organization, scoped_organization
+from ..middleware import MAX_BULK_BODY_SIZE
+
+# Configuration
+MAX_NDJSON_LINE_SIZE = int(os.getenv("MAX_NDJSON_LINE_SIZE", str(1024 * 1024)))  # bytes per ticket
+
+router = APIRouter(prefix="/api/tickets", tags=["tickets"])
+
+async def require_ticket_organization(db: Session, ticket_id: int, principal: Principal):
+    """404 for a missing ticket, 403 for one in another organization"""
+    ticket = await run_crud(db, crud.get_ticket, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    require_organization(principal, ticket.organization_id)
+    return ticket
+
+@router.get("/", response_model=schemas.TicketPage)
+async def list_tickets(
+    db: Session = Depends(get_session),
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    location_id: Optional[int] = None,
+    organization_id: Optional[int] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(25, ge=1, le=100),
+    include: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user)
+):
+    # Tenants are pinned to their own organization; only admins may filter across them
+    if current_user.role != "admin":
+        organization_id = scoped_organization(current_user)
+    # Keyset pagination: pass next_cursor from the previous page to continue
+    page = await run_crud(
+        db,
+        crud.list_tickets,
+        limit=limit,
+        status=status,
+        priority=priority,
+        location_id=location_id,
+        organization_id=organization_id,
+        search=search,
+        cursor=cursor,
+        includes=crud.parse_includes(include)
+    )
+    # Rows come straight from our query: serialize them without revalidating through the schema
+    return orm_response(schemas.TicketPage, page)
+
+@router.get("/{ticket_id}", response_model=schemas.TicketListItem)
+async def get_ticket(
+    ticket_id: int,
+    db: Session = Depends(get_session),
+    include: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user)
+):
+    ticket = await run_crud(db, crud.get_ticket, ticket_id, includes=crud.parse_includes(include))
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    require_organization(current_user, ticket.organization_id)
+    return orm_response(schemas.TicketListItem, ticket)
+
+@router.post("/{ticket_id}/comments", response_model=schemas.CommentItem)
+async def create_ticket_comment(
+    ticket_id: int,
+    comment: schemas.TicketCommentCreate,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    await require_ticket_organization(db, ticket_id, current_user)
+    return await run_crud(
+        db, crud.create_comment, ticket_id, user_id=current_user.user_id, content=comment.content
+    )
+
+@router.patch("/{ticket_id}", response_model=schemas.TicketListItem)
+async def update_ticket_status(
+    ticket_id: int,
+    update: schemas.TicketStatusUpdate,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    await require_ticket_organization(db, ticket_id, current_user)
+    ticket = await run_crud(db, crud.update_ticket_status, ticket_id, new_status=update.status)
+    # Relationships were not loaded: the schema's validation would trip their raiseload
+    return orm_response(schemas.TicketListItem, ticket)
+
+async def iter_ndjson_chunks(
+    request: Request,
+    chunk_size: int,
+    max_line_size: int = MAX_NDJSON_LINE_SIZE,
+    max_size: int = MAX_BULK_BODY_SIZE
+):
+    """Yield (items, errors) batches from an NDJSON body without buffering it whole.
+
+    Only the bytes of the current, unfinished line are held; a line longer than
+    max_line_size or a body larger than max_size ends the request with a 413.
+    """
+    items, errors = [], []
+    buffer = bytearray()
+    received = 0
+    index = 0
+
+    def parse(line: bytes):
+        nonlocal index
+        if line.strip():
+            try:
+                items.append((index, json.loads(line)))
+            except ValueError:
+                errors.append({"index": index, "error": "Invalid JSON format"})
+            index += 1
+
+    def append(data: bytes):
+        buffer.extend(data)
+        if len(buffer) > max_line_size:
+            raise HTTPException(status_code=413, detail=f"NDJSON line {index} exceeds {max_line_size} bytes")
+
+    async for data in request.stream():
+        received += len(data)
+        if received > max_size:
+            raise HTTPException(status_code=413, detail="Request body too large")
+        # Scan only the new bytes for line ends, so long lines cost linear time
+        start = 0
+        newline = data.find(b"\n")
+        while newline >= 0:
+            append(data[start:newline])
+            parse(bytes(buffer))
+            buffer.clear()
+            start = newline + 1
+            newline = data.find(b"\n", start)
+        append(data[start:])
+        if len(items) >= chunk_size:
+            yield items, errors
+            items, errors = [], []
+    parse(bytes(buffer))
+    if items or errors:
+        yield items, errors
+
+@router.post("/bulk", response_model=schemas.BulkTicketResult)
+async def bulk_create_tickets(
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    """Ingest a JSON array or an application/x-ndjson stream of tickets.
+
+    Each chunk of BULK_CHUNK_SIZE tickets is committed on its own; invalid items
+    are reported per index and never abort the rest of the batch.
+    """
+    # Tenants may only file tickets against their own organization's locations
+    organization_id = scoped_organization(current_user)
+    results = []
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        async for items, errors in iter_ndjson_chunks(request, crud.BULK_CHUNK_SIZE):
+            results.extend(errors)
+            if items:
+                results.extend(await run_crud(
+                    db, crud.bulk_create_tickets, items,
+                    created_by=current_user.user_id, organization_id=organization_id
+                ))
+    else:
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON format")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of tickets")
+        for start in range(0, len(payload), crud.BULK_CHUNK_SIZE):
+            items = list(enumerate(payload[start:start + crud.BULK_CHUNK_SIZE], start))
+            results.extend(await run_crud(
+                db, crud.bulk_create_tickets, items,
+                created_by=current_user.user_id, organization_id=organization_id
+            ))
+
+    results.sort(key=lambda result: result["index"])
+    failed = sum(1 for result in results if "error" in result)
+    return {"created": len(results) - failed, "failed": failed, "results": results}
@@ -0,0 +1,190 @@
+from sqlalchemy import select, func, bindparam, Text
+from sqlalchemy.dialects.postgresql import ARRAY
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+import asyncio
+import json
+import logging
+import os
+from .database import LISTEN_DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TICKET_EVENTS_CHANNEL = "ticket_events"
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENT_SUBSCRIBER_QUEUE_SIZE", "100"))
+LISTEN_RECONNECT_DELAY = 5  # seconds
+
+def ticket_event(
+    event: str,
+    ticket_id: int,
+    organization_id: Optional[int],
+    location_id: Optional[int] = None,
+    **data
+) -> dict:
+    return {
+        "event": event,
+        "ticket_id": ticket_id,
+        "organization_id": organization_id,
+        "location_id": location_id,
+        "timestamp": datetime.utcnow().isoformat(),
+        **data
+    }
+
+def staff_event(event: str, staff_id: int, organization_id: Optional[int], **data) -> dict:
+    return {
+        "event": event,
+        "staff_id": staff_id,
+        "organization_id": organization_id,
+        "timestamp": datetime.utcnow().isoformat(),
+        **data
+    }
+
+def organization_event(event: str, organization_id: int, **data) -> dict:
+    return {
+        "event": event,
+        "organization_id": organization_id,
+        "timestamp": datetime.utcnow().isoformat(),
+        **data
+    }
+
+def token_revoked_event(jti: str, expires_at: datetime) -> dict:
+    # No organization_id: only in-process listeners see it, never stream subscribers
+    return {
+        "event": "token_revoked",
+        "jti": jti,
+        "expires_at": expires_at.isoformat(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+def principal_invalidated_event(subject: str) -> dict:
+    # Like token_revoked: for the workers' principal caches, never stream subscribers
+    return {
+        "event": "principal_invalidated",
+        "subject": subject,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+def ticket_events_statement(events: List[dict]):
+    """One statement that NOTIFYs every event; delivery happens when the transaction commits"""
+    payloads = func.unnest(
+        bindparam("payloads", [json.dumps(event) for event in events], type_=ARRAY(Text))
+    ).table_valued("payload")
+    return select(func.pg_notify(TICKET_EVENTS_CHANNEL, payloads.c.payload)).select_from(payloads)
+
+class Subscriber:
+    """A connected client's bounded queue and scope.
+
+    When a slow client's queue is full the oldest event is dropped and the
+    next delivered event carries lagged=True so the client knows to refetch.
+    """
+
+    def __init__(self, organization_id: int, location_id: Optional[int] = None):
+        self.organization_id = organization_id
+        self.location_id = location_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.lagged = False
+
+    def matches(self, event: dict) -> bool:
+        return self.location_id is None or event.get("location_id") == self.location_id
+
+    def offer(self, event: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.lagged = True
+        self.queue.put_nowait(event)
+
+    async def next_event(self) -> dict:
+        event = await self.queue.get()
+        if self.lagged:
+            self.lagged = False
+            event = {**event, "lagged": True}
+        return event
+
+class TicketEventBroker:
+    """Fans out ticket events from a single LISTEN connection per worker"""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._subscribers: Dict[int, Set[Subscriber]] = {}
+        self._listeners: List[Callable[[dict], None]] = []
+        self._connection = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = asyncio.Event()
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def subscribe(self, organization_id: int, location_id: Optional[int] = None) -> Subscriber:
+        subscriber = Subscriber(organization_id, location_id)
+        self._subscribers.setdefault(organization_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.organization_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.organization_id]
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Register an in-process consumer that sees every event, e.g. the dispatch index"""
+        self._listeners.append(listener)
+
+    def publish_local(self, event: dict):
+        """Deliver an event to this worker's listeners and its subscribers in the organization"""
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Event listener failed: {str(e)}", exc_info=True)
+        for subscriber in self._subscribers.get(event.get("organization_id"), ()):
+            if subscriber.matches(event):
+                subscriber.offer(event)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.error(f"Discarding malformed ticket event: {payload}")
+            return
+        self.publish_local(event)
+
+    async def start(self):
+        self._closed.clear()
+        self._task = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        # Imported here so sync-only deployments without asyncpg can still import this module
+        import asyncpg
+
+        while not self._closed.is_set():
+            try:
+                self._connection = await asyncpg.connect(self.dsn)
+                await self._connection.add_listener(TICKET_EVENTS_CHANNEL, self._on_notify)
+                logger.info("Listening for ticket events")
+                terminated = asyncio.Event()
+                self._connection.add_termination_listener(lambda connection: terminated.set())
+                _, pending = await asyncio.wait(
+                    [asyncio.create_task(terminated.wait()), asyncio.create_task(self._closed.wait())],
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in pending:
+                    task.cancel()
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.error(f"Ticket event listener failed: {str(e)}")
+            finally:
+                if self._connection is not None and not self._connection.is_closed():
+                    await self._connection.close()
+                self._connection = None
+            if not self._closed.is_set():
+                await asyncio.sleep(LISTEN_RECONNECT_DELAY)
+
+    async def stop(self):
+        self._closed.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+broker = TicketEventBroker(LISTEN_DATABASE_URL)
@@ -0,0 +1,137 @@
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+import math
+import os
+
+# Configuration
+GEOHASH_PRECISION = int(os.getenv("STAFF_GEOHASH_PRECISION", "7"))  # ~150m cells
+GEO_MAX_RINGS = 32  # cells searched outward before falling back to a full scan
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE = 111320.0
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+def encode_geohash(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, bounds = (lon, lon_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+def geohash_cell_size(precision: int = GEOHASH_PRECISION) -> Tuple[float, float]:
+    """(lat_degrees, lon_degrees) covered by one cell"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+class GeoGrid:
+    """Points bucketed by geohash cell.
+
+    Insert, move and remove are O(1). Nearest queries look at the query's cell
+    and then rings of neighbouring cells, stopping once no unseen cell can hold
+    anything closer than the results already found.
+    """
+
+    def __init__(self, precision: int = GEOHASH_PRECISION):
+        self.precision = precision
+        self.cell_lat, self.cell_lon = geohash_cell_size(precision)
+        self._cells: Dict[str, Set[Hashable]] = {}
+        self._points: Dict[Hashable, Tuple[float, float, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, key) -> bool:
+        return key in self._points
+
+    def insert(self, key, lat: float, lon: float):
+        self.remove(key)
+        cell = encode_geohash(lat, lon, self.precision)
+        self._cells.setdefault(cell, set()).add(key)
+        self._points[key] = (lat, lon, cell)
+
+    def remove(self, key):
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+        members = self._cells[point[2]]
+        members.discard(key)
+        if not members:
+            del self._cells[point[2]]
+
+    def _ring_cells(self, lat: float, lon: float, ring: int) -> Set[str]:
+        cells = set()
+        for i in range(-ring, ring + 1):
+            for j in range(-ring, ring + 1):
+                if max(abs(i), abs(j)) != ring:
+                    continue
+                cell_lat = lat + i * self.cell_lat
+                if not -90.0 <= cell_lat <= 90.0:
+                    continue
+                cell_lon = (lon + j * self.cell_lon + 180.0) % 360.0 - 180.0
+                cells.add(encode_geohash(cell_lat, cell_lon, self.precision))
+        return cells
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        limit: int = 1,
+        accept: Optional[Callable[[Hashable], bool]] = None,
+        max_rings: int = GEO_MAX_RINGS
+    ) -> List[Tuple[float, Hashable]]:
+        """Up to limit (distance_m, key) pairs ordered by distance, skipping keys accept rejects"""
+        accept = accept or (lambda key: True)
+        # Anything beyond ring r is at least r whole cells away from the query point
+        min_cell_m = METERS_PER_DEGREE * min(self.cell_lat, self.cell_lon * math.cos(math.radians(lat)))
+        found = []
+        seen_cells = set()
+        occupied_seen = 0
+        for ring in range(max_rings + 1):
+            for cell in self._ring_cells(lat, lon, ring) - seen_cells:
+                seen_cells.add(cell)
+                occupied_seen += cell in self._cells
+                for key in self._cells.get(cell, ()):
+                    if accept(key):
+                        point_lat, point_lon, _ = self._points[key]
+                        found.append((haversine_m(lat, lon, point_lat, point_lon), key))
+            if len(found) >= limit:
+                found.sort(key=lambda item: item[0])
+                if found[limit - 1][0] <= ring * min_cell_m:
+                    return found[:limit]
+            if occupied_seen == len(self._cells):
+                break
+        else:
+            # Sparse grid: finish with a scan of the cells the rings never reached
+            for cell, members in self._cells.items():
+                if cell in seen_cells:
+                    continue
+                for key in members:
+                    if accept(key):
+                        point_lat, point_lon, _ = self._points[key]
+                        found.append((haversine_m(lat, lon, point_lat, point_lon), key))
+        found.sort(key=lambda item: item[0])
+        return found[:limit]
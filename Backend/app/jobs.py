@@ -0,0 +1,203 @@
+from sqlalchemy import select, insert, update, cast, func, literal, literal_column, TIMESTAMP
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+import os
+from . import models, events, audit, recurrence
+from .models import TicketStatus
+
+# Configuration
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "500"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE = int(os.getenv("JOB_RETRY_BASE", "30"))  # seconds before the first retry, doubled after each
+JOB_RETRY_MAX = int(os.getenv("JOB_RETRY_MAX", "3600"))  # seconds
+JOB_ERROR_LENGTH = 1000
+
+@dataclass(frozen=True)
+class Job:
+    """A kind of due work: rows whose run_at has passed, claimed with FOR UPDATE SKIP LOCKED.
+
+    claim selects the due rows (labelled key and attempts plus whatever the job
+    needs) and statements turns a list of them into the statements that do the
+    work, so a batch runs set-based in one transaction.
+    """
+    name: str
+    model: type
+    key: str
+    run_at: str
+    attempts: str
+    error: str
+    claim: Callable
+    statements: Callable
+    exhausted: Dict[str, object]
+
+@dataclass
+class JobResult:
+    claimed: int = 0
+    succeeded: int = 0
+    retried: int = 0
+    exhausted: int = 0
+
+def retry_values(job: Job, attempts: int, error: str, now: datetime) -> dict:
+    """Bookkeeping for a failed row: exponential backoff, or give up after JOB_MAX_ATTEMPTS"""
+    attempts += 1
+    values = {job.attempts: attempts, job.error: error[:JOB_ERROR_LENGTH]}
+    if attempts >= JOB_MAX_ATTEMPTS:
+        values[job.run_at] = None
+        values.update(job.exhausted)
+    else:
+        delay = min(JOB_RETRY_BASE * 2 ** (attempts - 1), JOB_RETRY_MAX)
+        values[job.run_at] = now + timedelta(seconds=delay)
+    return values
+
+# Overdue follow-ups
+def followup_claim_query(batch_size: int, now: datetime):
+    task = models.FollowUpTask
+    ticket = models.Ticket
+    return select(
+        task.task_id.label("key"),
+        task.attempts.label("attempts"),
+        task.ticket_id,
+        task.missing_fields,
+        ticket.status.label("ticket_status"),
+        ticket.is_deleted,
+        ticket.location_id,
+        ticket.organization_id
+    ).outerjoin(
+        ticket, ticket.ticket_id == task.ticket_id
+    ).where(
+        task.next_run_at <= now
+    ).order_by(task.next_run_at).limit(batch_size).with_for_update(of=task, skip_locked=True)
+
+def followup_statements(rows: List, now: datetime) -> list:
+    """Close follow-ups whose ticket no longer needs them; escalate the rest as overdue"""
+    task = models.FollowUpTask
+    resolved = {
+        row.key for row in rows
+        if row.ticket_status is None or row.is_deleted or row.ticket_status != TicketStatus.INCOMPLETE.value
+    }
+    overdue = [row for row in rows if row.key not in resolved]
+    statements = []
+    if resolved:
+        statements.append(update(task).where(task.task_id.in_(sorted(resolved))).values(
+            status="completed", completed_at=now, next_run_at=None
+        ))
+    if overdue:
+        statements.append(update(task).where(task.task_id.in_([row.key for row in overdue])).values(
+            status="overdue", priority="high", next_run_at=None
+        ))
+        statements.append(events.ticket_events_statement([
+            events.ticket_event(
+                "followup_overdue", row.ticket_id, row.organization_id, row.location_id,
+                task_id=row.key, missing_fields=row.missing_fields
+            )
+            for row in overdue
+        ]))
+        statements.append(audit.audit_outbox_statement([
+            audit.audit_entry("regular", row.ticket_id, "followup_overdue", {
+                "followup_status": {"old": "pending", "new": "overdue"},
+                "followup_priority": {"old": None, "new": "high"}
+            })
+            for row in overdue
+        ]))
+    return statements
+
+# Recurring maintenance
+def recurrence_claim_query(batch_size: int, now: datetime):
+    ticket = models.MaintenanceTicket
+    return select(
+        ticket.ticket_id.label("key"),
+        ticket.recurrence_attempts.label("attempts"),
+        ticket.title,
+        ticket.description,
+        ticket.priority,
+        ticket.location_id,
+        ticket.created_by,
+        ticket.assigned_to,
+        ticket.maintenance_type,
+        ticket.scheduled_date,
+        ticket.recurrence,
+        ticket.required_fields_status,
+        ticket.is_deleted
+    ).where(
+        ticket.recurrence_run_at <= now
+    ).order_by(ticket.recurrence_run_at).limit(batch_size).with_for_update(skip_locked=True)
+
+def recurrence_statements(rows: List, now: datetime) -> list:
+    """Create each ticket's next occurrence, which carries the recurrence forward"""
+    ticket = models.MaintenanceTicket
+    occurrences = []
+    for row in rows:
+        if row.is_deleted:
+            continue
+        scheduled_date = recurrence.next_occurrence(row.scheduled_date, row.recurrence)
+        occurrences.append({
+            "title": row.title,
+            "description": row.description,
+            "status": TicketStatus.PENDING.value,
+            "priority": row.priority,
+            "location_id": row.location_id,
+            "created_by": row.created_by,
+            "assigned_to": row.assigned_to,
+            "maintenance_type": row.maintenance_type,
+            "scheduled_date": scheduled_date,
+            "recurrence": row.recurrence,
+            "required_fields_status": row.required_fields_status,
+            "recurrence_parent_id": row.key,
+            "recurrence_run_at": recurrence.materialize_at(scheduled_date, row.recurrence),
+            "recurrence_attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+            "is_deleted": False
+        })
+    statements = [update(ticket).where(ticket.ticket_id.in_([row.key for row in rows])).values(
+        recurrence_run_at=None
+    )]
+    if occurrences:
+        created = insert(ticket).values(occurrences).returning(
+            ticket.ticket_id, ticket.recurrence_parent_id
+        ).cte("created")
+        # Audit rows come from the INSERT's RETURNING in the same statement
+        statements.append(insert(models.AuditOutbox).from_select(
+            list(audit.AUDIT_COLUMNS),
+            select(
+                literal_column("'maintenance'"),
+                created.c.ticket_id,
+                literal_column("'created'"),
+                func.jsonb_build_object(
+                    literal_column("'recurrence_parent_id'"),
+                    func.jsonb_build_object(
+                        literal_column("'old'"), literal_column("NULL::int"),
+                        literal_column("'new'"), created.c.recurrence_parent_id
+                    )
+                ),
+                literal_column("NULL::int"),
+                cast(literal(now), TIMESTAMP)
+            )
+        ).add_cte(created))
+    return statements
+
+JOBS = {
+    "followups": Job(
+        name="followups",
+        model=models.FollowUpTask,
+        key="task_id",
+        run_at="next_run_at",
+        attempts="attempts",
+        error="last_error",
+        claim=followup_claim_query,
+        statements=followup_statements,
+        exhausted={"status": "failed"}
+    ),
+    "recurrences": Job(
+        name="recurrences",
+        model=models.MaintenanceTicket,
+        key="ticket_id",
+        run_at="recurrence_run_at",
+        attempts="recurrence_attempts",
+        error="recurrence_error",
+        claim=recurrence_claim_query,
+        statements=recurrence_statements,
+        exhausted={}
+    ),
+}
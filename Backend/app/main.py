@@ -1,31 +1,76 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Response, APIRouter
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, APIRouter
 from sqlalchemy.orm import Session
-from .database import engine, SessionLocal
-from . import models, schemas, crud
+from .database import get_session, pool_status, close_db_connections
+from . import schemas, crud
+from .async_crud import run_crud
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 from datetime import datetime, timedelta
 import os
 from pydantic import BaseModel, validator
 import bleach
 import logging
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import request_validation_exception_handler
 from typing import Any
-import time
-import json
 from .models import TicketStatus
 from .validators import TicketValidator
 from typing import List, Optional, Dict
-from .auth import get_current_user, oauth2_scheme
+from .auth import get_current_user
+from .principal_cache import Principal, principal_cache
+from .response_cache import response_cache, encode_body
+from .endpoints import tickets as ticket_endpoints
+from .endpoints import events as event_endpoints
+from .endpoints import emergencies as emergency_endpoints
+from .endpoints.emergencies import require_organization, scoped_organization
+from .endpoints import locations as location_endpoints
+from .endpoints import attachments as attachment_endpoints
+from .endpoints import auth as auth_endpoints
+from .events import broker
+from .dispatch import start_dispatch_index
+from .triage import triage_service
+from .audit_writer import audit_writer
+from .thumbnails import thumbnail_service
+from .scheduler import job_scheduler, JOB_SCHEDULER_ENABLED
+from .replicas import replica_router
+from .middleware import MetricsMiddleware, ProfilingMiddleware, BodySizeLimitMiddleware
+from .profiling import sql_profiler, SQL_PROFILING
+from . import metrics
+from .serialization import orm_response
+from .rate_limit import rate_limiter, enforce_rate_limit
+from .passwords import password_hasher
+from .tokens import revocation_set
+from .storage import storage
+from .startup import readiness
+from contextlib import asynccontextmanager
 
-print("Available schemas:", dir(schemas))  # Temporary debug line
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing here waits on the database: work that does runs behind the readiness gate
+    storage.start()
+    await replica_router.start()
+    broker.add_listener(response_cache.apply_event)
+    broker.add_listener(revocation_set.apply_event)
+    broker.add_listener(principal_cache.apply_event)
+    await broker.start()
+    thumbnail_service.start()
+    if JOB_SCHEDULER_ENABLED:
+        job_scheduler.start()
+    readiness.start([audit_writer.start, revocation_set.start, start_dispatch_index, triage_service.start])
+    yield
+    await readiness.stop()
+    await job_scheduler.stop()
+    await triage_service.stop()
+    await thumbnail_service.stop()
+    await audit_writer.stop()
+    await broker.stop()
+    await replica_router.stop()
+    await revocation_set.stop()
+    password_hasher.shutdown()
+    await close_db_connections()
 
-# Initialize FastAPI app
-app = FastAPI()
+# Initialize FastAPI app; routes without a response_model are dumped with orjson
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Get allowed origins from environment variables
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
@@ -41,66 +86,94 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
-
-# Dependency to get a database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Health check route
 @app.get("/")
 def read_root():
     return {"message": "BuildingManager API is running"}
 
+# Readiness probe: 503 until the database is reachable and startup state has loaded
+@app.get("/ready", include_in_schema=False)
+def read_ready():
+    if not readiness.ready:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True}
+
 class SanitizedOrganizationCreate(schemas.OrganizationCreate):
     @validator('name', 'type', 'address')
     def sanitize_strings(cls, v):
         return bleach.clean(v)
 
 # Example CRUD routes
-@app.post("/organizations/", response_model=schemas.Organization)
+@app.post("/organizations/", response_model=schemas.Organization, dependencies=[Depends(enforce_rate_limit)])
 async def create_organization(
     organization: SanitizedOrganizationCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.create_organization(db=db, organization=organization)
+    return await run_crud(db, crud.create_organization, organization=organization)
+
+@app.get("/organizations/{organization_id}", response_model=schemas.Organization, dependencies=[Depends(enforce_rate_limit)])
+async def get_organization(organization_id: int, request: Request, db: Session = Depends(get_session)):
+    async def load():
+        db_organization = await run_crud(db, crud.get_organization, organization_id=organization_id)
+        return encode_body(schemas.Organization, db_organization) if db_organization else None
 
-@app.get("/organizations/{organization_id}", response_model=schemas.Organization)
-def get_organization(organization_id: int, db: Session = Depends(get_db)):
-    db_organization = crud.get_organization(db=db, organization_id=organization_id)
-    if not db_organization:
+    cached = await response_cache.get_or_load(organization_id, "organization", load)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Organization not found")
-    return db_organization
+    return response_cache.respond(request, *cached)
+
+@app.patch("/users/{user_id}", response_model=schemas.AuthUser, dependencies=[Depends(enforce_rate_limit)])
+async def update_user(
+    user_id: int,
+    updates: schemas.UserUpdate,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    db_user = await run_crud(db, crud.update_user, user_id, updates)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return db_user
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256"
+@app.delete("/users/{user_id}", status_code=204, dependencies=[Depends(enforce_rate_limit)])
+async def delete_user(
+    user_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if not await run_crud(db, crud.soft_delete_user, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    return Response(status_code=204)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = crud.get_user_by_email(db, email=username)
-    if user is None:
-        raise credentials_exception
-    return user
+@app.get(
+    "/organizations/{organization_id}/ticket-stats",
+    response_model=schemas.TicketStats,
+    dependencies=[Depends(enforce_rate_limit)]
+)
+async def get_organization_ticket_stats(
+    organization_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    require_organization(current_user, organization_id)
+    return await run_crud(db, crud.get_organization_ticket_stats, organization_id=organization_id)
+
+@app.post("/admin/ticket-stats/rebuild")
+async def rebuild_ticket_stats(
+    organization_id: Optional[int] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_session)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    await run_crud(db, crud.rebuild_ticket_stats, organization_id=organization_id)
+    return {"status": "rebuilt"}
 
 logger = logging.getLogger(__name__)
 
@@ -112,55 +185,142 @@ async def global_exception_handler(request: Request, exc: Exception) -> Any:
         content={"detail": "Internal server error"}
     )
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    duration = time.time() - start_time
-    logger.info(f"{request.method} {request.url} took {duration:.2f}s")
-    return response
-
-@app.middleware("http")
-async def validation_middleware(request: Request, call_next):
-    # Validate request
-    if request.method in ["POST", "PUT", "PATCH"]:
-        try:
-            # Ensure JSON is valid
-            await request.json()
-        except json.JSONDecodeError:
-            return JSONResponse(
-                status_code=400,
-                content={"detail": "Invalid JSON format"}
-            )
-    
-    response = await call_next(request)
-    
-    # Validate response
-    if response.status_code >= 500:
-        logger.error(f"Server error occurred: {response.status_code}")
-        
-    return response
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError) -> Any:
+    # Malformed JSON is reported by FastAPI's own body parse; keep the 400 contract
+    if any(error.get("type") == "json_invalid" for error in exc.errors()):
+        return JSONResponse(
+            status_code=400,
+            content={"detail": "Invalid JSON format"}
+        )
+    return await request_validation_exception_handler(request, exc)
+
+app.add_middleware(BodySizeLimitMiddleware)
+if SQL_PROFILING:
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/admin/principal-cache")
+async def get_principal_cache_stats(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return principal_cache.stats()
+
+@app.get("/admin/response-cache")
+async def get_response_cache_stats(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return response_cache.stats()
+
+@app.get("/admin/jobs")
+async def get_job_stats(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return job_scheduler.stats()
+
+@app.get("/admin/startup")
+async def get_startup_stats(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return readiness.stats()
+
+@app.get("/admin/db-pool")
+async def get_db_pool_stats(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return pool_status()
+
+@app.get("/admin/replicas")
+async def get_replica_stats(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return replica_router.stats()
+
+@app.get("/admin/rate-limits")
+async def get_rate_limit_stats(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return rate_limiter.stats()
+
+@app.get("/admin/password-hashing")
+async def get_password_hashing_stats(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return password_hasher.stats()
+
+@app.get("/admin/tokens")
+async def get_token_stats(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return revocation_set.stats()
+
+@app.get("/admin/sql-profile")
+async def get_sql_profile(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return sql_profiler.report()
+
+@app.post("/admin/sql-profile/reset")
+async def reset_sql_profile(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    sql_profiler.reset()
+    return {"status": "reset"}
 
 # Create versioned routers
-v1_router = APIRouter(prefix="/api/v1")
-v2_router = APIRouter(prefix="/api/v2")
+v1_router = APIRouter(prefix="/api/v1", dependencies=[Depends(enforce_rate_limit)])
+v2_router = APIRouter(prefix="/api/v2", dependencies=[Depends(enforce_rate_limit)])
 
 # Version 1 endpoints (basic features)
-@v1_router.get("/tickets/")
-async def get_tickets_v1(db: Session = Depends(get_db)):
-    # Basic ticket listing
-    return crud.get_tickets_basic(db)
+@v1_router.get("/tickets/", response_model=List[schemas.TicketListItem])
+async def get_tickets_v1(
+    db: Session = Depends(get_session),
+    include: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user)
+):
+    # Basic ticket listing, limited to the caller's organization
+    tickets = await run_crud(
+        db,
+        crud.get_tickets_basic,
+        includes=crud.parse_includes(include),
+        organization_id=scoped_organization(current_user)
+    )
+    # Through the schema, so included users only ever expose UserSummary fields
+    return orm_response(schemas.TicketListItem, tickets)
 
 # Version 2 endpoints (advanced features)
-@v2_router.get("/tickets/")
+@v2_router.get("/tickets/", response_model=List[schemas.TicketListItem])
 async def get_tickets_v2(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_session),
     include_followups: bool = False,
-    include_severity: bool = False
+    include_severity: bool = False,
+    include: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user)
 ):
     # Advanced ticket listing with optional related data
-    return crud.get_tickets_advanced(db, include_followups, include_severity)
+    tickets = await run_crud(
+        db,
+        crud.get_tickets_advanced,
+        include_followups,
+        include_severity,
+        includes=crud.parse_includes(include),
+        organization_id=scoped_organization(current_user)
+    )
+    return orm_response(schemas.TicketListItem, tickets)
 
 # Include routers in main app
 app.include_router(v1_router)
 app.include_router(v2_router)
+# Event streams are long-lived and authenticate once per connection, so they aren't rate limited
+rate_limited = [Depends(enforce_rate_limit)]
+app.include_router(ticket_endpoints.router, dependencies=rate_limited)
+app.include_router(event_endpoints.router)
+app.include_router(emergency_endpoints.router, dependencies=rate_limited)
+app.include_router(location_endpoints.router, dependencies=rate_limited)
+app.include_router(attachment_endpoints.router, dependencies=rate_limited)
+app.include_router(auth_endpoints.router, dependencies=rate_limited)
@@ -0,0 +1,141 @@
+from contextvars import ContextVar
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as SQLAlchemyTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
+from typing import Optional, Tuple
+import os
+import time
+
+# Configuration
+# Set when running several uvicorn/gunicorn workers so /metrics aggregates all of them
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+OVERHEAD_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+CHECKOUT_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+UNMATCHED_ROUTE = "unmatched"  # one label for every 404, so scanners can't blow up cardinality
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request",
+    ["method", "route"], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time waiting for a pooled connection",
+    ["engine"], buckets=CHECKOUT_WAIT_BUCKETS
+)
+RATE_LIMIT_CHECK = Histogram(
+    "rate_limit_check_seconds", "Time spent in the rate limiter per request", buckets=OVERHEAD_BUCKETS
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections", "Requests rejected with 429", ["route_class", "scope"]
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_seconds", "Password hash/verify time including queueing for the hash pool",
+    ["operation"], buckets=LATENCY_BUCKETS
+)
+PASSWORD_HASH_REJECTED = Counter("password_hash_rejected", "Sign-ins refused because the hash pool was full")
+POOL_SIZE = Gauge("db_pool_size", "Configured pool size", ["engine"], multiprocess_mode="livesum")
+POOL_CONNECTIONS = Gauge("db_pool_connections", "Open pooled connections", ["engine"], multiprocess_mode="livesum")
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out", ["engine"], multiprocess_mode="livesum")
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond pool_size", ["engine"], multiprocess_mode="livesum")
+POOL_CHECKOUT_TIMEOUTS = Counter("db_pool_checkout_timeouts", "Checkouts that gave up after pool_timeout", ["engine"])
+POOL_INVALIDATIONS = Counter(
+    "db_pool_invalidations", "Connections discarded as dead or stale", ["engine", "kind"]
+)
+STARTUP_SECONDS = Gauge(
+    "app_startup_seconds", "Seconds from process start to serving and to ready", ["phase"], multiprocess_mode="max"
+)
+
+class RequestDbStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+# Set per request by the middleware; threadpool calls and async greenlets inherit it
+request_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("request_db_stats", default=None)
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+def observe_request(method: str, route: str, status_code: int, duration: float, stats: RequestDbStats):
+    REQUEST_LATENCY.labels(method, route, status_code).observe(duration)
+    REQUEST_DB_QUERIES.labels(method, route).observe(stats.queries)
+    REQUEST_DB_SECONDS.labels(method, route).observe(stats.seconds)
+
+# Engine instrumentation
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if request_db_stats.get() is not None:
+        conn.info["metrics_query_start"] = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = request_db_stats.get()
+    started = conn.info.pop("metrics_query_start", None)
+    if stats is not None and started is not None:
+        stats.queries += 1
+        stats.seconds += time.perf_counter() - started
+
+class PoolTelemetry:
+    """Records checkout wait, timeouts and overflow for the QueuePool it is mixed into"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except SQLAlchemyTimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.labels(self.engine_label).inc()
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.labels(self.engine_label).observe(time.perf_counter() - started)
+            POOL_OVERFLOW.labels(self.engine_label).set(max(self.overflow(), 0))
+
+    def _do_return_conn(self, record):
+        try:
+            super()._do_return_conn(record)
+        finally:
+            POOL_OVERFLOW.labels(self.engine_label).set(max(self.overflow(), 0))
+
+class TimedQueuePool(PoolTelemetry, QueuePool):
+    engine_label = "sync"
+
+class AsyncTimedQueuePool(PoolTelemetry, AsyncAdaptedQueuePool):
+    engine_label = "async"
+
+def instrument_engine(engine, label: str):
+    """Count statements per request and track pool occupancy for a (sync) engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    # NullPool (PgBouncer mode) has no size: every checkout opens a fresh connection
+    POOL_SIZE.labels(label).set(0 if isinstance(engine.pool, NullPool) else engine.pool.size())
+    connections = POOL_CONNECTIONS.labels(label)
+    checked_out = POOL_CHECKED_OUT.labels(label)
+    event.listen(engine, "connect", lambda dbapi_connection, record: connections.inc())
+    event.listen(engine, "close", lambda dbapi_connection, record: connections.dec())
+    event.listen(engine, "close_detached", lambda dbapi_connection: connections.dec())
+    event.listen(engine, "checkout", lambda dbapi_connection, record, proxy: checked_out.inc())
+    event.listen(engine, "checkin", lambda dbapi_connection, record: checked_out.dec())
+    invalidated = POOL_INVALIDATIONS.labels(label, "hard")
+    soft_invalidated = POOL_INVALIDATIONS.labels(label, "soft")
+    event.listen(engine, "invalidate", lambda dbapi_connection, record, exception: invalidated.inc())
+    event.listen(engine, "soft_invalidate", lambda dbapi_connection, record, exception: soft_invalidated.inc())
+
+def render() -> Tuple[bytes, str]:
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
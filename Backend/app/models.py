@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, Date, Time, JSON, TIMESTAMP, event, ARRAY, Enum as SQLAlchemyEnum
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Text, ForeignKey, Boolean, Date, Time, JSON, TIMESTAMP, event, ARRAY, Index, func, literal_column, text, Enum as SQLAlchemyEnum
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship, declared_attr
 from .database import Base
+from . import partitions, recurrence
 from datetime import datetime
 from enum import Enum
 
@@ -23,6 +25,8 @@ class Organization(Base):
     size = Column(Integer, nullable=False)  # e.g., number of occupants
     address = Column(Text, nullable=False)
     gps_coordinates = Column(String(100))  # Latitude/Longitude
+    latitude = Column(Float)
+    longitude = Column(Float)
     attributes = Column(JSON)  # Flexible field for client-specific data
     created_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
 
@@ -36,15 +40,36 @@ class Location(Base):
     location_id = Column(Integer, primary_key=True, index=True)
     organization_id = Column(Integer, ForeignKey("organizations.organization_id"), nullable=False)
     name = Column(String(100), nullable=False)
-    type = Column(String(50), nullable=False)
+    type = Column(String(50), nullable=False)  # campus, building, floor, room, ...
     capacity = Column(Integer)
     features = Column(JSON)
+    access_requirements = Column(JSON)
     status = Column(String(50), default="active")
     created_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
     is_deleted = Column(Boolean, default=False)
 
+    # Hierarchy: building > floor > room; full_name is the path, e.g. "Main Hall / Floor 2 / 204"
+    parent_id = Column(Integer, ForeignKey("locations.location_id"), nullable=True, index=True)
+    full_name = Column(String(500))
+    # Inherited from the nearest ancestor with coordinates when not given
+    latitude = Column(Float)
+    longitude = Column(Float)
+
     organization = relationship("Organization", back_populates="locations")
     tickets = relationship("Ticket", back_populates="location")
+    parent = relationship("Location", remote_side=[location_id])
+
+    __table_args__ = (
+        # Fuzzy matching of user-typed locations
+        Index(
+            "idx_locations_full_name_trgm", "full_name",
+            postgresql_using="gin", postgresql_ops={"full_name": "gin_trgm_ops"}
+        ),
+    )
+
+@event.listens_for(Location.__table__, "before_create")
+def create_trigram_extension(target, connection, **kw):
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
 
 # User-related tables
 class User(Base):
@@ -73,8 +98,13 @@ class Staff(Base):
     department = Column(String(100), nullable=False)
     role = Column(String(50), nullable=False)
     skills = Column(ARRAY(String))
-    availability = Column(JSON)  # Schedule/availability data
+    availability = Column(JSON)  # {"mon": [["08:00", "16:00"]], ...}; empty means always available
     is_active = Column(Boolean, default=True)
+    is_on_job = Column(Boolean, default=False)
+    # Last reported position, used for nearest-responder dispatch
+    latitude = Column(Float)
+    longitude = Column(Float)
+    position_updated_at = Column(TIMESTAMP)
     created_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
     is_deleted = Column(Boolean, default=False)
 
@@ -105,6 +135,7 @@ class TicketBase(Base):
     created_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
     updated_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_deleted = Column(Boolean, default=False)
+    required_fields_status = Column(JSON)  # Field -> completed map from TicketValidator
 
     # Foreign keys
     location_id = Column(Integer, ForeignKey("locations.location_id"), nullable=False)
@@ -112,29 +143,21 @@ class TicketBase(Base):
     assigned_to = Column(Integer, ForeignKey("users.user_id"), nullable=True)
 
     # Convert relationships to @declared_attr
+    # Location and User only keep reverse collections of regular tickets, so the
+    # emergency and maintenance tables get one-way relationships
     @declared_attr
     def location(cls):
-        return relationship("Location", back_populates="tickets")
+        return relationship("Location", back_populates="tickets" if cls.__tablename__ == "tickets" else None)
 
     @declared_attr
     def creator(cls):
-        return relationship("User", foreign_keys=[cls.created_by], back_populates="created_tickets")
+        back_populates = "created_tickets" if cls.__tablename__ == "tickets" else None
+        return relationship("User", foreign_keys=[cls.created_by], back_populates=back_populates)
 
     @declared_attr
     def assignee(cls):
-        return relationship("User", foreign_keys=[cls.assigned_to], back_populates="assigned_tickets")
-
-    @declared_attr
-    def comments(cls):
-        return relationship("Comment", back_populates="ticket")
-
-    @declared_attr
-    def attachments(cls):
-        return relationship("Attachment", back_populates="ticket")
-
-    @declared_attr
-    def followup_tasks(cls):
-        return relationship("FollowUpTask", back_populates="ticket")
+        back_populates = "assigned_tickets" if cls.__tablename__ == "tickets" else None
+        return relationship("User", foreign_keys=[cls.assigned_to], back_populates=back_populates)
 
 class Ticket(TicketBase):
     __tablename__ = "tickets"
@@ -142,13 +165,60 @@ class Ticket(TicketBase):
     ticket_type = Column(String(50), nullable=False)  # To differentiate between ticket types
     category = Column(String(100))
     subcategory = Column(String(100))
+    # Denormalized from the location so tenant listings avoid the join; filled by a trigger
+    organization_id = Column(Integer, ForeignKey("organizations.organization_id"), nullable=True)
+
+    # Comments, attachments and follow-ups reference tickets.ticket_id, so only regular tickets have them
+    comments = relationship("Comment", back_populates="ticket")
+    attachments = relationship("Attachment", back_populates="ticket")
+    followup_tasks = relationship("FollowUpTask", back_populates="ticket")
+
+    __table_args__ = (
+        # Keyset pagination order for ticket listings
+        Index("idx_tickets_created_at_ticket_id", "created_at", "ticket_id"),
+        Index("idx_tickets_org_created_at_ticket_id", "organization_id", "created_at", "ticket_id"),
+    )
+
+# Full-text search expression; queries must use this exact expression to hit the GIN index
+TICKET_SEARCH_VECTOR = func.to_tsvector(
+    literal_column("'english'::regconfig"),
+    func.coalesce(Ticket.__table__.c.title, "") + " " + func.coalesce(Ticket.__table__.c.description, "")
+)
+
+Index("idx_tickets_search", TICKET_SEARCH_VECTOR, postgresql_using="gin")
 
 class EmergencyTicket(TicketBase):
     __tablename__ = "emergency_tickets"
-    
+
+    # Hash partitioned by organization; the partition key has to be part of the primary key
+    ticket_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    organization_id = Column(Integer, ForeignKey("organizations.organization_id"), primary_key=True)
     emergency_type = Column(String(100), nullable=False)
+    user_input_location = Column(Text)  # as typed by the reporter
+    matched_location = Column(String(500))  # full_name of the location it resolved to
     response_time = Column(Time, nullable=True)
     resolution_time = Column(Time, nullable=True)
+    severity_id = Column(Integer, ForeignKey("incident_severities.severity_id"), nullable=True)
+    assigned_staff_id = Column(Integer, ForeignKey("staff.staff_id"), nullable=True)
+    estimated_response_time = Column(Integer, nullable=True)  # minutes
+    assigned_at = Column(TIMESTAMP, nullable=True)
+    escalated_at = Column(TIMESTAMP, nullable=True)
+
+    severity = relationship("IncidentSeverity")
+
+    __table_args__ = (
+        Index("idx_emergency_tickets_org_created_at", "organization_id", "created_at"),
+        {"postgresql_partition_by": "HASH (organization_id)"},
+    )
+
+@event.listens_for(EmergencyTicket.__table__, "after_create")
+def create_emergency_ticket_partitions(target, connection, **kw):
+    for statement in partitions.hash_partition_statements(target.name, partitions.EMERGENCY_TICKET_PARTITIONS):
+        connection.execute(text(statement))
+
+def recurrence_run_at(context):
+    params = context.get_current_parameters()
+    return recurrence.materialize_at(params.get("scheduled_date"), params.get("recurrence"))
 
 class MaintenanceTicket(TicketBase):
     __tablename__ = "maintenance_tickets"
@@ -157,6 +227,16 @@ class MaintenanceTicket(TicketBase):
     scheduled_date = Column(Date, nullable=True)
     completed_date = Column(Date, nullable=True)
     recurrence = Column(String(50))
+    # Scheduler bookkeeping for materializing the next occurrence; NULL run_at means nothing is due
+    recurrence_parent_id = Column(Integer, nullable=True)
+    recurrence_run_at = Column(TIMESTAMP, nullable=True, default=recurrence_run_at)
+    recurrence_attempts = Column(Integer, nullable=False, default=0)
+    recurrence_error = Column(Text)
+
+    __table_args__ = (
+        Index("idx_maintenance_tickets_recurrence_run_at", "recurrence_run_at",
+              postgresql_where=text("recurrence_run_at IS NOT NULL")),
+    )
 
 # Supporting tables
 class Comment(Base):
@@ -182,12 +262,17 @@ class Attachment(Base):
     file_type = Column(String(100), nullable=False)
     file_size = Column(Integer, nullable=False)
     file_path = Column(String(500), nullable=False)
+    # sha256 of the content; identical uploads share one stored blob
+    content_hash = Column(String(64), nullable=True, index=True)
     uploaded_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
     uploaded_by = Column(Integer, ForeignKey("users.user_id"), nullable=False)
 
     ticket = relationship("Ticket", back_populates="attachments")
     user = relationship("User")
 
+def followup_run_at(context):
+    return context.get_current_parameters().get("due_date")
+
 class FollowUpTask(Base):
     __tablename__ = "followup_tasks"
 
@@ -200,10 +285,82 @@ class FollowUpTask(Base):
     created_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
     completed_at = Column(TIMESTAMP, nullable=True)
     status = Column(String(50), default="pending")
+    # Scheduler bookkeeping; NULL next_run_at means nothing is left to do
+    next_run_at = Column(TIMESTAMP, nullable=True, default=followup_run_at)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
 
-    ticket = relationship("TicketBase", back_populates="followup_tasks")
+    ticket = relationship("Ticket", back_populates="followup_tasks")
     assignee = relationship("User", foreign_keys=[assigned_to])
 
+    __table_args__ = (
+        # Only rows with work left are indexed, so claiming due tasks never scans finished ones
+        Index("idx_followup_tasks_next_run_at", "next_run_at", postgresql_where=text("next_run_at IS NOT NULL")),
+    )
+
+class TicketLog(Base):
+    __tablename__ = "ticket_logs"
+
+    log_id = Column(Integer, primary_key=True, index=True)
+    # No foreign key: emergency_tickets is partitioned and only unique on (ticket_id, organization_id)
+    ticket_id = Column(Integer, nullable=True, index=True)
+    action = Column(String(50))
+    performed_by = Column(Integer, ForeignKey("staff.staff_id"), nullable=True)
+    log_timestamp = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
+
+class EnhancedTicketLog(Base):
+    __tablename__ = "enhanced_ticket_logs"
+
+    # Range partitioned by month; old months can be detached or dropped as a whole
+    log_id = Column(Integer, primary_key=True, autoincrement=True)
+    log_timestamp = Column(TIMESTAMP, primary_key=True, default=datetime.utcnow)
+    ticket_type = Column(String(20), nullable=False)  # regular or emergency
+    ticket_id = Column(Integer, nullable=False)
+    action = Column(String(50), nullable=False)
+    changes = Column(JSONB)
+    performed_by = Column(Integer, ForeignKey("staff.staff_id"), nullable=True)
+
+    __table_args__ = (
+        Index("idx_ticket_logs_ticket_type_id", "ticket_type", "ticket_id"),
+        {"postgresql_partition_by": "RANGE (log_timestamp)"},
+    )
+
+@event.listens_for(EnhancedTicketLog.__table__, "after_create")
+def create_enhanced_ticket_log_partitions(target, connection, **kw):
+    for statement in partitions.monthly_partition_statements(target.name):
+        connection.execute(text(statement))
+    connection.execute(text(partitions.default_partition_statement(target.name)))
+
+class AuditOutbox(Base):
+    __tablename__ = "audit_outbox"
+
+    # Written in the mutation's transaction, drained into enhanced_ticket_logs in batches
+    outbox_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    ticket_type = Column(String(20), nullable=False)
+    ticket_id = Column(Integer, nullable=False)
+    action = Column(String(50), nullable=False)
+    changes = Column(JSONB)
+    performed_by = Column(Integer, nullable=True)
+    log_timestamp = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
+
+# Incrementally maintained statistics
+class OrganizationTicketStats(Base):
+    __tablename__ = "organization_ticket_stats"
+
+    organization_id = Column(Integer, ForeignKey("organizations.organization_id"), primary_key=True)
+    total_tickets = Column(Integer, nullable=False, default=0)
+    open_tickets = Column(Integer, nullable=False, default=0)
+    responded_tickets = Column(Integer, nullable=False, default=0)
+    response_seconds_total = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
+
+class OrganizationTicketTypeCount(Base):
+    __tablename__ = "organization_ticket_type_counts"
+
+    organization_id = Column(Integer, ForeignKey("organizations.organization_id"), primary_key=True)
+    emergency_type = Column(String(100), primary_key=True)
+    ticket_count = Column(Integer, nullable=False, default=0)
+
 class IncidentSeverity(Base):
     __tablename__ = "incident_severities"
 
@@ -214,3 +371,25 @@ class IncidentSeverity(Base):
     escalation_required = Column(Boolean, default=False)
     notification_groups = Column(ARRAY(String))
     created_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
+
+# Authentication tokens
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    # One row per issued refresh token; a rotation chain shares its family_id
+    jti = Column(String(32), primary_key=True)
+    family_id = Column(String(32), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    access_jti = Column(String(32), nullable=False)  # the access token issued alongside
+    access_expires_at = Column(TIMESTAMP, nullable=False)
+    expires_at = Column(TIMESTAMP, nullable=False)
+    created_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
+    used_at = Column(TIMESTAMP)  # rotated; presenting it again means it leaked
+    revoked_at = Column(TIMESTAMP)
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    # Revoked access tokens, kept only until they would have expired anyway
+    jti = Column(String(32), primary_key=True)
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
@@ -0,0 +1,64 @@
+from datetime import date
+from typing import Iterable, List, Optional
+import os
+import re
+
+# Configuration
+EMERGENCY_TICKET_PARTITIONS = int(os.getenv("EMERGENCY_TICKET_PARTITIONS", "16"))
+LOG_PARTITION_MONTHS_AHEAD = int(os.getenv("LOG_PARTITION_MONTHS_AHEAD", "3"))
+
+PARTITION_NAMES_SQL = (
+    "SELECT child.relname FROM pg_inherits "
+    "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+    "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+    "WHERE parent.relname = :table"
+)
+
+def hash_partition_statements(table: str, modulus: int) -> List[str]:
+    """CREATE statements for every hash partition of a table partitioned by organization"""
+    return [
+        f"CREATE TABLE IF NOT EXISTS {table}_p{remainder} PARTITION OF {table} "
+        f"FOR VALUES WITH (MODULUS {modulus}, REMAINDER {remainder})"
+        for remainder in range(modulus)
+    ]
+
+def default_partition_statement(table: str) -> str:
+    # Catches rows outside the monthly ranges so inserts never fail
+    return f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def monthly_partition_statements(
+    table: str,
+    months_ahead: int = LOG_PARTITION_MONTHS_AHEAD,
+    start: Optional[date] = None
+) -> List[str]:
+    """CREATE statements for the current month's range partition and the next months_ahead"""
+    month = (start or date.today()).replace(day=1)
+    statements = []
+    for offset in range(months_ahead + 1):
+        lower = add_months(month, offset)
+        upper = add_months(lower, 1)
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS {table}_y{lower.year}m{lower.month:02d} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+    return statements
+
+def expired_monthly_partitions(
+    table: str,
+    names: Iterable[str],
+    retention_months: int,
+    today: Optional[date] = None
+) -> List[str]:
+    """Monthly partitions whose whole range is older than the retention window"""
+    cutoff = add_months((today or date.today()).replace(day=1), -retention_months)
+    pattern = re.compile(rf"^{re.escape(table)}_y(\d{{4}})m(\d{{2}})$")
+    expired = []
+    for name in names:
+        match = pattern.match(name)
+        if match and add_months(date(int(match.group(1)), int(match.group(2)), 1), 1) <= cutoff:
+            expired.append(name)
+    return sorted(expired)
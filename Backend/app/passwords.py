@@ -0,0 +1,112 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from typing import Optional
+import asyncio
+import bcrypt
+import logging
+import os
+import time
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))  # raise over time; logins upgrade old hashes
+# bcrypt releases the GIL, so threads hash in parallel; leave a core for the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max((os.cpu_count() or 2) - 1, 1))))
+# Beyond this many queued hashes, sign-ins get a 503 instead of waiting: the worst-case
+# login latency is about (max_pending / workers + 1) hash times
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+MAX_PASSWORD_BYTES = 72  # bcrypt ignores everything past this
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+def _verify(password: str, password_hash: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode(), password_hash.encode())
+    except ValueError:
+        # Not a bcrypt hash (e.g. a placeholder from seeding): never matches
+        return False
+
+def hash_rounds(password_hash: str) -> Optional[int]:
+    """Cost factor of a $2b$12$... hash, or None if it isn't bcrypt"""
+    parts = password_hash.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+class PasswordHasher:
+    """bcrypt on a bounded thread pool, so a burst of sign-ins never blocks the event loop.
+
+    The pool is created on first use. Work past max_pending is refused rather
+    than queued, which keeps sign-in latency bounded during a burst and leaves
+    the workers' cores to the rest of the API.
+    """
+
+    def __init__(
+        self,
+        rounds: int = PASSWORD_BCRYPT_ROUNDS,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING
+    ):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0  # only touched on the event loop
+        self.rejected = 0
+        self.upgraded = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dummy_hash: Optional[str] = None
+
+    async def _run(self, operation: str, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            metrics.PASSWORD_HASH_REJECTED.inc()
+            raise HTTPException(
+                status_code=503,
+                detail="Too many sign-ins in progress, please retry",
+                headers={"Retry-After": "1"}
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+            metrics.PASSWORD_HASH_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash, password, self.rounds)
+
+    async def verify(self, password: str, password_hash: Optional[str]) -> bool:
+        """Check a password; with no stored hash, still spend a hash's time so unknown emails don't stand out"""
+        if password_hash is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = await self._run("hash", _hash, "dummy-password", self.rounds)
+            await self._run("verify", _verify, password, self._dummy_hash)
+            return False
+        return await self._run("verify", _verify, password, password_hash)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        rounds = hash_rounds(password_hash)
+        return rounds is None or rounds < self.rounds
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "upgraded": self.upgraded
+        }
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,140 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import os
+import threading
+import time
+
+# Configuration
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "300"))  # seconds
+# Not-before times only matter while a token issued before them can still be valid
+PRINCIPAL_NOT_BEFORE_TTL = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")) * 60  # seconds
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller, detached from any database session"""
+    user_id: int
+    email: str
+    role: str
+    organization_id: int
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            user_id=user.user_id,
+            email=user.email,
+            role=user.role,
+            organization_id=user.organization_id
+        )
+
+class PrincipalCache:
+    """Bounded LRU/TTL cache of principals keyed by token (subject, exp).
+
+    Invalidation drops cached entries and records a not-before time per user
+    and per organization, so tokens issued earlier can no longer be trusted
+    from their claims alone and fall back to a database lookup. Other workers
+    apply the same invalidation from the principal_invalidated and
+    organization_deleted events; not-before times are dropped once every token
+    they could reject has expired.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = PRINCIPAL_CACHE_SIZE,
+        ttl: int = PRINCIPAL_CACHE_TTL,
+        not_before_ttl: int = PRINCIPAL_NOT_BEFORE_TTL
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.not_before_ttl = not_before_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, Principal]]" = OrderedDict()
+        self._user_not_before = {}
+        self._org_not_before = {}
+        self._lock = threading.Lock()
+
+    def get(self, subject: str, exp: int) -> Optional[Principal]:
+        key = (subject, exp)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, subject: str, exp: int, principal: Principal):
+        # Never cache past the token's own expiry
+        expires_at = min(time.time() + self.ttl, exp)
+        with self._lock:
+            self._entries[(subject, exp)] = (expires_at, principal)
+            self._entries.move_to_end((subject, exp))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def is_stale(self, subject: str, organization_id: Optional[int], issued_at: Optional[float]) -> bool:
+        """Whether claims issued at issued_at predate an invalidation for this user or organization"""
+        with self._lock:
+            not_before = max(
+                self._user_not_before.get(subject, 0),
+                self._org_not_before.get(organization_id, 0)
+            )
+        if not not_before:
+            return False
+        return issued_at is None or issued_at <= not_before
+
+    def _prune(self, now: float):
+        cutoff = now - self.not_before_ttl
+        for not_before in (self._user_not_before, self._org_not_before):
+            for key in [key for key, at in not_before.items() if at < cutoff]:
+                del not_before[key]
+
+    def invalidate_user(self, subject: str):
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            self._user_not_before[subject] = now
+            for key in [key for key in self._entries if key[0] == subject]:
+                del self._entries[key]
+
+    def invalidate_organization(self, organization_id: int):
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            self._org_not_before[organization_id] = now
+            for key in [key for key, (_, principal) in self._entries.items()
+                        if principal.organization_id == organization_id]:
+                del self._entries[key]
+
+    def apply_event(self, event: dict):
+        """Broker listener: repeats invalidations made by other workers (and this one, harmlessly)"""
+        kind = event.get("event")
+        if kind == "principal_invalidated":
+            self.invalidate_user(event["subject"])
+        elif kind == "organization_deleted":
+            self.invalidate_organization(event["organization_id"])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "invalidated_users": len(self._user_not_before),
+                "invalidated_organizations": len(self._org_not_before),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+principal_cache = PrincipalCache()
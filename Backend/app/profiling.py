@@ -0,0 +1,160 @@
+from collections import deque, Counter
+from contextvars import ContextVar
+from datetime import datetime
+from sqlalchemy import event
+from typing import Dict, Optional
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+SQL_PROFILING = os.getenv("SQL_PROFILING", "false").lower() in ("1", "true", "yes")
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+SQL_SLOW_QUERY_BUFFER = int(os.getenv("SQL_SLOW_QUERY_BUFFER", "100"))
+SQL_EXPLAIN_SLOW = os.getenv("SQL_EXPLAIN_SLOW", "true").lower() in ("1", "true", "yes")
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10"))  # same statement this often in one request
+MAX_CAPTURED_LENGTH = 2000
+
+# Only statements EXPLAIN accepts; anything else (DDL, SET, ...) would abort the transaction
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+EXPLAIN_SAVEPOINT = "profile_explain"
+UNATTRIBUTED = "<unattributed>"
+
+# The crud function currently running; set by db_operation_handler
+current_operation: ContextVar[Optional[str]] = ContextVar("current_operation", default=None)
+# Statement counts for the current request, for N+1 detection; set by ProfilingMiddleware
+request_statements: ContextVar[Optional[Counter]] = ContextVar("request_statements", default=None)
+
+def _truncate(value) -> str:
+    text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= MAX_CAPTURED_LENGTH else text[:MAX_CAPTURED_LENGTH] + "..."
+
+def _redact(parameters):
+    """Bind parameter names and types only: values can be password hashes, tokens or contact details"""
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"{len(parameters)} parameter sets"
+        return [type(value).__name__ for value in parameters]
+    return None
+
+class SqlProfiler:
+    """Per crud function statement timings, a ring buffer of slow statements and N+1 reports.
+
+    Opt-in with SQL_PROFILING: when off the engine listeners are never attached.
+    """
+
+    def __init__(self, slow_ms: float = SQL_SLOW_QUERY_MS, buffer_size: int = SQL_SLOW_QUERY_BUFFER):
+        self.slow_seconds = slow_ms / 1000
+        self.slow_queries = deque(maxlen=buffer_size)
+        self.n_plus_one = deque(maxlen=buffer_size)
+        self._operations: Dict[str, list] = {}  # name -> [statements, seconds, max_seconds]
+        self._lock = threading.Lock()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["profile_query_start"] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("profile_query_start", None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        operation = current_operation.get() or UNATTRIBUTED
+        with self._lock:
+            totals = self._operations.setdefault(operation, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += duration
+            totals[2] = max(totals[2], duration)
+
+        statements = request_statements.get()
+        if statements is not None:
+            statements[(operation, statement)] += 1
+
+        if duration >= self.slow_seconds:
+            self.slow_queries.append({
+                "operation": operation,
+                "statement": _truncate(statement),
+                "parameters": _redact(parameters),
+                "duration_ms": round(duration * 1000, 3),
+                "captured_at": datetime.utcnow().isoformat(),
+                "plan": self._explain(conn, statement, parameters) if SQL_EXPLAIN_SLOW and not executemany else None
+            })
+
+    def _explain(self, conn, statement: str, parameters) -> Optional[str]:
+        if not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        # A failed statement aborts a PostgreSQL transaction: inside one, EXPLAIN runs
+        # in a savepoint so a failure rolls back only that and the caller carries on
+        savepoint = conn.in_transaction()
+        try:
+            # A separate cursor, so the caller's pending results are untouched; plain EXPLAIN never runs the statement
+            cursor = conn.connection.cursor()
+            try:
+                if savepoint:
+                    cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+                try:
+                    cursor.execute("EXPLAIN " + statement, parameters)
+                    return "\n".join(str(row[0]) for row in cursor.fetchall())
+                except Exception:
+                    if savepoint:
+                        cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+                    raise
+                finally:
+                    if savepoint:
+                        cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            finally:
+                cursor.close()
+        except Exception as e:
+            logger.debug(f"EXPLAIN failed for slow statement: {str(e)}")
+            return None
+
+    def instrument(self, engine):
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def finish_request(self, method: str, route: str, statements: Counter):
+        """Report statements repeated within one request, the signature of lazy loads in a loop"""
+        for (operation, statement), count in statements.items():
+            if count >= SQL_N_PLUS_ONE_THRESHOLD:
+                logger.warning(f"Possible N+1: {method} {route} ran a statement {count} times in {operation}")
+                self.n_plus_one.append({
+                    "method": method,
+                    "route": route,
+                    "operation": operation,
+                    "statement": _truncate(statement),
+                    "count": count,
+                    "captured_at": datetime.utcnow().isoformat()
+                })
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+        self.slow_queries.clear()
+        self.n_plus_one.clear()
+
+    def report(self) -> dict:
+        with self._lock:
+            operations = [
+                {
+                    "operation": name,
+                    "statements": statements,
+                    "total_ms": round(seconds * 1000, 3),
+                    "mean_ms": round(seconds * 1000 / statements, 3),
+                    "max_ms": round(max_seconds * 1000, 3)
+                }
+                for name, (statements, seconds, max_seconds) in self._operations.items()
+            ]
+        operations.sort(key=lambda item: item["total_ms"], reverse=True)
+        return {
+            "enabled": SQL_PROFILING,
+            "slow_query_ms": self.slow_seconds * 1000,
+            "operations": operations,
+            "slow_queries": list(self.slow_queries),
+            "n_plus_one": list(self.n_plus_one)
+        }
+
+sql_profiler = SqlProfiler()
@@ -0,0 +1,235 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from fastapi import Depends, HTTPException, Request
+from typing import Dict, List, Optional, Tuple
+import logging
+import math
+import os
+import threading
+import time
+from .auth import get_optional_user
+from .principal_cache import Principal
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# memory:// enforces per worker; redis://host:port/db gives every worker one shared budget
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "memory://")
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))  # memory store only
+RATE_LIMIT_PREFIX = "ratelimit"
+
+ROUTE_CLASSES = ("read", "write", "emergency")
+SCOPES = ("user", "ip", "org")
+
+# Requests per period, also the burst size; override with e.g. RATE_LIMIT_WRITE_IP=120/minute or "off"
+DEFAULT_LIMITS = {
+    ("read", "user"): "600/minute",
+    ("read", "ip"): "1200/minute",
+    ("read", "org"): "6000/minute",
+    ("write", "user"): "60/minute",
+    ("write", "ip"): "120/minute",
+    ("write", "org"): "600/minute",
+    # Own buckets, so a flood of ordinary traffic can never spend the emergency budget
+    ("emergency", "user"): "30/minute",
+    ("emergency", "ip"): "60/minute",
+    ("emergency", "org"): "300/minute",
+}
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+@dataclass(frozen=True)
+class Limit:
+    capacity: float  # burst size
+    rate: float  # tokens refilled per second
+
+def parse_limit(value: str) -> Optional[Limit]:
+    """'60/minute' -> Limit(60, 1.0); 'off' -> None"""
+    value = value.strip().lower()
+    if value in ("", "off", "none"):
+        return None
+    count, _, period = value.partition("/")
+    seconds = PERIODS.get(period.strip().rstrip("s"))
+    if seconds is None or not count.strip().isdigit() or int(count) <= 0:
+        raise ValueError(f"Invalid rate limit '{value}', expected e.g. '60/minute'")
+    return Limit(capacity=float(count), rate=int(count) / seconds)
+
+def load_limits() -> Dict[Tuple[str, str], Limit]:
+    limits = {}
+    for (route_class, scope), default in DEFAULT_LIMITS.items():
+        limit = parse_limit(os.getenv(f"RATE_LIMIT_{route_class.upper()}_{scope.upper()}", default))
+        if limit is not None:
+            limits[(route_class, scope)] = limit
+    return limits
+
+class MemoryStore:
+    """Token buckets in this process; also the stand-in for Redis in local runs"""
+
+    def __init__(self, maxsize: int = RATE_LIMIT_MAX_BUCKETS):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    async def take(self, keys: List[str], limits: List[Limit]) -> Tuple[float, int]:
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            wait, blocked = 0.0, -1
+            for index, (key, limit) in enumerate(zip(keys, limits)):
+                tokens, updated = self._buckets.get(key, (limit.capacity, now))
+                tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+                levels.append(tokens)
+                if tokens < 1 and (1 - tokens) / limit.rate > wait:
+                    wait, blocked = (1 - tokens) / limit.rate, index
+            for key, tokens in zip(keys, levels):
+                # All or nothing: a rejected request spends no bucket's tokens
+                self._buckets[key] = (tokens - 1 if blocked < 0 else tokens, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait, blocked
+
+    def size(self) -> Optional[int]:
+        return len(self._buckets)
+
+# KEYS: bucket keys; ARGV: capacity and rate for each key in turn.
+# Runs atomically on the server and uses the server's clock, so workers on
+# different hosts share one budget without trusting each other's time.
+TAKE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local levels = {}
+local wait, blocked = 0, -1
+for i = 1, #KEYS do
+  local capacity = tonumber(ARGV[i * 2 - 1])
+  local rate = tonumber(ARGV[i * 2])
+  local state = redis.call('HMGET', KEYS[i], 'tokens', 'updated')
+  local tokens = tonumber(state[1]) or capacity
+  local updated = tonumber(state[2]) or now
+  tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+  levels[i] = tokens
+  if tokens < 1 and (1 - tokens) / rate > wait then
+    wait, blocked = (1 - tokens) / rate, i - 1
+  end
+end
+for i = 1, #KEYS do
+  local capacity = tonumber(ARGV[i * 2 - 1])
+  local rate = tonumber(ARGV[i * 2])
+  local tokens = levels[i]
+  if blocked < 0 then tokens = tokens - 1 end
+  redis.call('HSET', KEYS[i], 'tokens', tostring(tokens), 'updated', tostring(now))
+  redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate * 1000))
+end
+return {tostring(wait), blocked}
+"""
+
+class RedisStore:
+    """Token buckets on a Redis-compatible server; redis is only imported when configured"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._client = redis.from_url(url)
+        self._take = self._client.register_script(TAKE_SCRIPT)
+
+    async def take(self, keys: List[str], limits: List[Limit]) -> Tuple[float, int]:
+        args = []
+        for limit in limits:
+            args.extend((limit.capacity, limit.rate))
+        wait, blocked = await self._take(keys=keys, args=args)
+        return float(wait), int(blocked)
+
+    def size(self) -> Optional[int]:
+        return None
+
+def make_store(url: str = RATE_LIMIT_URL):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    return MemoryStore()
+
+def route_class(request: Request) -> str:
+    if request.method in ("GET", "HEAD", "OPTIONS"):
+        return "read"
+    if metrics.route_label(request.scope).startswith("/api/emergencies"):
+        return "emergency"
+    return "write"
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the forwarded client address
+    return request.client.host if request.client else "unknown"
+
+class RateLimiter:
+    """Per-user, per-IP and per-organization token buckets for each route class.
+
+    One request takes a token from every bucket that applies to it in a single
+    atomic call to the store, so the check is one round trip even with Redis,
+    and a rejected request doesn't spend tokens from the buckets it passed.
+    """
+
+    def __init__(self, store, limits: Dict[Tuple[str, str], Limit]):
+        self.store = store
+        self.limits = limits
+        self.allowed = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def buckets(self, request: Request, principal: Optional[Principal]) -> Tuple[str, List[str], List[Limit]]:
+        kind = route_class(request)
+        identities = {"ip": client_ip(request)}
+        if principal is not None:
+            identities["user"] = principal.user_id
+            identities["org"] = principal.organization_id
+        keys, limits = [], []
+        for scope, identity in identities.items():
+            limit = self.limits.get((kind, scope))
+            if limit is not None and identity is not None:
+                keys.append(f"{RATE_LIMIT_PREFIX}:{kind}:{scope}:{identity}")
+                limits.append(limit)
+        return kind, keys, limits
+
+    async def check(self, request: Request, principal: Optional[Principal]):
+        started = time.perf_counter()
+        kind, keys, limits = self.buckets(request, principal)
+        if not keys:
+            return
+        try:
+            wait, blocked = await self.store.take(keys, limits)
+        except Exception as e:
+            # A store outage must not take the API down with it: fail open
+            logger.warning(f"Rate limit store unavailable: {str(e)}")
+            self.errors += 1
+            return
+        finally:
+            metrics.RATE_LIMIT_CHECK.observe(time.perf_counter() - started)
+        if blocked < 0:
+            self.allowed += 1
+            return
+        self.rejected += 1
+        scope = keys[blocked].split(":")[2]
+        metrics.RATE_LIMIT_REJECTIONS.labels(kind, scope).inc()
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(math.ceil(wait), 1))}
+        )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": RATE_LIMIT_ENABLED,
+            "store": type(self.store).__name__,
+            "buckets": self.store.size(),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "limits": {
+                f"{kind}:{scope}": {"capacity": limit.capacity, "per_second": limit.rate}
+                for (kind, scope), limit in self.limits.items()
+            }
+        }
+
+rate_limiter = RateLimiter(make_store(), load_limits())
+
+async def enforce_rate_limit(request: Request, principal: Optional[Principal] = Depends(get_optional_user)):
+    """Router dependency; shares the request's principal with get_current_user"""
+    if RATE_LIMIT_ENABLED:
+        await rate_limiter.check(request, principal)
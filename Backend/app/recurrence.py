@@ -0,0 +1,43 @@
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from typing import Optional
+import os
+
+# Configuration
+RECURRENCE_LEAD_DAYS = int(os.getenv("RECURRENCE_LEAD_DAYS", "7"))  # materialize the next occurrence this early
+
+# recurrence value -> (days, months) between occurrences
+RECURRENCE_INTERVALS = {
+    "daily": (1, 0),
+    "weekly": (7, 0),
+    "biweekly": (14, 0),
+    "monthly": (0, 1),
+    "quarterly": (0, 3),
+    "semiannual": (0, 6),
+    "yearly": (0, 12),
+    "annual": (0, 12),
+}
+
+def shift_months(day: date, months: int) -> date:
+    """Same day of month, clamped to the month's length (Jan 31 + 1 month = Feb 28/29)"""
+    index = day.year * 12 + day.month - 1 + months
+    year, month = index // 12, index % 12 + 1
+    return date(year, month, min(day.day, monthrange(year, month)[1]))
+
+def next_occurrence(scheduled_date: date, recurrence: str) -> date:
+    interval = RECURRENCE_INTERVALS.get((recurrence or "").strip().lower())
+    if interval is None:
+        raise ValueError(f"Unknown recurrence '{recurrence}'")
+    days, months = interval
+    return shift_months(scheduled_date, months) + timedelta(days=days)
+
+def materialize_at(scheduled_date: Optional[date], recurrence: Optional[str]) -> Optional[datetime]:
+    """When the scheduler should create the occurrence after this one; None if it never recurs"""
+    if not recurrence or scheduled_date is None:
+        return None
+    try:
+        due = next_occurrence(scheduled_date, recurrence) - timedelta(days=RECURRENCE_LEAD_DAYS)
+    except ValueError:
+        # Still scheduled, so the bad value surfaces as a recorded job error
+        due = scheduled_date
+    return datetime.combine(due, datetime.min.time())
@@ -0,0 +1,226 @@
+from contextvars import ContextVar
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import threading
+import time
+from .profiling import current_operation
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+# Comma-separated; empty means every read goes to the primary
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))  # seconds behind the primary before a replica is skipped
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", "5"))  # seconds between checks
+MAX_TRACKED_WRITES = 10000
+
+# crud operations whose statements may be served by a replica
+READ_ONLY_OPERATIONS = frozenset({
+    "get_tickets_basic",
+    "get_tickets_advanced",
+    "get_organization_ticket_stats",
+    "get_organization_locations",
+    "match_locations",
+})
+
+# Zero when the replica has replayed everything it received, so an idle primary doesn't read as lag.
+# Outside recovery (a plain server standing in for a replica) the functions return NULL, hence 0.
+LAG_QUERY = text(
+    "SELECT COALESCE(CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END, 0)"
+)
+
+# Keys whose recent writes this request must be able to read back
+consistency_keys: ContextVar[Tuple[str, ...]] = ContextVar("consistency_keys", default=())
+
+def user_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def organization_key(organization_id: int) -> str:
+    return f"org:{organization_id}"
+
+def require_consistency(*keys: str):
+    """Make reads in the current request see the latest writes recorded for these keys"""
+    consistency_keys.set(consistency_keys.get() + keys)
+
+def measure_lag(conn) -> float:
+    if conn.dialect.name != "postgresql":
+        # SQLite and friends stand in for replicas in development: reachable means current
+        conn.execute(text("SELECT 1"))
+        return 0.0
+    return float(conn.execute(LAG_QUERY).scalar() or 0)
+
+class Replica:
+    def __init__(self, name: str, engine, async_engine=None):
+        self.name = name
+        self.engine = engine  # what sessions bind to; the sync view of async_engine when there is one
+        self.async_engine = async_engine
+        self.healthy = False  # until the first check passes
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self.reads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def as_of(self) -> float:
+        """Time up to which this replica is known to have replayed the primary's writes"""
+        return self.checked_at - (self.lag or 0)
+
+    def in_use(self) -> int:
+        checkedout = getattr(self.engine.pool, "checkedout", None)
+        return checkedout() if checkedout else 0
+
+class ReplicaRouter:
+    """Chooses the replica for read-only crud operations, or None for the primary.
+
+    A replica is eligible while its last health check is recent, it is at most
+    REPLICA_MAX_LAG behind, and it has replayed past the latest write recorded
+    for each key the request requires (read-your-writes). Among eligible
+    replicas the one with the fewest checked-out connections wins.
+    """
+
+    def __init__(self, max_lag: float = REPLICA_MAX_LAG, interval: float = REPLICA_HEALTH_INTERVAL):
+        self.max_lag = max_lag
+        self.interval = interval
+        self.replicas: List[Replica] = []
+        self.primary_fallbacks = 0
+        self._last_writes: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def add_replica(self, replica: Replica):
+        self.replicas.append(replica)
+
+    def record_write(self, *keys: str):
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                self._last_writes[key] = now
+            if len(self._last_writes) > MAX_TRACKED_WRITES:
+                # Older writes are visible on any replica eligible by lag alone
+                horizon = now - self.max_lag - 2 * self.interval
+                self._last_writes = {key: at for key, at in self._last_writes.items() if at > horizon}
+
+    def choose(self, keys: Tuple[str, ...] = ()) -> Optional[Replica]:
+        if not self.replicas:
+            return None
+        now = time.time()
+        with self._lock:
+            required = max((self._last_writes.get(key, 0.0) for key in keys), default=0.0)
+        eligible = [
+            replica for replica in self.replicas
+            if replica.healthy
+            and now - replica.checked_at <= 3 * self.interval
+            and replica.lag <= self.max_lag
+            and replica.as_of >= required
+        ]
+        if not eligible:
+            self.primary_fallbacks += 1
+            return None
+        replica = min(eligible, key=lambda replica: (replica.in_use(), replica.lag))
+        replica.reads += 1
+        return replica
+
+    def _check_sync(self, replica: Replica) -> float:
+        with replica.engine.connect() as conn:
+            return measure_lag(conn)
+
+    async def check(self, replica: Replica):
+        started = time.time()
+        try:
+            if replica.async_engine is not None:
+                async with replica.async_engine.connect() as conn:
+                    lag = await conn.run_sync(measure_lag)
+            else:
+                lag = await run_in_threadpool(self._check_sync, replica)
+        except (SQLAlchemyError, OSError) as e:
+            if replica.healthy:
+                logger.warning(f"Replica {replica.name} failed its health check: {str(e)}")
+            replica.healthy = False
+            replica.failures += 1
+            replica.last_error = str(e)
+            return
+        if not replica.healthy:
+            logger.info(f"Replica {replica.name} is healthy, {lag:.3f}s behind")
+        replica.lag = lag
+        replica.checked_at = started
+        replica.healthy = True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    async def start(self):
+        if not self.replicas:
+            return
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "max_lag": self.max_lag,
+            "primary_fallbacks": self.primary_fallbacks,
+            "tracked_writes": len(self._last_writes),
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lag": replica.lag,
+                    "checked_at": replica.checked_at or None,
+                    "in_use": replica.in_use(),
+                    "reads": replica.reads,
+                    "failures": replica.failures,
+                    "last_error": replica.last_error
+                }
+                for replica in self.replicas
+            ]
+        }
+
+replica_router = ReplicaRouter()
+
+class RoutingSession(Session):
+    """Session that sends the statements of read-only crud operations to a replica.
+
+    Anything else goes to the primary, and so does everything after the session
+    has written. A session stays on the replica it first picked while that
+    replica remains healthy.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kw)
+        if self._flushing or (clause is not None and clause.is_dml):
+            self.info["wrote"] = True
+            return primary
+        if self.info.get("wrote") or current_operation.get() not in READ_ONLY_OPERATIONS:
+            return primary
+        replica = self.info.get("replica")
+        if replica is None or not replica.healthy:
+            replica = replica_router.choose(consistency_keys.get())
+            if replica is None:
+                return primary
+            self.info["replica"] = replica
+        return replica.engine
+
+@event.listens_for(RoutingSession, "after_commit")
+def _record_committed_write(session):
+    if session.info.pop("wrote", False):
+        keys = consistency_keys.get()
+        if keys:
+            replica_router.record_write(*keys)
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_rolled_back_write(session):
+    session.info.pop("wrote", None)
@@ -0,0 +1,197 @@
+from collections import OrderedDict
+from fastapi import Request, Response
+from pydantic import BaseModel
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Type, Union
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from .serialization import encode
+from .replicas import replica_router, require_consistency, organization_key
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+# memory:// keeps entries per worker; redis://host:port/db shares them (any Redis-protocol server)
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "memory://")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))  # seconds
+RESPONSE_CACHE_PREFIX = "respcache"
+
+# Organization-level changes that invalidate everything cached for the organization
+INVALIDATING_EVENTS = {"organization_updated", "organization_deleted", "location_created"}
+
+class MemoryBackend:
+    """In-process LRU/TTL store; also the stand-in for Redis in local runs"""
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    async def counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+class RedisBackend:
+    """Shared store on a Redis-compatible server; redis is only imported when configured"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        await self._client.set(key, value, ex=ttl)
+
+    async def counter(self, key: str) -> int:
+        value = await self._client.get(key)
+        return int(value) if value is not None else 0
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(key)
+
+    def size(self) -> Optional[int]:
+        return None
+
+def make_backend(url: str = RESPONSE_CACHE_URL):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    return MemoryBackend()
+
+def encode_body(schema: Type[BaseModel], value: Union[object, List[object]]) -> bytes:
+    """Serialize ORM objects through their response schema, once, into the cached body"""
+    return encode(schema, value)
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+class ResponseCache:
+    """Serialized GET responses keyed by organization version.
+
+    Every key embeds the organization's current version, so invalidation is a
+    single counter bump: older entries are never read again and age out by
+    TTL or LRU. Mutations announce themselves with an organization event in
+    their own transaction, which reaches every worker once it commits.
+    """
+
+    def __init__(self, backend, ttl: int = RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.errors = 0
+
+    def _version_key(self, organization_id: int) -> str:
+        return f"{RESPONSE_CACHE_PREFIX}:org:{organization_id}:version"
+
+    async def get_or_load(
+        self,
+        organization_id: int,
+        resource: str,
+        load: Callable[[], Awaitable[Optional[bytes]]]
+    ) -> Optional[Tuple[str, bytes]]:
+        """(etag, body) for the resource, calling load on a miss; None when load finds nothing"""
+        try:
+            version = await self.backend.counter(self._version_key(organization_id))
+            key = f"{RESPONSE_CACHE_PREFIX}:org:{organization_id}:v{version}:{resource}"
+            cached = await self.backend.get(key)
+        except Exception as e:
+            # A cache outage degrades to uncached reads, never to failed ones
+            logger.warning(f"Response cache read failed: {str(e)}")
+            self.errors += 1
+            key, cached = None, None
+        if cached is not None:
+            self.hits += 1
+            etag, _, body = cached.partition(b"\n")
+            return etag.decode(), body
+        self.misses += 1
+        # Never fill the new version from a replica that hasn't replayed the change behind it
+        require_consistency(organization_key(organization_id))
+        body = await load()
+        if body is None:
+            return None
+        etag = make_etag(body)
+        if key is not None:
+            try:
+                await self.backend.set(key, etag.encode() + b"\n" + body, self.ttl)
+            except Exception as e:
+                logger.warning(f"Response cache write failed: {str(e)}")
+                self.errors += 1
+        return etag, body
+
+    def respond(self, request: Request, etag: str, body: bytes) -> Response:
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def invalidate_organization(self, organization_id: int):
+        replica_router.record_write(organization_key(organization_id))
+        try:
+            await self.backend.incr(self._version_key(organization_id))
+        except Exception as e:
+            logger.error(f"Response cache invalidation failed for organization {organization_id}: {str(e)}")
+            self.errors += 1
+
+    def apply_event(self, event: dict):
+        """Broker listener: bump the organization's version when it or its locations change"""
+        if event.get("event") in INVALIDATING_EVENTS and event.get("organization_id") is not None:
+            asyncio.get_running_loop().create_task(self.invalidate_organization(event["organization_id"]))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "size": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "errors": self.errors,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+response_cache = ResponseCache(make_backend())
@@ -0,0 +1,93 @@
+from fastapi import HTTPException
+from typing import Dict, Optional
+import asyncio
+import logging
+import os
+import time
+from . import crud
+from .async_crud import run_crud
+from .database import session_scope
+from .jobs import JOBS, JOB_BATCH_SIZE, JOB_RETRY_MAX
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5.0"))  # seconds between sweeps
+# Turn off in web workers when a dedicated `python -m app.scheduler` process runs the jobs
+JOB_SCHEDULER_ENABLED = os.getenv("JOB_SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+class JobScheduler:
+    """Runs due follow-ups and recurrences in batches, in any number of processes.
+
+    Each batch claims its rows with FOR UPDATE SKIP LOCKED through a partial
+    index on the run_at column, so workers never block on or double-run each
+    other's rows and a sweep only touches rows that are actually due.
+    """
+
+    def __init__(self, interval: float = JOB_POLL_INTERVAL, batch_size: int = JOB_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._metrics: Dict[str, dict] = {
+            name: {
+                "sweeps": 0, "claimed": 0, "succeeded": 0, "retried": 0, "exhausted": 0,
+                "errors": 0, "last_sweep_at": None, "last_sweep_seconds": None
+            }
+            for name in JOBS
+        }
+
+    async def run_job(self, name: str) -> int:
+        """Run full batches of a job until it has nothing due; returns rows handled"""
+        metrics = self._metrics[name]
+        started = time.monotonic()
+        handled = 0
+        try:
+            while True:
+                async with session_scope() as db:
+                    result = await run_crud(db, crud.run_job_batch, name, self.batch_size)
+                handled += result.claimed
+                for field in ("claimed", "succeeded", "retried", "exhausted"):
+                    metrics[field] += getattr(result, field)
+                if result.claimed < self.batch_size:
+                    return handled
+        except HTTPException:
+            metrics["errors"] += 1
+            raise
+        finally:
+            metrics["sweeps"] += 1
+            metrics["last_sweep_at"] = time.time()
+            metrics["last_sweep_seconds"] = time.monotonic() - started
+
+    async def _run(self):
+        delay = self.interval
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                for name in JOBS:
+                    await self.run_job(name)
+                delay = self.interval
+            except HTTPException as e:
+                # Back off while the database is failing instead of hammering it
+                delay = min(delay * 2, JOB_RETRY_MAX)
+                logger.error(f"Job sweep failed, next attempt in {delay:.0f}s: {e.detail}")
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {name: dict(metrics) for name, metrics in self._metrics.items()}
+
+job_scheduler = JobScheduler()
+
+async def run_forever():
+    job_scheduler.start()
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_forever())
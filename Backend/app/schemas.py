@@ -1,4 +1,4 @@
-from pydantic import BaseModel, validator, EmailStr
+from pydantic import BaseModel, Field, validator, EmailStr
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -49,12 +49,15 @@ class StaffUpdate(BaseModel):
     is_active: Optional[bool]
 
 class LocationCreate(BaseModel):
+    organization_id: int
     name: str
     type: str
     capacity: Optional[int]
     features: Dict[str, Any]
     status: str = "active"
-    coordinates: Optional[Dict[str, float]]
+    parent_id: Optional[int] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     access_requirements: Optional[Dict[str, Any]]
 
 class LocationUpdate(BaseModel):
@@ -71,6 +74,8 @@ class OrganizationBase(BaseModel):
     size: int
     address: str
     gps_coordinates: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     attributes: Optional[Dict[str, Any]] = None
 
 class OrganizationCreate(OrganizationBase):
@@ -83,6 +88,8 @@ class Organization(BaseModel):
     size: int
     address: str
     gps_coordinates: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     attributes: Optional[Dict[str, Any]] = None  # Maps to JSONB in PostgreSQL
     created_at: datetime
 
@@ -99,12 +106,12 @@ class UserCreate(BaseModel):
     contact_info: Dict[str, str]
 
 class UserUpdate(BaseModel):
-    name: Optional[str]
-    email: Optional[EmailStr]
-    role: Optional[str]
-    identifier: Optional[str]
-    contact_info: Optional[Dict[str, str]]
-    is_active: Optional[bool]
+    name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    role: Optional[str] = None
+    identifier: Optional[str] = None
+    contact_info: Optional[Dict[str, str]] = None
+    is_active: Optional[bool] = None
 
 class CommentCreate(BaseModel):
     content: str
@@ -133,6 +140,192 @@ class TicketResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class LocationSummary(BaseModel):
+    location_id: int
+    name: str
+    type: str
+
+    class Config:
+        from_attributes = True
+
+class LoginRequest(BaseModel):
+    email: EmailStr
+    password: str
+
+class RegisterRequest(BaseModel):
+    # Field names as the registration form sends them
+    first_name: str = Field(..., alias="firstName", min_length=1, max_length=49)
+    last_name: str = Field(..., alias="lastName", min_length=1, max_length=50)
+    email: EmailStr
+    password: str = Field(..., min_length=8)
+    apartment_number: Optional[str] = Field(None, alias="apartmentNumber", max_length=100)
+
+    class Config:
+        populate_by_name = True
+
+class AuthUser(BaseModel):
+    user_id: int
+    name: str
+    email: str
+    role: str
+    organization_id: int
+
+    class Config:
+        from_attributes = True
+
+class LoginResponse(BaseModel):
+    token: str
+    refresh_token: str
+    token_type: str = "bearer"
+    expires_in: int  # seconds until the access token expires
+    user: AuthUser
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None  # also end the session this refresh token belongs to
+
+class UserSummary(BaseModel):
+    user_id: int
+    name: str
+    role: str
+
+    class Config:
+        from_attributes = True
+
+class CommentItem(BaseModel):
+    comment_id: int
+    user_id: int
+    content: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class AttachmentItem(BaseModel):
+    attachment_id: int
+    file_name: str
+    file_type: str
+    file_size: int
+    content_hash: Optional[str] = None
+    uploaded_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class FollowUpTaskItem(BaseModel):
+    task_id: int
+    missing_fields: Optional[List[str]] = None
+    priority: str
+    due_date: datetime
+    status: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class TicketListItem(BaseModel):
+    ticket_id: int
+    title: str
+    description: str
+    status: str
+    priority: str
+    ticket_type: str
+    category: Optional[str] = None
+    location_id: int
+    created_by: int
+    assigned_to: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+
+    # Populated only when requested through ?include=
+    location: Optional[LocationSummary] = None
+    creator: Optional[UserSummary] = None
+    assignee: Optional[UserSummary] = None
+    comments: Optional[List[CommentItem]] = None
+    attachments: Optional[List[AttachmentItem]] = None
+    followup_tasks: Optional[List[FollowUpTaskItem]] = None
+
+    class Config:
+        from_attributes = True
+
+class TicketPage(BaseModel):
+    tickets: List[TicketListItem]
+    next_cursor: Optional[str] = None
+    has_more: bool
+
+class EmergencyTicketItem(BaseModel):
+    ticket_id: int
+    title: str
+    status: str
+    priority: str
+    emergency_type: str
+    organization_id: Optional[int] = None
+    location_id: int
+    assigned_staff_id: Optional[int] = None
+    estimated_response_time: Optional[int] = None
+    created_at: datetime
+    assigned_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class EmergencyAssign(BaseModel):
+    staff_id: int
+    estimated_response_time: int
+
+class EmergencyAutoAssign(BaseModel):
+    category: str
+    min_level: int = 0
+    estimated_response_time: int
+
+class StaffRecommendation(BaseModel):
+    staff_id: int
+    level: int
+    distance_m: Optional[float] = None
+
+class StaffPosition(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+class LocationItem(BaseModel):
+    location_id: int
+    organization_id: int
+    parent_id: Optional[int] = None
+    name: str
+    type: str
+    full_name: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+class LocationMatch(BaseModel):
+    location: LocationItem
+    score: float
+
+class TriageEntry(BaseModel):
+    ticket_id: int
+    deadline: datetime
+
+class TicketCommentCreate(BaseModel):
+    content: str
+
+class TicketStatusUpdate(BaseModel):
+    status: str
+
+class BulkTicketItemResult(BaseModel):
+    index: int
+    ticket_id: Optional[int] = None
+    status: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkTicketResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkTicketItemResult]
+
 class EmergencyTicketResponse(TicketResponse):
     emergency_level: int
     response_time: Optional[datetime]
@@ -0,0 +1,109 @@
+from starlette.concurrency import run_in_threadpool
+from typing import Awaitable, Callable, List, Optional
+import asyncio
+import logging
+import os
+import time
+from .database import create_tables, warm_pool
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+# Development convenience only: real databases are created and migrated from database/schema.sql
+DB_CREATE_TABLES = os.getenv("DB_CREATE_TABLES", "false").lower() in ("1", "true", "yes")
+STARTUP_RETRY_MAX = float(os.getenv("STARTUP_RETRY_MAX", "30"))  # seconds between database attempts, at most
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started (Linux only), so import time counts toward startup"""
+    try:
+        with open("/proc/self/stat") as f:
+            started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - started_ticks / os.sysconf("SC_CLK_TCK")
+
+class Readiness:
+    """Startup work that needs the database, run in the background behind /ready.
+
+    The app serves (and answers liveness on /) as soon as the lifespan yields;
+    /ready stays 503 until the database has answered, the pool is warm and the
+    in-memory state has loaded, so the load balancer holds traffic until then.
+    A database that is briefly down delays readiness instead of failing the boot.
+    """
+
+    def __init__(self):
+        self.serving_after: Optional[float] = None
+        self.ready_after: Optional[float] = None
+        self.attempts = 0
+        self.warmed = 0
+        self.last_error: Optional[str] = None
+        self._steps: List[Callable[[], Awaitable]] = []
+        self._started: Optional[float] = None
+        self._offset = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_after is not None
+
+    def _elapsed(self) -> float:
+        return self._offset + time.monotonic() - self._started
+
+    async def _connect(self):
+        if DB_CREATE_TABLES:
+            await run_in_threadpool(create_tables)
+        self.warmed = await warm_pool()
+
+    async def _retry(self, step: Callable[[], Awaitable]):
+        """Run step until it succeeds; a step that fails must not have half-started"""
+        delay = 1.0
+        name = getattr(step, "__qualname__", repr(step))
+        while True:
+            self.attempts += 1
+            try:
+                await step()
+                self.last_error = None
+                return
+            except Exception as e:
+                # Keep retrying whatever the cause: giving up here would leave the worker never ready
+                self.last_error = f"{name}: {getattr(e, 'detail', e)}"
+                logger.warning(f"Startup step {name} failed (attempt {self.attempts}), retrying in {delay:.0f}s: {self.last_error}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, STARTUP_RETRY_MAX)
+
+    async def _prepare(self):
+        # Ready only once every step has loaded: an empty index or queue would look healthy but be wrong
+        for step in [self._connect, *self._steps]:
+            await self._retry(step)
+        self.ready_after = self._elapsed()
+        metrics.STARTUP_SECONDS.labels("ready").set(self.ready_after)
+        logger.info(f"Ready {self.ready_after:.2f}s after process start, {self.warmed} connections warmed")
+
+    def start(self, steps: List[Callable[[], Awaitable]]):
+        """Called at the end of startup; steps run in order once the database is reachable"""
+        self._started = time.monotonic()
+        self._offset = process_age() or 0.0
+        self._steps = steps
+        self.serving_after = self._elapsed()
+        metrics.STARTUP_SECONDS.labels("serving").set(self.serving_after)
+        self._task = asyncio.create_task(self._prepare())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "serving_after": self.serving_after,
+            "ready_after": self.ready_after,
+            "attempts": self.attempts,
+            "warmed_connections": self.warmed,
+            "last_error": self.last_error
+        }
+
+readiness = Readiness()
@@ -0,0 +1,200 @@
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from starlette.concurrency import run_in_threadpool
+from typing import AsyncIterator, List, Optional
+from urllib.parse import quote
+import hashlib
+import os
+import tempfile
+
+# Configuration
+ATTACHMENT_STORAGE_DIR = os.getenv("ATTACHMENT_STORAGE_DIR", "attachments")
+# Set a bucket to keep blobs in S3 or any S3-compatible store (MinIO etc.) instead of on disk
+ATTACHMENT_S3_BUCKET = os.getenv("ATTACHMENT_S3_BUCKET")
+ATTACHMENT_S3_ENDPOINT = os.getenv("ATTACHMENT_S3_ENDPOINT")
+# With nginx in front, hand local downloads to it (sendfile, ranges) via X-Accel-Redirect
+ATTACHMENT_ACCEL_PREFIX = os.getenv("ATTACHMENT_ACCEL_PREFIX")
+ATTACHMENT_MAX_SIZE = int(os.getenv("ATTACHMENT_MAX_SIZE", str(50 * 1024 * 1024)))  # bytes
+PRESIGNED_URL_TTL = 300  # seconds
+# Uploads are served with their declared type only if it is on this list; anything else
+# (HTML, SVG, scripts...) goes out as an opaque download so it can never render on our origin
+ATTACHMENT_CONTENT_TYPES = {
+    "image/jpeg", "image/png", "image/gif", "image/webp", "image/heic",
+    "application/pdf", "text/plain", "text/csv",
+    "application/msword", "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.ms-excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/zip",
+}
+FALLBACK_CONTENT_TYPE = "application/octet-stream"
+
+def blob_key(digest: str) -> str:
+    # Fan out by the first two hex digits so no directory grows unbounded
+    return f"blobs/{digest[:2]}/{digest}"
+
+def thumbnail_key(digest: str) -> str:
+    return f"thumbs/{digest[:2]}/{digest}.jpg"
+
+def served_content_type(media_type: str) -> str:
+    """The client-declared type if it is safe to serve, otherwise an opaque one"""
+    media_type = media_type.split(";", 1)[0].strip().lower()
+    return media_type if media_type in ATTACHMENT_CONTENT_TYPES else FALLBACK_CONTENT_TYPE
+
+def content_disposition(filename: Optional[str]) -> str:
+    """Always a download, never inline; non-ASCII names go in filename* (RFC 6266)"""
+    if not filename:
+        return "attachment"
+    fallback = "".join(c if 32 <= ord(c) < 127 and c not in '"\\' else "_" for c in filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+class BlobWriter:
+    """Spools an upload to a temp file, hashing it chunk by chunk as it arrives"""
+
+    def __init__(self, tmp_dir: str, max_size: int = ATTACHMENT_MAX_SIZE):
+        fd, self.path = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+        self.max_size = max_size
+        self.size = 0
+        self._file = os.fdopen(fd, "wb")
+        self._hash = hashlib.sha256()
+
+    def write(self, chunks: List[bytes]):
+        """Blocking; called through the threadpool"""
+        for chunk in chunks:
+            self.size += len(chunk)
+            if self.size > self.max_size:
+                raise HTTPException(status_code=413, detail="Attachment too large")
+            self._hash.update(chunk)
+            self._file.write(chunk)
+
+    def close(self):
+        self._file.close()
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    @property
+    def digest(self) -> str:
+        return self._hash.hexdigest()
+
+class LocalStorage:
+    """Content-addressed blobs on the local filesystem"""
+
+    def __init__(self, root: str = ATTACHMENT_STORAGE_DIR):
+        self.root = root
+        # Temp files live under the root so publishing a blob is an atomic rename
+        self.tmp_dir = os.path.join(root, "tmp")
+
+    def start(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    async def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    async def put(self, path: str, key: str, content_type: str):
+        """Publish a finished temp file under key; the temp file is consumed"""
+        destination = self._path(key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        # Identical content under an identical key, so losing a race is harmless
+        os.replace(path, destination)
+
+    @asynccontextmanager
+    async def local_path(self, key: str) -> AsyncIterator[str]:
+        yield self._path(key)
+
+    def response(self, key: str, media_type: str, filename: Optional[str] = None) -> Response:
+        media_type = served_content_type(media_type)
+        headers = {
+            "Cache-Control": "private, max-age=31536000, immutable",
+            "Content-Disposition": content_disposition(filename),
+            "X-Content-Type-Options": "nosniff"
+        }
+        if ATTACHMENT_ACCEL_PREFIX:
+            # nginx keeps the headers set here on the X-Accel-Redirect response
+            headers["X-Accel-Redirect"] = f"{ATTACHMENT_ACCEL_PREFIX.rstrip('/')}/{key}"
+            return Response(media_type=media_type, headers=headers)
+        # FileResponse answers Range requests itself
+        return FileResponse(self._path(key), media_type=media_type, headers=headers)
+
+class S3Storage:
+    """Content-addressed blobs in an S3-compatible bucket; boto3 is only imported once started"""
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.tmp_dir = tempfile.gettempdir()
+        self._client = None
+        self._client_error = None
+
+    def start(self):
+        import boto3
+        from botocore.exceptions import ClientError
+        self._client = boto3.client("s3", endpoint_url=self.endpoint_url)
+        self._client_error = ClientError
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await run_in_threadpool(self._client.head_object, Bucket=self.bucket, Key=key)
+            return True
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    async def put(self, path: str, key: str, content_type: str):
+        try:
+            # upload_file switches to multipart uploads for large files
+            await run_in_threadpool(
+                self._client.upload_file, path, self.bucket, key, ExtraArgs={"ContentType": content_type}
+            )
+        finally:
+            os.remove(path)
+
+    @asynccontextmanager
+    async def local_path(self, key: str) -> AsyncIterator[str]:
+        fd, path = tempfile.mkstemp(dir=self.tmp_dir)
+        os.close(fd)
+        try:
+            await run_in_threadpool(self._client.download_file, self.bucket, key, path)
+            yield path
+        finally:
+            os.remove(path)
+
+    def response(self, key: str, media_type: str, filename: Optional[str] = None) -> Response:
+        # The store serves the bytes (and Range requests) directly
+        params = {
+            "Bucket": self.bucket,
+            "Key": key,
+            "ResponseContentType": served_content_type(media_type),
+            "ResponseContentDisposition": content_disposition(filename)
+        }
+        url = self._client.generate_presigned_url("get_object", Params=params, ExpiresIn=PRESIGNED_URL_TTL)
+        return RedirectResponse(url, status_code=307)
+
+# Nothing touches the filesystem or imports boto3 until storage.start() runs at startup
+def make_storage():
+    if ATTACHMENT_S3_BUCKET:
+        return S3Storage(ATTACHMENT_S3_BUCKET, ATTACHMENT_S3_ENDPOINT)
+    return LocalStorage()
+
+storage = make_storage()
+
+async def publish_blob(writer: BlobWriter, content_type: str) -> bool:
+    """Store a finished upload under its hash; False when identical content was already stored"""
+    writer.close()
+    key = blob_key(writer.digest)
+    if await storage.exists(key):
+        writer.discard()
+        return False
+    try:
+        await storage.put(writer.path, key, content_type)
+    except Exception:
+        writer.discard()
+        raise
+    return True
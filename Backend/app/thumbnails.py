@@ -0,0 +1,67 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Set
+import asyncio
+import logging
+import os
+from .storage import storage, blob_key, thumbnail_key
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "320"))  # longest edge in pixels
+
+THUMBNAIL_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp", "image/tiff"}
+
+def render_thumbnail(source: str, destination: str, size: int):
+    """Runs in a worker process; Pillow is only needed there"""
+    from PIL import Image
+    with Image.open(source) as image:
+        image.thumbnail((size, size))
+        image.convert("RGB").save(destination, "JPEG", quality=80, optimize=True)
+
+class ThumbnailService:
+    """Renders thumbnails of newly stored images in a process pool, off the request path.
+
+    Thumbnails are keyed by the image's content hash like the blobs, so a
+    duplicate upload reuses the existing thumbnail and is never rendered twice.
+    """
+
+    def __init__(self, workers: int = THUMBNAIL_WORKERS, size: int = THUMBNAIL_SIZE):
+        self.workers = workers
+        self.size = size
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(self, digest: str, content_type: str):
+        if self._pool is None or content_type not in THUMBNAIL_TYPES:
+            return
+        task = asyncio.create_task(self._render(digest))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _render(self, digest: str):
+        destination = os.path.join(storage.tmp_dir, f"{digest}.thumb.jpg")
+        try:
+            async with storage.local_path(blob_key(digest)) as source:
+                await asyncio.get_running_loop().run_in_executor(
+                    self._pool, render_thumbnail, source, destination, self.size
+                )
+            await storage.put(destination, thumbnail_key(digest), "image/jpeg")
+        except Exception as e:
+            logger.warning(f"Thumbnail generation failed for {digest}: {str(e)}")
+            if os.path.exists(destination):
+                os.remove(destination)
+
+    def start(self):
+        if self.workers > 0:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    async def stop(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+thumbnail_service = ThumbnailService()
@@ -0,0 +1,159 @@
+from sqlalchemy import select, delete, func, case, literal, BigInteger
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+from . import models
+
+# Statuses that count toward open_tickets
+OPEN_STATUSES = ("pending", "assigned")
+
+def is_open(status) -> bool:
+    return str(getattr(status, "value", status)) in OPEN_STATUSES
+
+def stats_delta_statements(
+    organization_id: int,
+    total: int = 0,
+    open_delta: int = 0,
+    responded: int = 0,
+    response_seconds: int = 0,
+    types: Optional[Dict[str, int]] = None
+) -> list:
+    """Upserts that apply a delta to an organization's counters in the caller's transaction"""
+    stats = pg_insert(models.OrganizationTicketStats).values(
+        organization_id=organization_id,
+        total_tickets=total,
+        open_tickets=open_delta,
+        responded_tickets=responded,
+        response_seconds_total=response_seconds,
+        updated_at=datetime.utcnow()
+    )
+    table = models.OrganizationTicketStats
+    statements = [stats.on_conflict_do_update(
+        index_elements=[table.organization_id],
+        set_={
+            "total_tickets": table.total_tickets + stats.excluded.total_tickets,
+            "open_tickets": table.open_tickets + stats.excluded.open_tickets,
+            "responded_tickets": table.responded_tickets + stats.excluded.responded_tickets,
+            "response_seconds_total": table.response_seconds_total + stats.excluded.response_seconds_total,
+            "updated_at": stats.excluded.updated_at
+        }
+    )]
+
+    if types:
+        type_table = models.OrganizationTicketTypeCount
+        counts = pg_insert(type_table).values([
+            {"organization_id": organization_id, "emergency_type": emergency_type, "ticket_count": count}
+            for emergency_type, count in types.items()
+        ])
+        statements.append(counts.on_conflict_do_update(
+            index_elements=[type_table.organization_id, type_table.emergency_type],
+            set_={"ticket_count": type_table.ticket_count + counts.excluded.ticket_count}
+        ))
+    return statements
+
+def ticket_created_statements(created: List[tuple]) -> list:
+    """Counter upserts for new emergency tickets given as (organization_id, emergency_type, status)"""
+    totals = Counter()
+    opens = Counter()
+    types = {}
+    for organization_id, emergency_type, status in created:
+        if organization_id is None:
+            continue
+        totals[organization_id] += 1
+        opens[organization_id] += is_open(status)
+        types.setdefault(organization_id, Counter())[emergency_type] += 1
+
+    statements = []
+    for organization_id, total in totals.items():
+        statements.extend(stats_delta_statements(
+            organization_id,
+            total=total,
+            open_delta=opens[organization_id],
+            types=types[organization_id]
+        ))
+    return statements
+
+def status_change_statements(
+    organization_id: Optional[int],
+    old_status: str,
+    new_status: str,
+    response_seconds: Optional[int] = None
+) -> list:
+    """Counter upserts for a status transition, including the first response time.
+
+    Every path that changes an emergency ticket's status runs these in its own
+    transaction (today only assignment does); rebuild_statements repairs any drift.
+    """
+    if organization_id is None:
+        return []
+    open_delta = int(is_open(new_status)) - int(is_open(old_status))
+    if not open_delta and response_seconds is None:
+        return []
+    return stats_delta_statements(
+        organization_id,
+        open_delta=open_delta,
+        responded=0 if response_seconds is None else 1,
+        response_seconds=response_seconds or 0
+    )
+
+def rebuild_statements(organization_id: Optional[int] = None) -> list:
+    """Statements that recompute the counters from emergency_tickets from scratch"""
+    tickets = models.EmergencyTicket
+    stats_table = models.OrganizationTicketStats
+    type_table = models.OrganizationTicketTypeCount
+
+    delete_stats = delete(stats_table)
+    delete_types = delete(type_table)
+    ticket_filter = [tickets.organization_id.isnot(None), tickets.is_deleted.isnot(True)]
+    if organization_id is not None:
+        delete_stats = delete_stats.where(stats_table.organization_id == organization_id)
+        delete_types = delete_types.where(type_table.organization_id == organization_id)
+        ticket_filter.append(tickets.organization_id == organization_id)
+
+    response_seconds = func.extract("epoch", tickets.assigned_at - tickets.created_at)
+    insert_stats = pg_insert(stats_table).from_select(
+        ["organization_id", "total_tickets", "open_tickets", "responded_tickets",
+         "response_seconds_total", "updated_at"],
+        select(
+            tickets.organization_id,
+            func.count(),
+            func.count(case((tickets.status.in_(OPEN_STATUSES), 1))),
+            func.count(tickets.assigned_at),
+            func.coalesce(func.sum(response_seconds), 0).cast(BigInteger),
+            literal(datetime.utcnow())
+        ).where(*ticket_filter).group_by(tickets.organization_id)
+    )
+    insert_types = pg_insert(type_table).from_select(
+        ["organization_id", "emergency_type", "ticket_count"],
+        select(
+            tickets.organization_id,
+            tickets.emergency_type,
+            func.count()
+        ).where(*ticket_filter).group_by(tickets.organization_id, tickets.emergency_type)
+    )
+    return [delete_stats, delete_types, insert_stats, insert_types]
+
+def stats_query(organization_id: int):
+    return select(models.OrganizationTicketStats).where(
+        models.OrganizationTicketStats.organization_id == organization_id
+    )
+
+def type_counts_query(organization_id: int):
+    return select(
+        models.OrganizationTicketTypeCount.emergency_type,
+        models.OrganizationTicketTypeCount.ticket_count
+    ).where(models.OrganizationTicketTypeCount.organization_id == organization_id)
+
+def build_ticket_stats(stats: Optional[models.OrganizationTicketStats], type_counts) -> dict:
+    """Shape the stored counters as schemas.TicketStats"""
+    total_tickets = stats.total_tickets if stats else 0
+    open_tickets = stats.open_tickets if stats else 0
+    responded = stats.responded_tickets if stats else 0
+    return {
+        "total_tickets": total_tickets,
+        "open_tickets": open_tickets,
+        "resolution_rate": (total_tickets - open_tickets) / total_tickets if total_tickets > 0 else 0,
+        "average_response_time": stats.response_seconds_total / responded if responded else None,
+        "emergency_distribution": {emergency_type: count for emergency_type, count in type_counts}
+    }
@@ -0,0 +1,131 @@
+from datetime import datetime
+from fastapi import HTTPException
+from jose import JWTError, jwt
+from typing import Dict, Optional
+import asyncio
+import logging
+import os
+import threading
+from . import crud
+from .async_crud import run_crud
+from .database import session_scope
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+ALGORITHM = "HS256"
+# "kid:secret" pairs, comma-separated. To rotate: add the new key, switch JWT_ACTIVE_KID to it,
+# and drop the old one once the longest-lived token signed with it (a refresh token) has expired.
+JWT_SIGNING_KEYS = os.getenv("JWT_SIGNING_KEYS", "")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID")
+# Single-key fallback, also used to verify tokens issued before kid headers existed
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")  # Change this in production!
+LEGACY_KID = "default"
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", "60"))  # seconds
+
+class KeyRing:
+    """HMAC signing keys by kid; tokens carry the kid that signed them in their header"""
+
+    def __init__(self, keys: Dict[str, str], active_kid: str):
+        if active_kid not in keys:
+            raise ValueError(f"JWT_ACTIVE_KID '{active_kid}' is not in JWT_SIGNING_KEYS")
+        self.keys = keys
+        self.active_kid = active_kid
+
+    @classmethod
+    def from_config(cls, value: str = JWT_SIGNING_KEYS, active_kid: Optional[str] = JWT_ACTIVE_KID) -> "KeyRing":
+        keys = {}
+        for pair in value.split(","):
+            kid, _, secret = pair.strip().partition(":")
+            if kid and secret:
+                keys[kid] = secret
+        if not keys:
+            if SECRET_KEY == "your-secret-key-here":
+                logger.warning("JWT_SIGNING_KEYS and SECRET_KEY are unset: tokens are signed with the development key")
+            keys[LEGACY_KID] = SECRET_KEY
+        return cls(keys, active_kid or next(iter(keys)))
+
+    def encode(self, claims: dict) -> str:
+        return jwt.encode(claims, self.keys[self.active_kid], algorithm=ALGORITHM, headers={"kid": self.active_kid})
+
+    def decode(self, token: str) -> dict:
+        """Verify with the key named by the token's kid; tokens without one predate rotation"""
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self.keys.get(kid) if kid else self.keys.get(LEGACY_KID, self.keys[self.active_kid])
+        if key is None:
+            raise JWTError(f"Unknown signing key '{kid}'")
+        return jwt.decode(token, key, algorithms=[ALGORITHM])
+
+key_ring = KeyRing.from_config()
+
+class RevocationSet:
+    """jti -> expiry of revoked access tokens, checked on every request without a query.
+
+    A plain set is enough: entries only live as long as an access token, so it
+    stays small and, unlike a Bloom filter, never rejects a valid token.
+    Revocations arrive from other workers as token_revoked events in the
+    revoking transaction; a periodic reload from revoked_tokens covers events
+    missed while the LISTEN connection was down.
+    """
+
+    def __init__(self, interval: float = REVOCATION_SYNC_INTERVAL):
+        self.interval = interval
+        self.synced_at: Optional[datetime] = None
+        self._revoked: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __contains__(self, jti: Optional[str]) -> bool:
+        return jti is not None and jti in self._revoked
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def add(self, jti: str, expires_at: datetime):
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def apply_event(self, event: dict):
+        """Broker listener"""
+        if event.get("event") == "token_revoked":
+            self.add(event["jti"], datetime.fromisoformat(event["expires_at"]))
+
+    async def sync(self):
+        now = datetime.utcnow()
+        async with session_scope() as db:
+            await run_crud(db, crud.prune_revoked_tokens, now)
+            rows = await run_crud(db, crud.get_revoked_tokens, now)
+        with self._lock:
+            # Keep entries that arrived by event after the query ran
+            fresh = {jti: expires_at for jti, expires_at in self._revoked.items() if expires_at > now}
+            fresh.update(rows)
+            self._revoked = fresh
+        self.synced_at = now
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sync()
+            except HTTPException as e:
+                logger.error(f"Revocation sync failed: {e.detail}")
+
+    async def start(self):
+        # Raises on failure: serving before the first sync would accept revoked tokens
+        await self.sync()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "revoked": len(self._revoked),
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+            "active_kid": key_ring.active_kid,
+            "kids": sorted(key_ring.keys)
+        }
+
+revocation_set = RevocationSet()
@@ -0,0 +1,215 @@
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from typing import Dict, List, Optional, Set
+import asyncio
+import heapq
+import logging
+import math
+import time
+from . import crud
+from .async_crud import run_crud
+from .database import session_scope
+from .events import broker
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TIMER_TICK = 1.0  # seconds
+TIMER_SLOTS = 3600
+
+def deadline_timestamp(deadline: datetime) -> float:
+    # Ticket timestamps are naive UTC
+    return deadline.replace(tzinfo=timezone.utc).timestamp()
+
+class TriageQueue:
+    """Min-heap of pending tickets keyed by SLA deadline, with lazy removal"""
+
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._deadlines: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def push(self, ticket_id: int, deadline: float):
+        self._deadlines[ticket_id] = deadline
+        heapq.heappush(self._heap, (deadline, ticket_id))
+
+    def remove(self, ticket_id: int):
+        self._deadlines.pop(ticket_id, None)
+        # Compact once stale entries dominate so the heap stays O(live tickets)
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(deadline, ticket_id) for ticket_id, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def _is_live(self, entry: tuple) -> bool:
+        return self._deadlines.get(entry[1]) == entry[0]
+
+    def peek(self) -> Optional[tuple]:
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0] if self._heap else None
+
+    def due_before(self, cutoff: float) -> List[tuple]:
+        """Entries with deadline <= cutoff, visiting only the heap nodes that qualify"""
+        found = []
+        stack = [0] if self._heap else []
+        while stack:
+            index = stack.pop()
+            entry = self._heap[index]
+            if entry[0] > cutoff:
+                continue
+            if self._is_live(entry):
+                found.append(entry)
+            stack.extend(child for child in (2 * index + 1, 2 * index + 2) if child < len(self._heap))
+        return sorted(found)
+
+class TimerWheel:
+    """Hashed timing wheel; scheduling and cancelling are O(1)"""
+
+    def __init__(self, tick: float = TIMER_TICK, slots: int = TIMER_SLOTS):
+        self.tick = tick
+        self._slots: List[Dict[int, int]] = [{} for _ in range(slots)]
+        self._locations: Dict[int, int] = {}
+        self._cursor = 0
+        self._time = time.time()
+
+    def schedule(self, key: int, when: float):
+        self.cancel(key)
+        ticks = max(1, math.ceil((when - self._time) / self.tick))
+        slot = (self._cursor + ticks) % len(self._slots)
+        self._slots[slot][key] = (ticks - 1) // len(self._slots)
+        self._locations[key] = slot
+
+    def cancel(self, key: int):
+        slot = self._locations.pop(key, None)
+        if slot is not None:
+            self._slots[slot].pop(key, None)
+
+    def advance(self, now: float) -> List[int]:
+        """Move the wheel up to now and return the keys whose time has come"""
+        fired = []
+        while self._time + self.tick <= now:
+            self._time += self.tick
+            self._cursor = (self._cursor + 1) % len(self._slots)
+            bucket = self._slots[self._cursor]
+            for key, rounds in list(bucket.items()):
+                if rounds == 0:
+                    del bucket[key]
+                    del self._locations[key]
+                    fired.append(key)
+                else:
+                    bucket[key] = rounds - 1
+        return fired
+
+class TriageService:
+    """Per-organization SLA queues plus the escalation timer for one worker.
+
+    Escalations are claimed with a conditional UPDATE, so when every worker's
+    timer fires for the same ticket only one of them notifies.
+    """
+
+    def __init__(self):
+        self._queues: Dict[int, TriageQueue] = {}
+        self._ticket_organizations: Dict[int, int] = {}
+        self._wheel = TimerWheel()
+        self._pending_reloads: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, ticket_id: int, organization_id: int, deadline: datetime,
+            escalation_required: bool, escalated_at: Optional[datetime]):
+        self.remove(ticket_id)
+        when = deadline_timestamp(deadline)
+        self._queues.setdefault(organization_id, TriageQueue()).push(ticket_id, when)
+        self._ticket_organizations[ticket_id] = organization_id
+        if escalation_required and escalated_at is None:
+            self._wheel.schedule(ticket_id, when)
+
+    def remove(self, ticket_id: int):
+        organization_id = self._ticket_organizations.pop(ticket_id, None)
+        if organization_id is not None:
+            self._queues[organization_id].remove(ticket_id)
+        self._wheel.cancel(ticket_id)
+
+    def rebuild(self, rows):
+        self._queues = {}
+        self._ticket_organizations = {}
+        self._wheel = TimerWheel()
+        self.load(rows)
+
+    def load(self, rows):
+        for ticket_id, organization_id, deadline, escalation_required, escalated_at in rows:
+            if organization_id is not None:
+                self.add(ticket_id, organization_id, deadline, escalation_required, escalated_at)
+
+    def next_ticket(self, organization_id: int) -> Optional[dict]:
+        queue = self._queues.get(organization_id)
+        entry = queue.peek() if queue else None
+        if entry is None:
+            return None
+        return {"ticket_id": entry[1], "deadline": datetime.utcfromtimestamp(entry[0])}
+
+    def breaching(self, organization_id: int, within_seconds: int) -> List[dict]:
+        queue = self._queues.get(organization_id)
+        if queue is None:
+            return []
+        return [
+            {"ticket_id": ticket_id, "deadline": datetime.utcfromtimestamp(deadline)}
+            for deadline, ticket_id in queue.due_before(time.time() + within_seconds)
+        ]
+
+    def apply_event(self, event: dict):
+        """Keep the queues current from events on the LISTEN channel"""
+        if event.get("ticket_type") != "emergency":
+            return
+        kind = event.get("event")
+        if kind == "created" and event.get("status") == "pending":
+            # Coalesce bursts (bulk ingestion) into a single reload query
+            if not self._pending_reloads:
+                asyncio.get_running_loop().create_task(self._reload_pending())
+            self._pending_reloads.add(event["ticket_id"])
+        elif kind == "assigned" or (kind == "status_changed" and event.get("status") != "pending"):
+            self.remove(event["ticket_id"])
+        elif kind == "escalated":
+            self._wheel.cancel(event["ticket_id"])
+
+    async def _reload_pending(self):
+        await asyncio.sleep(0)
+        ticket_ids, self._pending_reloads = list(self._pending_reloads), set()
+        try:
+            async with session_scope() as db:
+                rows = await run_crud(db, crud.load_triage_tickets, ticket_ids=ticket_ids)
+            self.load(rows)
+        except HTTPException as e:
+            logger.error(f"Triage reload failed: {e.detail}")
+
+    async def _escalate(self, ticket_id: int, organization_id: int):
+        try:
+            async with session_scope() as db:
+                await run_crud(db, crud.escalate_emergency_ticket, ticket_id, organization_id)
+        except HTTPException as e:
+            logger.error(f"Escalation of ticket {ticket_id} failed: {e.detail}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self._wheel.tick)
+            for ticket_id in self._wheel.advance(time.time()):
+                organization_id = self._ticket_organizations.get(ticket_id)
+                if organization_id is not None:
+                    loop.create_task(self._escalate(ticket_id, organization_id))
+
+    async def start(self):
+        """Rebuild from the database, subscribe to events and start the timer; a failed load raises"""
+        async with session_scope() as db:
+            self.rebuild(await run_crud(db, crud.load_triage_tickets))
+        logger.info(f"Triage queue loaded with {len(self._ticket_organizations)} tickets")
+        broker.add_listener(self.apply_event)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+triage_service = TriageService()
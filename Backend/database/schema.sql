@@ -139,3 +139,270 @@ CREATE INDEX idx_emergency_tickets_date ON emergency_tickets(created_date);
 -- Create indexes for better query performance
 CREATE INDEX idx_ticket_logs_ticket_type_id ON enhanced_ticket_logs(ticket_type, ticket_id);
 CREATE INDEX idx_ticket_logs_timestamp ON enhanced_ticket_logs(log_timestamp);
+
+-- Keyset pagination and full-text search for ticket listings
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS title VARCHAR(200);
+CREATE INDEX idx_tickets_created_at_ticket_id ON tickets(created_at, ticket_id);
+CREATE INDEX idx_tickets_search ON tickets USING GIN (to_tsvector('english'::regconfig, coalesce(title, '') || ' ' || coalesce(description, '')));
+
+-- Emergency ticket assignment time, used for average response time
+ALTER TABLE emergency_tickets ADD COLUMN IF NOT EXISTS assigned_at TIMESTAMP;
+
+-- Incrementally maintained per-organization ticket statistics
+CREATE TABLE organization_ticket_stats (
+    organization_id INT PRIMARY KEY REFERENCES organizations(organization_id) ON DELETE CASCADE,
+    total_tickets INT NOT NULL DEFAULT 0,
+    open_tickets INT NOT NULL DEFAULT 0,
+    responded_tickets INT NOT NULL DEFAULT 0,
+    response_seconds_total BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE organization_ticket_type_counts (
+    organization_id INT REFERENCES organizations(organization_id) ON DELETE CASCADE,
+    emergency_type VARCHAR(100) NOT NULL,
+    ticket_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (organization_id, emergency_type)
+);
+
+-- Triage queue: escalation marker and pending-ticket scan
+ALTER TABLE emergency_tickets ADD COLUMN IF NOT EXISTS escalated_at TIMESTAMP;
+CREATE INDEX IF NOT EXISTS idx_emergency_tickets_pending ON emergency_tickets(created_at) WHERE status = 'pending';
+
+-- Tenant partitioning
+-- Converts existing tables in place: emergency tickets are hash partitioned by
+-- organization and enhanced ticket logs range partitioned by month. tickets stays
+-- unpartitioned because comments, attachments and followup_tasks reference
+-- ticket_id alone; it gets a denormalized organization_id and a tenant-leading index.
+BEGIN;
+
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS organization_id INT REFERENCES organizations(organization_id);
+UPDATE tickets t SET organization_id = l.organization_id
+FROM locations l
+WHERE l.location_id = t.location_id AND t.organization_id IS NULL;
+CREATE INDEX IF NOT EXISTS idx_tickets_org_created_at_ticket_id ON tickets(organization_id, created_at, ticket_id);
+
+CREATE OR REPLACE FUNCTION set_ticket_organization() RETURNS trigger AS $$
+BEGIN
+    IF NEW.organization_id IS NULL THEN
+        SELECT organization_id INTO NEW.organization_id FROM locations WHERE location_id = NEW.location_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tickets_set_organization ON tickets;
+CREATE TRIGGER tickets_set_organization BEFORE INSERT OR UPDATE OF location_id ON tickets
+FOR EACH ROW EXECUTE FUNCTION set_ticket_organization();
+
+-- Emergency tickets: HASH (organization_id); the partition key joins the primary key
+ALTER TABLE ticket_logs DROP CONSTRAINT IF EXISTS ticket_logs_ticket_id_fkey;
+ALTER TABLE emergency_tickets RENAME TO emergency_tickets_unpartitioned;
+ALTER INDEX idx_emergency_tickets_status RENAME TO idx_emergency_tickets_status_old;
+ALTER INDEX idx_emergency_tickets_date RENAME TO idx_emergency_tickets_date_old;
+DROP INDEX IF EXISTS idx_emergency_tickets_pending;
+
+CREATE TABLE emergency_tickets (
+    ticket_id INT NOT NULL DEFAULT nextval('emergency_tickets_ticket_id_seq'),
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    organization_id INT NOT NULL REFERENCES organizations(organization_id) ON DELETE CASCADE,
+    user_input_location TEXT NOT NULL,
+    matched_location TEXT,
+    location_type VARCHAR(50),
+    location_details TEXT,
+    description VARCHAR(400) NOT NULL,
+    status VARCHAR(50) CHECK (status IN ('pending', 'assigned', 'in_progress', 'completed', 'incomplete', 'closed', 'cancelled')) DEFAULT 'pending',
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    user_name VARCHAR(100) NOT NULL,
+    user_contact VARCHAR(100) NOT NULL,
+    identifier VARCHAR(100),
+    severity_id INT REFERENCES incident_severity(severity_id),
+    assigned_staff_id INT REFERENCES staff(staff_id) ON DELETE SET NULL,
+    estimated_response_time INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_deleted BOOLEAN DEFAULT FALSE,
+    assigned_at TIMESTAMP,
+    escalated_at TIMESTAMP,
+    PRIMARY KEY (ticket_id, organization_id)
+) PARTITION BY HASH (organization_id);
+
+DO $$
+BEGIN
+    FOR remainder IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE emergency_tickets_p%s PARTITION OF emergency_tickets FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            remainder, remainder
+        );
+    END LOOP;
+END $$;
+
+-- Tickets created without an organization inherit their reporter's
+INSERT INTO emergency_tickets (
+    ticket_id, user_id, organization_id, user_input_location, matched_location, location_type,
+    location_details, description, status, created_date, user_name, user_contact, identifier,
+    severity_id, assigned_staff_id, estimated_response_time, created_at, is_deleted, assigned_at, escalated_at
+)
+SELECT e.ticket_id, e.user_id, COALESCE(e.organization_id, u.organization_id), e.user_input_location,
+       e.matched_location, e.location_type, e.location_details, e.description, e.status, e.created_date,
+       e.user_name, e.user_contact, e.identifier, e.severity_id, e.assigned_staff_id,
+       e.estimated_response_time, e.created_at, e.is_deleted, e.assigned_at, e.escalated_at
+FROM emergency_tickets_unpartitioned e
+LEFT JOIN users u ON u.user_id = e.user_id;
+
+ALTER SEQUENCE emergency_tickets_ticket_id_seq OWNED BY emergency_tickets.ticket_id;
+DROP TABLE emergency_tickets_unpartitioned;
+
+CREATE INDEX idx_emergency_tickets_status ON emergency_tickets(status);
+CREATE INDEX idx_emergency_tickets_date ON emergency_tickets(created_date);
+CREATE INDEX idx_emergency_tickets_ticket_id ON emergency_tickets(ticket_id);
+CREATE INDEX idx_emergency_tickets_org_created_at ON emergency_tickets(organization_id, created_at);
+CREATE INDEX idx_emergency_tickets_pending ON emergency_tickets(created_at) WHERE status = 'pending';
+
+-- Enhanced ticket logs: RANGE (log_timestamp) by month, plus a default partition.
+-- The app creates upcoming months at startup (crud.ensure_log_partitions).
+ALTER TABLE enhanced_ticket_logs RENAME TO enhanced_ticket_logs_unpartitioned;
+DROP INDEX IF EXISTS idx_ticket_logs_ticket_type_id;
+DROP INDEX IF EXISTS idx_ticket_logs_timestamp;
+
+CREATE TABLE enhanced_ticket_logs (
+    log_id INT NOT NULL DEFAULT nextval('enhanced_ticket_logs_log_id_seq'),
+    ticket_type VARCHAR(20) NOT NULL CHECK (ticket_type IN ('regular', 'emergency')),
+    ticket_id INT NOT NULL,
+    action VARCHAR(50) NOT NULL,
+    changes JSONB,
+    performed_by INT REFERENCES staff(staff_id),
+    log_timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (log_id, log_timestamp)
+) PARTITION BY RANGE (log_timestamp);
+
+DO $$
+DECLARE
+    partition_month DATE := date_trunc('month', COALESCE(
+        (SELECT min(log_timestamp) FROM enhanced_ticket_logs_unpartitioned), CURRENT_DATE
+    ))::date;
+BEGIN
+    WHILE partition_month <= date_trunc('month', CURRENT_DATE + INTERVAL '3 months') LOOP
+        EXECUTE format(
+            'CREATE TABLE enhanced_ticket_logs_y%sm%s PARTITION OF enhanced_ticket_logs FOR VALUES FROM (%L) TO (%L)',
+            to_char(partition_month, 'YYYY'), to_char(partition_month, 'MM'), partition_month, (partition_month + INTERVAL '1 month')::date
+        );
+        partition_month := (partition_month + INTERVAL '1 month')::date;
+    END LOOP;
+END $$;
+CREATE TABLE enhanced_ticket_logs_default PARTITION OF enhanced_ticket_logs DEFAULT;
+
+INSERT INTO enhanced_ticket_logs (log_id, ticket_type, ticket_id, action, changes, performed_by, log_timestamp)
+SELECT log_id, ticket_type, ticket_id, action, changes, performed_by, COALESCE(log_timestamp, CURRENT_TIMESTAMP)
+FROM enhanced_ticket_logs_unpartitioned;
+
+ALTER SEQUENCE enhanced_ticket_logs_log_id_seq OWNED BY enhanced_ticket_logs.log_id;
+DROP TABLE enhanced_ticket_logs_unpartitioned;
+
+CREATE INDEX idx_ticket_logs_ticket_type_id ON enhanced_ticket_logs(ticket_type, ticket_id);
+CREATE INDEX idx_ticket_logs_timestamp ON enhanced_ticket_logs(log_timestamp);
+
+COMMIT;
+
+-- Audit outbox: appended in the mutation's transaction, drained into
+-- enhanced_ticket_logs in batches by the app (audit_writer.py)
+CREATE TABLE IF NOT EXISTS audit_outbox (
+    outbox_id BIGSERIAL PRIMARY KEY,
+    ticket_type VARCHAR(20) NOT NULL,
+    ticket_id INT NOT NULL,
+    action VARCHAR(50) NOT NULL,
+    changes JSONB,
+    performed_by INT,
+    log_timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE enhanced_ticket_logs DROP CONSTRAINT IF EXISTS enhanced_ticket_logs_ticket_type_check;
+ALTER TABLE enhanced_ticket_logs ADD CONSTRAINT enhanced_ticket_logs_ticket_type_check
+    CHECK (ticket_type IN ('regular', 'emergency', 'maintenance'));
+
+-- Spatial layer: numeric coordinates, location hierarchy and trigram matching
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE organizations ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;
+ALTER TABLE organizations ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+
+ALTER TABLE locations ADD COLUMN IF NOT EXISTS parent_id INT REFERENCES locations(location_id);
+ALTER TABLE locations ADD COLUMN IF NOT EXISTS full_name VARCHAR(500);
+ALTER TABLE locations ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;
+ALTER TABLE locations ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+ALTER TABLE locations ADD COLUMN IF NOT EXISTS access_requirements JSONB;
+
+-- Backfill from the "lat,lng" strings where they parse
+UPDATE organizations SET
+    latitude = split_part(gps_coordinates, ',', 1)::DOUBLE PRECISION,
+    longitude = split_part(gps_coordinates, ',', 2)::DOUBLE PRECISION
+WHERE latitude IS NULL AND gps_coordinates ~ '^\s*-?[0-9.]+\s*,\s*-?[0-9.]+\s*$';
+UPDATE locations SET
+    latitude = split_part(gps_coordinates, ',', 1)::DOUBLE PRECISION,
+    longitude = split_part(gps_coordinates, ',', 2)::DOUBLE PRECISION
+WHERE latitude IS NULL AND gps_coordinates ~ '^\s*-?[0-9.]+\s*,\s*-?[0-9.]+\s*$';
+UPDATE locations SET full_name = name WHERE full_name IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_locations_parent_id ON locations(parent_id);
+CREATE INDEX IF NOT EXISTS idx_locations_full_name_trgm ON locations USING GIN (full_name gin_trgm_ops);
+
+ALTER TABLE staff ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;
+ALTER TABLE staff ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+ALTER TABLE staff ADD COLUMN IF NOT EXISTS position_updated_at TIMESTAMP;
+
+-- Attachment storage: content-addressed blobs shared by identical uploads
+-- attachments is created by the application models, so only migrate it where it exists
+DO $$
+BEGIN
+    IF to_regclass('attachments') IS NOT NULL THEN
+        ALTER TABLE attachments ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+        CREATE INDEX IF NOT EXISTS idx_attachments_content_hash ON attachments(content_hash);
+    END IF;
+END $$;
+
+-- Job scheduler: due work is claimed through partial indexes on the run_at columns
+-- followup_tasks and maintenance_tickets are created by the application models,
+-- so only migrate them where they exist
+DO $$
+BEGIN
+    IF to_regclass('followup_tasks') IS NOT NULL THEN
+        ALTER TABLE followup_tasks ADD COLUMN IF NOT EXISTS next_run_at TIMESTAMP;
+        ALTER TABLE followup_tasks ADD COLUMN IF NOT EXISTS attempts INT NOT NULL DEFAULT 0;
+        ALTER TABLE followup_tasks ADD COLUMN IF NOT EXISTS last_error TEXT;
+        UPDATE followup_tasks SET next_run_at = due_date WHERE status = 'pending' AND next_run_at IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_followup_tasks_next_run_at ON followup_tasks(next_run_at)
+        WHERE next_run_at IS NOT NULL;
+    END IF;
+    IF to_regclass('maintenance_tickets') IS NOT NULL THEN
+        ALTER TABLE maintenance_tickets ADD COLUMN IF NOT EXISTS recurrence_parent_id INT;
+        ALTER TABLE maintenance_tickets ADD COLUMN IF NOT EXISTS recurrence_run_at TIMESTAMP;
+        ALTER TABLE maintenance_tickets ADD COLUMN IF NOT EXISTS recurrence_attempts INT NOT NULL DEFAULT 0;
+        ALTER TABLE maintenance_tickets ADD COLUMN IF NOT EXISTS recurrence_error TEXT;
+        -- Existing recurring tickets are picked up on the next sweep and roll forward from there
+        UPDATE maintenance_tickets SET recurrence_run_at = NOW()
+        WHERE recurrence IS NOT NULL AND scheduled_date IS NOT NULL AND recurrence_run_at IS NULL AND NOT is_deleted
+          AND NOT EXISTS (SELECT 1 FROM maintenance_tickets child WHERE child.recurrence_parent_id = maintenance_tickets.ticket_id);
+        CREATE INDEX IF NOT EXISTS idx_maintenance_tickets_recurrence_run_at ON maintenance_tickets(recurrence_run_at)
+        WHERE recurrence_run_at IS NOT NULL;
+    END IF;
+END $$;
+
+-- Refresh token rotation and access token revocation
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    jti VARCHAR(32) PRIMARY KEY,
+    family_id VARCHAR(32) NOT NULL,
+    user_id INT NOT NULL REFERENCES users(user_id),
+    access_jti VARCHAR(32) NOT NULL,
+    access_expires_at TIMESTAMP NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    used_at TIMESTAMP,
+    revoked_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family_id ON refresh_tokens(family_id);
+
+-- Every worker keeps the unexpired rows in memory; rows are pruned once expired
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti VARCHAR(32) PRIMARY KEY,
+    expires_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens(expires_at);
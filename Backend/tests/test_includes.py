@@ -0,0 +1,39 @@
+import pytest
+from datetime import datetime
+from fastapi import HTTPException
+from app import models, schemas
+from app.serialization import row_serializer
+from app.crud import parse_includes, ticket_load_options, TICKET_INCLUDES
+
+@pytest.mark.parametrize("include", [None, "", " , "])
+def test_nothing_requested(include):
+    assert parse_includes(include) == []
+
+def test_splits_and_strips_names():
+    assert parse_includes("location, creator,,comments ") == ["location", "creator", "comments"]
+
+def test_every_declared_include_is_accepted():
+    assert parse_includes(",".join(TICKET_INCLUDES)) == list(TICKET_INCLUDES)
+
+def test_unknown_names_are_a_400():
+    with pytest.raises(HTTPException) as error:
+        parse_includes("location,password_hash,secrets")
+    assert error.value.status_code == 400
+    assert error.value.detail == "Unknown include: password_hash, secrets"
+
+def test_includes_the_ticket_type_lacks_are_skipped():
+    # Regular tickets have no severity and emergency tickets no comments; raiseload is always last
+    assert len(ticket_load_options(models.Ticket, ["location", "severity", "comments"])) == 3
+    assert len(ticket_load_options(models.EmergencyTicket, ["location", "severity", "comments"])) == 3
+    assert len(ticket_load_options(models.Ticket)) == 1
+
+def test_unloaded_relationships_serialize_as_null():
+    ticket = models.Ticket(
+        ticket_id=1, title="Leak", description="Kitchen", status="open", priority="low",
+        ticket_type="plumbing", location_id=2, created_by=3,
+        created_at=datetime(2024, 5, 1), updated_at=datetime(2024, 5, 1)
+    )
+    ticket.comments = []
+    item = row_serializer(schemas.TicketListItem)(ticket)
+    assert item["comments"] == []
+    assert item["location"] is None and item["attachments"] is None and item["followup_tasks"] is None
@@ -0,0 +1,53 @@
+import time
+import pytest
+from jose import JWTError, jwt
+from app.tokens import ALGORITHM, LEGACY_KID, KeyRing
+
+def claims(**extra) -> dict:
+    return {"sub": "tenant@example.com", "exp": int(time.time()) + 60, **extra}
+
+def test_round_trip_with_active_kid():
+    ring = KeyRing({"k1": "one", "k2": "two"}, "k2")
+    token = ring.encode(claims())
+    assert jwt.get_unverified_header(token)["kid"] == "k2"
+    assert ring.decode(token)["sub"] == "tenant@example.com"
+
+def test_tokens_from_a_retired_active_key_still_verify():
+    token = KeyRing({"k1": "one"}, "k1").encode(claims())
+    assert KeyRing({"k1": "one", "k2": "two"}, "k2").decode(token)["sub"] == "tenant@example.com"
+
+def test_unknown_kid_is_rejected():
+    token = KeyRing({"old": "gone"}, "old").encode(claims())
+    with pytest.raises(JWTError, match="Unknown signing key 'old'"):
+        KeyRing({"k1": "one"}, "k1").decode(token)
+
+def test_kid_cannot_pick_a_different_key():
+    # Signed with k1's secret but claiming k2: verified against k2 and rejected
+    token = jwt.encode(claims(), "one", algorithm=ALGORITHM, headers={"kid": "k2"})
+    with pytest.raises(JWTError):
+        KeyRing({"k1": "one", "k2": "two"}, "k1").decode(token)
+
+def test_tokens_without_kid_use_the_legacy_key():
+    token = jwt.encode(claims(), "legacy", algorithm=ALGORITHM)
+    assert KeyRing({LEGACY_KID: "legacy", "k1": "one"}, "k1").decode(token)["sub"] == "tenant@example.com"
+
+def test_tokens_without_kid_fall_back_to_the_active_key():
+    token = jwt.encode(claims(), "one", algorithm=ALGORITHM)
+    assert KeyRing({"k1": "one"}, "k1").decode(token)["sub"] == "tenant@example.com"
+
+def test_expired_and_tampered_tokens_are_rejected():
+    ring = KeyRing({"k1": "one"}, "k1")
+    with pytest.raises(JWTError):
+        ring.decode(ring.encode(claims(exp=int(time.time()) - 10)))
+    header, payload, signature = ring.encode(claims()).split(".")
+    with pytest.raises(JWTError):
+        ring.decode(".".join((header, payload, signature[::-1])))
+
+def test_active_kid_must_exist():
+    with pytest.raises(ValueError):
+        KeyRing({"k1": "one"}, "k2")
+
+def test_from_config_parses_pairs():
+    ring = KeyRing.from_config(" k1:one , k2:two:with:colons,broken ", "k2")
+    assert ring.keys == {"k1": "one", "k2": "two:with:colons"}
+    assert ring.active_kid == "k2"
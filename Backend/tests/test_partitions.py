@@ -0,0 +1,36 @@
+from datetime import date
+from app.partitions import add_months, expired_monthly_partitions, monthly_partition_statements
+
+TABLE = "enhanced_ticket_logs"
+
+def test_add_months_crosses_years():
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert add_months(date(2024, 1, 1), -25) == date(2021, 12, 1)
+
+def test_expires_only_months_wholly_outside_retention():
+    names = [f"{TABLE}_y2023m{month:02d}" for month in range(1, 13)] + [f"{TABLE}_y2024m01"]
+    # Retaining 12 months from mid-March 2024 keeps March 2023 onwards
+    assert expired_monthly_partitions(TABLE, names, 12, today=date(2024, 3, 15)) == [
+        f"{TABLE}_y2023m01", f"{TABLE}_y2023m02"
+    ]
+
+def test_ignores_default_and_foreign_partitions():
+    names = [
+        f"{TABLE}_default",
+        f"{TABLE}_y2020m1",
+        f"other_{TABLE}_y2020m01",
+        f"{TABLE}_y2020m01_old",
+        "emergency_tickets_p3",
+    ]
+    assert expired_monthly_partitions(TABLE, names, 1, today=date(2024, 3, 1)) == []
+
+def test_result_is_sorted():
+    names = [f"{TABLE}_y2021m05", f"{TABLE}_y2020m12", f"{TABLE}_y2021m01"]
+    assert expired_monthly_partitions(TABLE, names, 24, today=date(2024, 1, 1)) == sorted(names)
+
+def test_created_partitions_are_never_expired_early():
+    names = [statement.split()[5] for statement in monthly_partition_statements(TABLE, 3, start=date(2024, 6, 10))]
+    assert names == [f"{TABLE}_y2024m06", f"{TABLE}_y2024m07", f"{TABLE}_y2024m08", f"{TABLE}_y2024m09"]
+    assert expired_monthly_partitions(TABLE, names, 1, today=date(2024, 7, 1)) == []
+    assert expired_monthly_partitions(TABLE, names, 1, today=date(2024, 8, 1)) == [f"{TABLE}_y2024m06"]
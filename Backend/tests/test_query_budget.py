@@ -0,0 +1,97 @@
+import json
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+from app import crud, models, schemas
+from app.database import query_budget, QueryBudgetExceeded
+from app.serialization import encode
+from app.replicas import Replica, replica_router
+
+@pytest.fixture
+def sqlite_engine():
+    engine = create_engine("sqlite://")
+    yield engine
+    engine.dispose()
+
+def run(engine, statements: int):
+    with engine.connect() as conn:
+        for _ in range(statements):
+            conn.execute(text("SELECT 1"))
+
+def test_within_budget_returns_statements(sqlite_engine):
+    with query_budget(2, bind=sqlite_engine) as statements:
+        run(sqlite_engine, 2)
+    assert statements == ["SELECT 1", "SELECT 1"]
+
+def test_over_budget_raises_with_statements(sqlite_engine):
+    with pytest.raises(QueryBudgetExceeded, match="3 statements executed, budget was 2"):
+        with query_budget(2, bind=sqlite_engine):
+            run(sqlite_engine, 3)
+
+def test_listener_removed_after_block(sqlite_engine):
+    with query_budget(1, bind=sqlite_engine) as statements:
+        run(sqlite_engine, 1)
+    run(sqlite_engine, 2)
+    assert len(statements) == 1
+
+def test_counts_replica_reads(sqlite_engine, monkeypatch):
+    monkeypatch.setattr(replica_router, "replicas", [Replica("replica0", sqlite_engine)])
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(1):
+            run(sqlite_engine, 2)
+
+@pytest.fixture
+def ticket_db(sqlite_engine):
+    # The tables a ticket listing touches; followup_tasks uses a PostgreSQL ARRAY column, so it is left out
+    tables = [models.Base.metadata.tables[name] for name in (
+        "organizations", "locations", "users", "tickets", "comments", "attachments"
+    )]
+    # pg_trgm is PostgreSQL only; the location trigram index itself is skipped by sqlite
+    event.remove(models.Location.__table__, "before_create", models.create_trigram_extension)
+    try:
+        models.Base.metadata.create_all(sqlite_engine, tables=tables)
+    finally:
+        event.listen(models.Location.__table__, "before_create", models.create_trigram_extension)
+    now = datetime(2024, 5, 1)
+    with Session(sqlite_engine) as db:
+        db.add(models.Organization(organization_id=1, name="Campus", type="college", size=100, address="1 Main St"))
+        db.add(models.Location(location_id=1, organization_id=1, name="Hall", type="building"))
+        db.add(models.User(
+            user_id=1, organization_id=1, name="Tenant", email="tenant@example.com",
+            password_hash="x", role="tenant"
+        ))
+        for ticket_id in range(1, 6):
+            db.add(models.Ticket(
+                ticket_id=ticket_id, title=f"Ticket {ticket_id}", description="Leak", status="pending",
+                priority="low", ticket_type="plumbing", location_id=1, created_by=1, organization_id=1,
+                created_at=now, updated_at=now
+            ))
+            db.add(models.Comment(ticket_id=ticket_id, user_id=1, content="On it", created_at=now, updated_at=now))
+            db.add(models.Attachment(
+                ticket_id=ticket_id, file_name="leak.jpg", file_type="image/jpeg", file_size=1,
+                file_path="blobs/leak", uploaded_by=1, uploaded_at=now
+            ))
+        db.commit()
+        yield db
+
+@pytest.mark.parametrize("includes, budget", [
+    ([], 1),
+    # Many-to-one includes join into the base query
+    (["location", "creator", "assignee"], 1),
+    # Each collection costs one IN query, however many tickets are on the page
+    (["location", "creator", "comments", "attachments"], 3),
+])
+def test_ticket_listing_stays_within_a_fixed_budget(ticket_db, sqlite_engine, includes, budget):
+    with query_budget(budget, bind=sqlite_engine) as statements:
+        page = crud.list_tickets(ticket_db, limit=10, organization_id=1, includes=includes)
+        assert len(statements) == budget
+        body = json.loads(encode(schemas.TicketPage, page))
+    # Serializing reads only what the query loaded: no lazy loads
+    assert len(statements) == budget
+    assert len(body["tickets"]) == 5
+    ticket = body["tickets"][0]
+    for name in ("location", "creator", "comments", "attachments"):
+        assert (ticket[name] is not None) == (name in includes)
+    if "comments" in includes:
+        assert ticket["comments"][0]["content"] == "On it"
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from app import rate_limit
+from app.rate_limit import Limit, MemoryStore, parse_limit
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+def take(store, keys, limits):
+    return asyncio.run(store.take(keys, limits))
+
+def test_burst_then_reject_with_wait(clock):
+    store = MemoryStore()
+    limit = Limit(capacity=3, rate=1.0)
+    assert [take(store, ["a"], [limit]) for _ in range(3)] == [(0.0, -1)] * 3
+    wait, blocked = take(store, ["a"], [limit])
+    assert blocked == 0 and wait == pytest.approx(1.0)
+
+def test_refills_at_rate_up_to_capacity(clock):
+    store = MemoryStore()
+    limit = Limit(capacity=2, rate=0.5)
+    take(store, ["a"], [limit])
+    take(store, ["a"], [limit])
+    clock.now += 2
+    assert take(store, ["a"], [limit]) == (0.0, -1)
+    assert take(store, ["a"], [limit])[1] == 0
+    clock.now += 3600
+    assert take(store, ["a"], [limit]) == (0.0, -1)
+    assert take(store, ["a"], [limit]) == (0.0, -1)
+    assert take(store, ["a"], [limit])[1] == 0
+
+def test_rejection_spends_no_bucket(clock):
+    store = MemoryStore()
+    roomy, tight = Limit(capacity=10, rate=1.0), Limit(capacity=1, rate=1.0)
+    take(store, ["user", "org"], [roomy, tight])
+    for _ in range(5):
+        assert take(store, ["user", "org"], [roomy, tight])[1] == 1
+    # Only the first request spent a token from the user's bucket
+    assert store._buckets["user"][0] == pytest.approx(9)
+
+def test_reports_the_longest_wait(clock):
+    store = MemoryStore()
+    fast, slow = Limit(capacity=1, rate=1.0), Limit(capacity=1, rate=0.1)
+    take(store, ["fast", "slow"], [fast, slow])
+    wait, blocked = take(store, ["fast", "slow"], [fast, slow])
+    assert blocked == 1 and wait == pytest.approx(10.0)
+
+def test_evicts_least_recently_used_buckets(clock):
+    store = MemoryStore(maxsize=2)
+    limit = Limit(capacity=5, rate=1.0)
+    for key in ("a", "b", "a", "c"):
+        take(store, [key], [limit])
+    assert list(store._buckets) == ["a", "c"]
+
+@pytest.mark.parametrize("value, expected", [
+    ("60/minute", Limit(capacity=60, rate=1.0)),
+    (" 10/Seconds ", Limit(capacity=10, rate=10.0)),
+    ("off", None),
+    ("", None),
+])
+def test_parse_limit(value, expected):
+    assert parse_limit(value) == expected
+
+@pytest.mark.parametrize("value", ["60", "0/minute", "-1/minute", "ten/minute", "60/fortnight"])
+def test_parse_limit_rejects(value):
+    with pytest.raises(ValueError):
+        parse_limit(value)
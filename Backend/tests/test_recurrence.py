@@ -0,0 +1,46 @@
+import pytest
+from datetime import date, datetime, timedelta
+from app.recurrence import next_occurrence, materialize_at, RECURRENCE_LEAD_DAYS
+
+@pytest.mark.parametrize("recurrence, expected", [
+    ("daily", date(2024, 3, 1)),
+    ("weekly", date(2024, 3, 7)),
+    ("biweekly", date(2024, 3, 14)),
+    ("monthly", date(2024, 3, 29)),
+    ("quarterly", date(2024, 5, 29)),
+    ("semiannual", date(2024, 8, 29)),
+    ("yearly", date(2025, 2, 28)),
+    ("annual", date(2025, 2, 28)),
+])
+def test_intervals(recurrence, expected):
+    assert next_occurrence(date(2024, 2, 29), recurrence) == expected
+
+def test_month_end_is_clamped():
+    assert next_occurrence(date(2024, 1, 31), "monthly") == date(2024, 2, 29)
+    assert next_occurrence(date(2023, 1, 31), "monthly") == date(2023, 2, 28)
+    assert next_occurrence(date(2024, 11, 30), "quarterly") == date(2025, 2, 28)
+
+def test_crosses_year_end():
+    assert next_occurrence(date(2024, 12, 31), "daily") == date(2025, 1, 1)
+    assert next_occurrence(date(2024, 12, 15), "monthly") == date(2025, 1, 15)
+
+def test_recurrence_is_case_and_space_insensitive():
+    assert next_occurrence(date(2024, 1, 1), " Weekly ") == date(2024, 1, 8)
+
+@pytest.mark.parametrize("recurrence", ["fortnightly", "", None])
+def test_unknown_recurrence_raises(recurrence):
+    with pytest.raises(ValueError):
+        next_occurrence(date(2024, 1, 1), recurrence)
+
+def test_materialize_at_leads_the_next_occurrence():
+    assert materialize_at(date(2024, 1, 1), "monthly") == (
+        datetime(2024, 2, 1) - timedelta(days=RECURRENCE_LEAD_DAYS)
+    )
+
+@pytest.mark.parametrize("scheduled_date, recurrence", [(None, "weekly"), (date(2024, 1, 1), None), (date(2024, 1, 1), "")])
+def test_materialize_at_without_recurrence(scheduled_date, recurrence):
+    assert materialize_at(scheduled_date, recurrence) is None
+
+def test_materialize_at_keeps_unknown_recurrence_due():
+    # Due immediately, so the scheduler records the error instead of silently dropping the series
+    assert materialize_at(date(2024, 1, 1), "fortnightly") == datetime(2024, 1, 1)
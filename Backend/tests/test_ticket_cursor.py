@@ -0,0 +1,32 @@
+import base64
+import json
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from fastapi import HTTPException
+from app.crud import encode_ticket_cursor, decode_ticket_cursor
+
+def raw_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+def test_round_trip():
+    ticket = SimpleNamespace(created_at=datetime(2024, 5, 1, 12, 30, 15, 250000), ticket_id=42)
+    assert decode_ticket_cursor(encode_ticket_cursor(ticket)) == (ticket.created_at, 42)
+
+def test_cursor_is_url_safe():
+    ticket = SimpleNamespace(created_at=datetime(2024, 5, 1), ticket_id=10 ** 12)
+    cursor = encode_ticket_cursor(ticket)
+    assert "+" not in cursor and "/" not in cursor
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    raw_cursor([1, 2]),
+    raw_cursor(["2024-05-01T00:00:00"]),
+    raw_cursor({"created_at": "2024-05-01T00:00:00", "ticket_id": 1}),
+    raw_cursor(["yesterday", 1]),
+    raw_cursor(["2024-05-01T00:00:00", "one"]),
+])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_ticket_cursor(cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,67 @@
+from app.triage import TimerWheel, TriageQueue
+
+def test_queue_orders_by_deadline():
+    queue = TriageQueue()
+    queue.push(1, 300.0)
+    queue.push(2, 100.0)
+    queue.push(3, 200.0)
+    assert queue.peek() == (100.0, 2)
+    assert queue.due_before(250.0) == [(100.0, 2), (200.0, 3)]
+    assert len(queue) == 3
+
+def test_removed_and_rescheduled_tickets_are_skipped():
+    queue = TriageQueue()
+    queue.push(1, 100.0)
+    queue.push(2, 200.0)
+    queue.remove(1)
+    queue.push(2, 50.0)
+    assert queue.peek() == (50.0, 2)
+    assert queue.due_before(1000.0) == [(50.0, 2)]
+    assert len(queue) == 1
+
+def test_queue_compacts_stale_entries():
+    queue = TriageQueue()
+    for ticket_id in range(200):
+        queue.push(ticket_id, float(ticket_id))
+    for ticket_id in range(190):
+        queue.remove(ticket_id)
+    assert len(queue._heap) <= 2 * len(queue) + 64
+    assert queue.peek() == (190.0, 190)
+
+def test_empty_queue():
+    queue = TriageQueue()
+    assert queue.peek() is None
+    assert queue.due_before(1e12) == []
+
+def wheel(tick=1.0, slots=8):
+    timers = TimerWheel(tick=tick, slots=slots)
+    timers._time = 1000.0
+    return timers
+
+def test_wheel_fires_on_the_tick_after_the_deadline():
+    timers = wheel()
+    timers.schedule(1, 1002.5)
+    assert timers.advance(1002.0) == []
+    assert timers.advance(1003.0) == [1]
+    assert timers.advance(1010.0) == []
+
+def test_wheel_fires_past_one_revolution():
+    timers = wheel(slots=4)
+    timers.schedule(1, 1010.0)
+    timers.schedule(2, 1002.0)
+    assert timers.advance(1009.0) == [2]
+    assert timers.advance(1010.0) == [1]
+
+def test_wheel_cancel_and_reschedule():
+    timers = wheel()
+    timers.schedule(1, 1002.0)
+    timers.schedule(2, 1002.0)
+    timers.cancel(1)
+    timers.schedule(2, 1005.0)
+    assert timers.advance(1004.0) == []
+    assert timers.advance(1005.0) == [2]
+
+def test_past_deadlines_fire_on_the_next_tick():
+    timers = wheel()
+    timers.schedule(1, 900.0)
+    assert timers.advance(1001.0) == [1]